@@ -2,6 +2,23 @@
 """
 Action library access
 """
+from orcoursetrion.actions.async_github import (
+    create_export_repo_async,
+    rerun_studio_async,
+    release_studio_async,
+    create_xml_repo_async,
+    rerun_xml_async,
+    release_xml_async,
+    put_team_async,
+    shutdown_async_actions,
+)
+from orcoursetrion.actions.batch import (
+    BatchResult,
+    BatchSummary,
+    ManifestError,
+    read_manifest,
+    run_batch,
+)
 from orcoursetrion.actions.github import (
     create_export_repo,
     rerun_studio,
@@ -9,7 +26,9 @@ from orcoursetrion.actions.github import (
     create_xml_repo,
     rerun_xml,
     release_xml,
-    put_team
+    put_team,
+    github_client,
+    github_metrics,
 )
 
 
@@ -21,4 +40,19 @@ __all__ = [
     'rerun_xml',
     'release_xml',
     'put_team',
+    'github_client',
+    'github_metrics',
+    'BatchResult',
+    'BatchSummary',
+    'ManifestError',
+    'read_manifest',
+    'run_batch',
+    'create_export_repo_async',
+    'rerun_studio_async',
+    'release_studio_async',
+    'create_xml_repo_async',
+    'rerun_xml_async',
+    'release_xml_async',
+    'put_team_async',
+    'shutdown_async_actions',
 ]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Because pylint doesn't do dynamic attributes for orcoursetrion.config
+# pylint: disable=no-member
+"""
+Versions of the github actions that return a future instead of waiting
+for the action to finish, i.e. for services starting many at once.
+"""
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from orcoursetrion import config
+from orcoursetrion.actions.github import (
+    create_export_repo,
+    create_xml_repo,
+    put_team,
+    release_studio,
+    release_xml,
+    rerun_studio,
+    rerun_xml,
+)
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _submit(action, *args, **kwargs):
+    """Run an action on the shared pool of
+    :py:const:`~orcoursetrion.config.ORC_GH_ASYNC_WORKERS` workers.
+
+    Returns:
+        concurrent.futures.Future: Future of what the action returns.
+    """
+    global _EXECUTOR  # pylint: disable=global-statement
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=int(config.ORC_GH_ASYNC_WORKERS)
+            )
+        return _EXECUTOR.submit(action, *args, **kwargs)
+
+
+def shutdown_async_actions(wait=True):
+    """Stop the workers running actions, which are started again by
+    the next action.
+
+    Args:
+        wait (bool): Wait for the actions already started to finish.
+    """
+    global _EXECUTOR  # pylint: disable=global-statement
+    with _EXECUTOR_LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def create_export_repo_async(course, term, description=None):
+    """Future of :py:func:`~orcoursetrion.actions.create_export_repo`"""
+    return _submit(create_export_repo, course, term, description)
+
+
+def rerun_studio_async(course, term, new_term, description=None):
+    """Future of :py:func:`~orcoursetrion.actions.rerun_studio`"""
+    return _submit(rerun_studio, course, term, new_term, description)
+
+
+def release_studio_async(course, term):
+    """Future of :py:func:`~orcoursetrion.actions.release_studio`"""
+    return _submit(release_studio, course, term)
+
+
+def create_xml_repo_async(course, term, team=None, members=None,
+                          description=None):
+    """Future of :py:func:`~orcoursetrion.actions.create_xml_repo`"""
+    return _submit(create_xml_repo, course, term, team, members, description)
+
+
+def rerun_xml_async(course, term):
+    """Future of :py:func:`~orcoursetrion.actions.rerun_xml`"""
+    return _submit(rerun_xml, course, term)
+
+
+def release_xml_async(course, term):
+    """Future of :py:func:`~orcoursetrion.actions.release_xml`"""
+    return _submit(release_xml, course, term)
+
+
+def put_team_async(org, team, read_only, members):
+    """Future of :py:func:`~orcoursetrion.actions.put_team`"""
+    return _submit(put_team, org, team, read_only, members)
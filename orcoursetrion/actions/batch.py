@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Run many actions from a manifest concurrently, i.e. to set up every
+course at term rollover.
+"""
+from collections import namedtuple
+import csv
+from itertools import count
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from orcoursetrion.actions.github import (
+    create_export_repo,
+    create_xml_repo,
+    github_client,
+    release_studio,
+    release_xml,
+    rerun_studio,
+    rerun_xml,
+)
+
+
+# Default number of manifest rows run at the same time
+DEFAULT_BATCH_WORKERS = 4
+
+# Columns a manifest can have
+MANIFEST_FIELDS = (
+    'action', 'course', 'term', 'team', 'members', 'description', 'new_term'
+)
+
+# Actions that can be run from a manifest, and how to call them with a row
+BATCH_ACTIONS = {
+    'create_export_repo': lambda row: create_export_repo(
+        row['course'], row['term'], row.get('description')
+    ),
+    'rerun_studio': lambda row: rerun_studio(
+        row['course'], row['term'], row['new_term'], row.get('description')
+    ),
+    'release_studio': lambda row: release_studio(row['course'], row['term']),
+    'create_xml_repo': lambda row: create_xml_repo(
+        row['course'], row['term'], row.get('team'), row.get('members'),
+        row.get('description')
+    ),
+    'rerun_xml': lambda row: rerun_xml(row['course'], row['term']),
+    'release_xml': lambda row: release_xml(row['course'], row['term']),
+}
+
+
+class ManifestError(Exception):
+    """The manifest can't be read, or has a row we can't run."""
+    pass
+
+
+# Outcome of running one manifest row, ``error`` is None on success.
+BatchResult = namedtuple(
+    'BatchResult', ['row', 'result', 'error', 'seconds']
+)
+
+# Totals for a whole batch run
+BatchSummary = namedtuple(
+    'BatchSummary', ['succeeded', 'failed', 'seconds', 'api_calls']
+)
+
+
+def _clean_row(row, number):
+    """Check a manifest row and normalize its values.
+
+    Args:
+        row (dict): Row as read from the manifest.
+        number (int): Row number, for error messages.
+    Raises:
+        ManifestError
+    Returns:
+        dict: Row with empty values removed, and ``members`` as a list.
+    """
+    if not isinstance(row, dict):
+        raise ManifestError('Row {0} is not a mapping'.format(number))
+    row = dict(
+        (key.strip(), value) for key, value in row.items()
+        if key and value not in (None, '')
+    )
+    unknown = set(row) - set(MANIFEST_FIELDS)
+    if unknown:
+        raise ManifestError('Row {0} has unknown columns {1}'.format(
+            number, ', '.join(sorted(unknown))
+        ))
+    missing = [x for x in ('action', 'course', 'term') if x not in row]
+    if missing:
+        raise ManifestError('Row {0} is missing {1}'.format(
+            number, ', '.join(missing)
+        ))
+    if row['action'] not in BATCH_ACTIONS:
+        raise ManifestError('Row {0} has unknown action {1}'.format(
+            number, row['action']
+        ))
+    if row['action'] == 'rerun_studio' and 'new_term' not in row:
+        raise ManifestError('Row {0} is missing new_term'.format(number))
+    # YAML reads unquoted terms like 2015 as numbers
+    for key in ('course', 'term', 'new_term'):
+        if key in row and not isinstance(row[key], basestring):
+            row[key] = str(row[key])
+    members = row.get('members')
+    if isinstance(members, basestring):
+        # CSV cells list members separated by spaces, commas or semicolons
+        row['members'] = members.replace(',', ' ').replace(';', ' ').split()
+    return row
+
+
+def read_manifest(path):
+    """Read the rows of a YAML or CSV manifest.
+
+    A YAML manifest (``.yml`` or ``.yaml``, which needs PyYAML) is a list
+    of mappings, and a CSV manifest has a header row.  Either way the
+    columns are ``action``, ``course``, ``term``, and optionally
+    ``team``, ``members``, ``description`` and ``new_term`` (for
+    ``rerun_studio``).  Quote courses in YAML, since ``6.10`` would be
+    read as the number ``6.1``.
+
+    Args:
+        path (str): Path to the manifest file.
+    Raises:
+        ManifestError
+        IOError
+    Returns:
+        list: Row dictionaries, ready for :py:func:`run_batch`
+    """
+    if os.path.splitext(path)[1].lower() in ('.yml', '.yaml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ManifestError(
+                'PyYAML needs to be installed to read YAML manifests'
+            )
+        with open(path) as manifest:
+            try:
+                rows = yaml.safe_load(manifest) or []
+            except yaml.YAMLError as error:
+                raise ManifestError(
+                    'Invalid YAML manifest: {0}'.format(error)
+                )
+        if not isinstance(rows, list):
+            raise ManifestError('YAML manifest must be a list of rows')
+    else:
+        with open(path) as manifest:
+            rows = list(csv.DictReader(manifest))
+    return [_clean_row(row, number) for number, row in enumerate(rows, 1)]
+
+
+def _run_row(row):
+    """Run the action of one manifest row, catching any failure"""
+    start = time.time()
+    try:
+        result = BATCH_ACTIONS[row['action']](row)
+        error = None
+    except Exception as exc:  # pylint: disable=broad-except
+        result = None
+        error = exc
+    return BatchResult(row, result, error, time.time() - start)
+
+
+def run_batch(rows, max_workers=DEFAULT_BATCH_WORKERS, callback=None):
+    """Run manifest rows concurrently over the shared GitHub client.
+
+    A failing row doesn't stop the others.
+
+    Args:
+        rows (list): Rows from :py:func:`read_manifest`
+        max_workers (int): Most rows run at the same time.
+        callback (callable): Called with the :py:class:`BatchResult` of
+            each row as soon as it finishes (in the calling thread).
+    Returns:
+        BatchSummary: Number of rows that ``succeeded`` and ``failed``,
+            total wall time in ``seconds`` and ``api_calls`` made.
+    """
+    start = time.time()
+    github = github_client()
+    calls = count()
+
+    def count_call(response, *args, **kwargs):
+        """Count each response from github"""
+        # pylint: disable=unused-argument
+        next(calls)
+        return response
+
+    github.session.hooks['response'].append(count_call)
+    succeeded = failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_run_row, row) for row in rows]
+            for future in as_completed(futures):
+                batch_result = future.result()
+                if batch_result.error is None:
+                    succeeded += 1
+                else:
+                    failed += 1
+                if callback is not None:
+                    callback(batch_result)
+    finally:
+        github.session.hooks['response'].remove(count_call)
+    return BatchSummary(succeeded, failed, time.time() - start, next(calls))
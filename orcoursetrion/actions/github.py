@@ -5,8 +5,19 @@
 Github based actions for orchestrion to take. i.e. "Create a studio
 course export repo", "Add course team to github", etc
 """
+from contextlib import contextmanager
+from functools import partial
+
 from orcoursetrion import config
-from orcoursetrion.lib import GitHub
+from orcoursetrion.lib import (
+    DiskCacheStore,
+    GitHub,
+    MemoryCacheStore,
+    MirrorCache,
+    Preflight,
+    StepGraph,
+    shared_client,
+)
 
 COMMITTER = {'email': config.ORC_GH_EMAIL, 'name': config.ORC_GH_NAME}
 GITIGNORE_CONTENTS = '''
@@ -14,6 +25,111 @@ drafts/
 '''
 GITIGNORE_MESSAGE = 'Automatic .gitignore from Orcoursetrion'
 GITIGNORE_PATH = '.gitignore'
+COURSE_XML_CONTENTS = (
+    '<course url_name="{term}" org="MITx" course="{course}"/>\n'
+)
+COURSE_XML_MESSAGE = 'initial commit of course.xml with term "{term}"'
+COURSE_XML_PATH = 'course.xml'
+# Scope needed to add teams and their repos
+TEAM_SCOPE = 'admin:org'
+# Access the studio deploy team needs to push course exports
+STUDIO_DEPLOY_PERMISSION = 'push'
+
+
+def _new_github(api_url, oauth2_token):
+    """Create a GitHub client with the settings from
+    :py:mod:`orcoursetrion.config`, including its response cache and
+    repo mirrors.
+
+    Args:
+        api_url (str): Github API URL such as https://api.github.com/
+        oauth2_token (str): Github OAUTH2 token for v3
+    Returns:
+        orcoursetrion.lib.GitHub: New API client.
+    """
+    if config.ORC_GH_CACHE_DIR:
+        cache = DiskCacheStore(
+            config.ORC_GH_CACHE_DIR, int(config.ORC_GH_CACHE_MAX_BYTES)
+        )
+    else:
+        cache = MemoryCacheStore()
+    mirrors = None
+    if config.ORC_GH_MIRROR_DIR:
+        mirrors = MirrorCache(
+            config.ORC_GH_MIRROR_DIR, int(config.ORC_GH_MIRROR_MAX_BYTES)
+        )
+    return GitHub(
+        api_url,
+        oauth2_token,
+        max_workers=int(config.ORC_GH_MAX_WORKERS),
+        team_cache_ttl=int(config.ORC_GH_TEAM_CACHE_TTL),
+        cache=cache,
+        requests_per_second=float(config.ORC_GH_REQUESTS_PER_SECOND),
+        max_retries=int(config.ORC_GH_MAX_RETRIES),
+        retry_backoff=float(config.ORC_GH_RETRY_BACKOFF),
+        pool_size=int(config.ORC_GH_POOL_SIZE),
+        # Settings from the environment are strings
+        keep_alive=str(config.ORC_GH_KEEP_ALIVE).lower() not in (
+            '0', 'false', 'no'
+        ),
+        mirrors=mirrors,
+        transport=config.ORC_GH_TRANSPORT
+    )
+
+
+def github_client():
+    """Get the shared GitHub client set up from
+    :py:mod:`orcoursetrion.config`, so actions run one after another
+    reuse its connections.
+
+    Returns:
+        orcoursetrion.lib.GitHub: API client to use in an action.
+    """
+    return shared_client(
+        config.ORC_GH_API_URL,
+        config.ORC_GH_OAUTH2_TOKEN,
+        factory=_new_github
+    )
+
+
+def github_metrics():
+    """Get the metrics of the requests made by the actions.
+
+    Returns:
+        orcoursetrion.lib.RequestMetrics: Metrics of the shared client.
+    """
+    return github_client().metrics
+
+
+@contextmanager
+def _action(github, name):
+    """Run an action in a unit of work its requests are counted against,
+    writing the request metrics to
+    :py:const:`~orcoursetrion.config.ORC_GH_METRICS_FILE` (if set)
+    when it ends.
+
+    Args:
+        github (orcoursetrion.lib.GitHub): Client the action uses.
+        name (str): Name of the action.
+    """
+    try:
+        with github.unit_of_work(action=name):
+            yield
+    finally:
+        if config.ORC_GH_METRICS_FILE:
+            github.metrics.write(config.ORC_GH_METRICS_FILE)
+
+
+def _step_graph(github):
+    """Get a graph for the steps of an action, which share the unit of
+    work the action is running in.
+
+    Args:
+        github (orcoursetrion.lib.GitHub): Client the action uses.
+    Returns:
+        orcoursetrion.lib.StepGraph: Graph to add steps to.
+    """
+    return StepGraph(context=github.current_work())
 
 
 def create_export_repo(course, term, description=None):
@@ -29,6 +145,7 @@ def create_export_repo(course, term, description=None):
         orcoursetrion.lib.GitHubUnknownError
         orcoursetrion.lib.GitHubNoTeamFound
         orcoursetrion.lib.GitHubRepoExists
+        orcoursetrion.lib.GitHubPreflightError
     Args:
         course (str): Course name to be used to name repo (i.e. 6.004r)
         term (str): Term the course is expected to run (i.e. 2015_Spring)
@@ -39,40 +156,54 @@ def create_export_repo(course, term, description=None):
 
     """
 
-    github = GitHub(config.ORC_GH_API_URL, config.ORC_GH_OAUTH2_TOKEN)
-    repo_name = '{prefix}-{course}-{term}'.format(
-        prefix=config.ORC_COURSE_PREFIX,
-        course=course.replace('.', ''),
-        term=term
-    )
-    repo = github.create_repo(config.ORC_STUDIO_ORG, repo_name, description)
-
-    # Add repo to team
-    github.add_team_repo(
-        config.ORC_STUDIO_ORG, repo_name, config.ORC_STUDIO_DEPLOY_TEAM
-    )
-
-    # Add .gitignore file
-    github.add_repo_file(
-        org=config.ORC_STUDIO_ORG,
-        repo=repo_name,
-        committer=COMMITTER,
-        message=GITIGNORE_MESSAGE,
-        path=GITIGNORE_PATH,
-        contents=GITIGNORE_CONTENTS
-    )
-    
-    # Add initial course.xml file
-    github.add_repo_file(
-        org=config.ORC_STUDIO_ORG,
-        repo=repo_name,
-        committer=COMMITTER,
-        message='initial commit of course.xml with term "{term}"'.format(term=term),
-        path="course.xml",
-        contents='<course url_name="{term}" org="MITx" course="{course}"/>\n'.format(term=term,course=course) 
-    )
-
-    return repo
+    github = github_client()
+    with _action(github, 'create_export_repo'):
+        repo_name = '{prefix}-{course}-{term}'.format(
+            prefix=config.ORC_COURSE_PREFIX,
+            course=course.replace('.', ''),
+            term=term
+        )
+        Preflight(github).repo_absent(
+            config.ORC_STUDIO_ORG, repo_name
+        ).team_exists(
+            config.ORC_STUDIO_ORG, config.ORC_STUDIO_DEPLOY_TEAM
+        ).token_scopes(TEAM_SCOPE).run()
+
+        steps = _step_graph(github)
+        steps.add('create_repo', partial(
+            github.create_repo, config.ORC_STUDIO_ORG, repo_name, description
+        ))
+
+        # Add repo to team
+        steps.add('add_team_repo', partial(
+            github.add_team_repo,
+            config.ORC_STUDIO_ORG, repo_name, config.ORC_STUDIO_DEPLOY_TEAM,
+            permission=STUDIO_DEPLOY_PERMISSION
+        ), requires=['create_repo'])
+
+        # Add .gitignore and initial course.xml files.  The repo is
+        # empty, so each is its own commit with the contents API, one
+        # after the other since each moves the branch.
+        steps.add('add_gitignore', partial(
+            github.add_repo_file,
+            org=config.ORC_STUDIO_ORG,
+            repo=repo_name,
+            committer=COMMITTER,
+            message=GITIGNORE_MESSAGE,
+            path=GITIGNORE_PATH,
+            contents=GITIGNORE_CONTENTS
+        ), requires=['create_repo'])
+        steps.add('add_course_xml', partial(
+            github.add_repo_file,
+            org=config.ORC_STUDIO_ORG,
+            repo=repo_name,
+            committer=COMMITTER,
+            message=COURSE_XML_MESSAGE.format(term=term),
+            path=COURSE_XML_PATH,
+            contents=COURSE_XML_CONTENTS.format(term=term, course=course)
+        ), requires=['add_gitignore'])
+
+        return steps.run()['create_repo']
 
 
 def rerun_studio(course, term, new_term, description=None):
@@ -93,44 +224,65 @@ def rerun_studio(course, term, new_term, description=None):
     Raises:
         requests.RequestException
         orcoursetrion.lib.GitHubRepoDoesNotExist
+        orcoursetrion.lib.GitHubRepoExists
+        orcoursetrion.lib.GitHubNoTeamFound
         orcoursetrion.lib.GitHubUnknownError
+        orcoursetrion.lib.GitHubPreflightError
     Returns:
         dict: Github dictionary of the newly created repo
                 (https://developer.github.com/v3/repos/#create)
 
     """
-    github = GitHub(config.ORC_GH_API_URL, config.ORC_GH_OAUTH2_TOKEN)
-
-    # Find and clean up the old
-    repo_name = '{prefix}-{course}-{term}'.format(
-        prefix=config.ORC_COURSE_PREFIX,
-        course=course.replace('.', ''),
-        term=term
-    )
-    github.delete_web_hooks(config.ORC_STUDIO_ORG, repo_name)
-
-    # Name the new and create it
-    repo_name = '{prefix}-{course}-{term}'.format(
-        prefix=config.ORC_COURSE_PREFIX,
-        course=course.replace('.', ''),
-        term=new_term
-    )
-    repo = github.create_repo(config.ORC_STUDIO_ORG, repo_name, description)
-
-    # Add repo to team
-    github.add_team_repo(
-        config.ORC_STUDIO_ORG, repo_name, config.ORC_STUDIO_DEPLOY_TEAM
-    )
-    # Add .gitignore file
-    github.add_repo_file(
-        org=config.ORC_STUDIO_ORG,
-        repo=repo_name,
-        committer=COMMITTER,
-        message=GITIGNORE_MESSAGE,
-        path=GITIGNORE_PATH,
-        contents=GITIGNORE_CONTENTS
-    )
-    return repo
+    github = github_client()
+    with _action(github, 'rerun_studio'):
+        old_repo_name = '{prefix}-{course}-{term}'.format(
+            prefix=config.ORC_COURSE_PREFIX,
+            course=course.replace('.', ''),
+            term=term
+        )
+        repo_name = '{prefix}-{course}-{term}'.format(
+            prefix=config.ORC_COURSE_PREFIX,
+            course=course.replace('.', ''),
+            term=new_term
+        )
+        Preflight(github).repo_exists(
+            config.ORC_STUDIO_ORG, old_repo_name
+        ).repo_absent(
+            config.ORC_STUDIO_ORG, repo_name
+        ).team_exists(
+            config.ORC_STUDIO_ORG, config.ORC_STUDIO_DEPLOY_TEAM
+        ).token_scopes(TEAM_SCOPE).run()
+
+        steps = _step_graph(github)
+
+        # Clean up the old
+        steps.add('delete_web_hooks', partial(
+            github.delete_web_hooks, config.ORC_STUDIO_ORG, old_repo_name
+        ))
+
+        # Create the new, only once the old is cleaned up
+        steps.add('create_repo', partial(
+            github.create_repo, config.ORC_STUDIO_ORG, repo_name, description
+        ), requires=['delete_web_hooks'])
+
+        # Add repo to team
+        steps.add('add_team_repo', partial(
+            github.add_team_repo,
+            config.ORC_STUDIO_ORG, repo_name, config.ORC_STUDIO_DEPLOY_TEAM,
+            permission=STUDIO_DEPLOY_PERMISSION
+        ), requires=['create_repo'])
+
+        # Add .gitignore file
+        steps.add('add_repo_file', partial(
+            github.add_repo_file,
+            org=config.ORC_STUDIO_ORG,
+            repo=repo_name,
+            committer=COMMITTER,
+            message=GITIGNORE_MESSAGE,
+            path=GITIGNORE_PATH,
+            contents=GITIGNORE_CONTENTS
+        ), requires=['create_repo'])
+        return steps.run()['create_repo']
 
 
 def release_studio(course, term):
@@ -147,19 +299,28 @@ def release_studio(course, term):
     Raises:
         requests.RequestException
         orcoursetrion.lib.GitHubUnknownError
+        orcoursetrion.lib.GitHubRepoDoesNotExist
+        orcoursetrion.lib.GitHubPreflightError
     Returns:
         None: Nothing returned, raises on failure
     """
-    github = GitHub(config.ORC_GH_API_URL, config.ORC_GH_OAUTH2_TOKEN)
+    github = github_client()
     repo_name = '{prefix}-{course}-{term}'.format(
         prefix=config.ORC_COURSE_PREFIX,
         course=course.replace('.', ''),
         term=term
     )
-    # Add the hook
-    github.add_web_hook(
-        config.ORC_STUDIO_ORG, repo_name, config.ORC_PRODUCTION_GITRELOAD
-    )
+    with _action(github, 'release_studio'):
+        Preflight(github).repo_exists(
+            config.ORC_STUDIO_ORG, repo_name
+        ).configured(
+            'ORC_PRODUCTION_GITRELOAD', config.ORC_PRODUCTION_GITRELOAD
+        ).run()
+
+        # Add the hook
+        github.add_web_hook(
+            config.ORC_STUDIO_ORG, repo_name, config.ORC_PRODUCTION_GITRELOAD
+        )
 
 
 def create_xml_repo(course, term, team=None, members=None, description=None):
@@ -188,6 +349,7 @@ def create_xml_repo(course, term, team=None, members=None, description=None):
         orcoursetrion.lib.GitHubUnknownError
         orcoursetrion.lib.GitHubNoTeamFound
         orcoursetrion.lib.GitHubRepoExists
+        orcoursetrion.lib.GitHubPreflightError
     Args:
         course (str): Course name to be used to name repo (i.e. 6.004r)
         term (str): Term the course is expected to run (i.e. 2015_Spring)
@@ -201,31 +363,49 @@ def create_xml_repo(course, term, team=None, members=None, description=None):
 
     """
 
-    github = GitHub(config.ORC_GH_API_URL, config.ORC_GH_OAUTH2_TOKEN)
-    repo_name = '{prefix}-{course}-{term}'.format(
-        prefix=config.ORC_COURSE_PREFIX,
-        course=course.replace('.', ''),
-        term=term
-    )
-    repo = github.create_repo(config.ORC_XML_ORG, repo_name, description)
-    # Add to the deployment team
-    github.add_team_repo(
-        config.ORC_XML_ORG, repo_name, config.ORC_XML_DEPLOY_TEAM
-    )
-
-    # Team matches repo_name if no team is passed.
-    if team is None:
-        team = repo_name
-
-    # Setup the team
-    github.put_team(config.ORC_XML_ORG, team, False, members)
-    github.add_team_repo(config.ORC_XML_ORG, repo_name, team)
-
-    # Add the hook
-    github.add_web_hook(
-        config.ORC_XML_ORG, repo_name, config.ORC_STAGING_GITRELOAD
-    )
-    return repo
+    github = github_client()
+    with _action(github, 'create_xml_repo'):
+        repo_name = '{prefix}-{course}-{term}'.format(
+            prefix=config.ORC_COURSE_PREFIX,
+            course=course.replace('.', ''),
+            term=term
+        )
+        Preflight(github).repo_absent(
+            config.ORC_XML_ORG, repo_name
+        ).team_exists(
+            config.ORC_XML_ORG, config.ORC_XML_DEPLOY_TEAM
+        ).configured(
+            'ORC_STAGING_GITRELOAD', config.ORC_STAGING_GITRELOAD
+        ).token_scopes(TEAM_SCOPE).run()
+
+        steps = _step_graph(github)
+        steps.add('create_repo', partial(
+            github.create_repo, config.ORC_XML_ORG, repo_name, description
+        ))
+        # Add to the deployment team
+        steps.add('add_deploy_team_repo', partial(
+            github.add_team_repo,
+            config.ORC_XML_ORG, repo_name, config.ORC_XML_DEPLOY_TEAM
+        ), requires=['create_repo'])
+
+        # Team matches repo_name if no team is passed.
+        if team is None:
+            team = repo_name
+
+        # Setup the team
+        steps.add('put_team', partial(
+            github.put_team, config.ORC_XML_ORG, team, False, members
+        ), requires=['create_repo'])
+        steps.add('add_team_repo', partial(
+            github.add_team_repo, config.ORC_XML_ORG, repo_name, team
+        ), requires=['put_team'])
+
+        # Add the hook
+        steps.add('add_web_hook', partial(
+            github.add_web_hook,
+            config.ORC_XML_ORG, repo_name, config.ORC_STAGING_GITRELOAD
+        ), requires=['create_repo'])
+        return steps.run()['create_repo']
 
 
 def rerun_xml(course, term):
@@ -248,13 +428,14 @@ def rerun_xml(course, term):
         int: Number of hooks removed
 
     """
-    github = GitHub(config.ORC_GH_API_URL, config.ORC_GH_OAUTH2_TOKEN)
+    github = github_client()
     repo_name = '{prefix}-{course}-{term}'.format(
         prefix=config.ORC_COURSE_PREFIX,
         course=course.replace('.', ''),
         term=term
     )
-    return github.delete_web_hooks(config.ORC_XML_ORG, repo_name)
+    with _action(github, 'rerun_xml'):
+        return github.delete_web_hooks(config.ORC_XML_ORG, repo_name)
 
 
 def release_xml(course, term):
@@ -271,19 +452,28 @@ def release_xml(course, term):
     Raises:
         requests.RequestException
         orcoursetrion.lib.GitHubUnknownError
+        orcoursetrion.lib.GitHubRepoDoesNotExist
+        orcoursetrion.lib.GitHubPreflightError
     Returns:
         None: Nothing returned, raises on failure
     """
-    github = GitHub(config.ORC_GH_API_URL, config.ORC_GH_OAUTH2_TOKEN)
+    github = github_client()
     repo_name = '{prefix}-{course}-{term}'.format(
         prefix=config.ORC_COURSE_PREFIX,
         course=course.replace('.', ''),
         term=term
     )
-    # Add the hook
-    github.add_web_hook(
-        config.ORC_XML_ORG, repo_name, config.ORC_PRODUCTION_GITRELOAD
-    )
+    with _action(github, 'release_xml'):
+        Preflight(github).repo_exists(
+            config.ORC_XML_ORG, repo_name
+        ).configured(
+            'ORC_PRODUCTION_GITRELOAD', config.ORC_PRODUCTION_GITRELOAD
+        ).run()
+
+        # Add the hook
+        github.add_web_hook(
+            config.ORC_XML_ORG, repo_name, config.ORC_PRODUCTION_GITRELOAD
+        )
 
 
 def put_team(org, team, read_only, members):
@@ -306,6 +496,6 @@ def put_team(org, team, read_only, members):
                 (https://developer.github.com/v3/orgs/teams/#response-1)
 
     """
-    github = GitHub(config.ORC_GH_API_URL, config.ORC_GH_OAUTH2_TOKEN)
-    team = github.put_team(org, team, read_only, members)
-    return team
+    github = github_client()
+    with _action(github, 'put_team'):
+        return github.put_team(org, team, read_only, members)
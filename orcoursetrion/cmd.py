@@ -4,9 +4,15 @@ Command line interface to orchestrion
 """
 from __future__ import print_function
 import argparse
+import cProfile
+import os
+import sys
+import time
 
 
 from orcoursetrion import actions
+from orcoursetrion.actions.batch import DEFAULT_BATCH_WORKERS
+from orcoursetrion.lib.github import GIT_STOPWATCH
 
 
 def run_create_export_repo(args):
@@ -72,6 +78,119 @@ def run_put_team(args):
     print('Team successfully modified/created.')
 
 
+def print_batch_result(batch_result):
+    """Print one line for the result of a batch manifest row"""
+    row = batch_result.row
+    if batch_result.error is None:
+        status = 'ok'
+        detail = ''
+        if isinstance(batch_result.result, dict):
+            detail = batch_result.result.get('html_url', '')
+        elif batch_result.result is not None:
+            detail = str(batch_result.result)
+    else:
+        status = 'FAILED'
+        detail = '{0}: {1}'.format(
+            type(batch_result.error).__name__, batch_result.error
+        )
+    print('{status} {action} {course} {term} ({seconds:.2f}s) {detail}'.format(
+        status=status,
+        action=row['action'],
+        course=row['course'],
+        term=row['term'],
+        seconds=batch_result.seconds,
+        detail=detail
+    ).rstrip())
+    sys.stdout.flush()
+
+
+def run_batch(args):
+    """Run every row of a manifest file using args"""
+    rows = actions.read_manifest(args.manifest)
+    summary = actions.run_batch(
+        rows, max_workers=args.workers, callback=print_batch_result
+    )
+    print(
+        '{succeeded} succeeded, {failed} failed in {seconds:.2f}s '
+        'using {api_calls} API calls'.format(**summary._asdict())
+    )
+    if summary.failed:
+        sys.exit(1)
+
+
+def print_profile(seconds, cpu_seconds, git_stopwatch, stats):
+    """Print where the time of an action went, to stderr.
+
+    Args:
+        seconds (float): Wall time of the action.
+        cpu_seconds (float): CPU time used by this process.
+        git_stopwatch (orcoursetrion.lib.Stopwatch): Time spent copying
+            repos with git.
+        stats (dict): :py:meth:`orcoursetrion.lib.RequestMetrics.stats`
+            of the requests made.
+    """
+    def share(part):
+        """Percent of the wall time"""
+        return 100.0 * part / seconds if seconds else 0.0
+
+    network_seconds = sum(x['seconds'] for x in stats['endpoints'])
+    lines = [
+        'Profile: {0:.2f}s wall time'.format(seconds),
+        '  {0:<10} {1:8.2f}s {2:5.1f}%  ({3} API calls)'.format(
+            'network', network_seconds, share(network_seconds),
+            sum(x['count'] for x in stats['endpoints'])
+        ),
+        '  {0:<10} {1:8.2f}s {2:5.1f}%  ({3} repo copies)'.format(
+            'git', git_stopwatch.seconds, share(git_stopwatch.seconds),
+            git_stopwatch.count
+        ),
+        '  {0:<10} {1:8.2f}s {2:5.1f}%'.format(
+            'local CPU', cpu_seconds, share(cpu_seconds)
+        ),
+    ]
+    if stats['endpoints']:
+        lines.append('API calls by endpoint:')
+        lines.append('  {0:>5} {1:>8} {2:>7} {3:>7} {4:>7}  {5}'.format(
+            'calls', 'seconds', 'p50', 'p95', 'p99', 'endpoint'
+        ))
+        for entry in stats['endpoints']:
+            lines.append(
+                '  {count:5d} {seconds:8.3f} {p50:7.3f} {p95:7.3f} '
+                '{p99:7.3f}  {method} {endpoint}'.format(**entry)
+            )
+    print('\n'.join(lines), file=sys.stderr)
+
+
+def run_profiled(args):
+    """Run the action using args, then print how long it spent waiting on
+    github, running git and computing locally, and the API calls it
+    made.  A cProfile dump is written too if asked for.
+    """
+    metrics = actions.github_metrics()
+    metrics.reset()
+    GIT_STOPWATCH.reset()
+    profiler = cProfile.Profile() if args.profile_output else None
+    start_times = os.times()
+    start = time.time()
+    try:
+        if profiler is None:
+            args.func(args)
+        else:
+            profiler.runcall(args.func, args)
+    finally:
+        seconds = time.time() - start
+        end_times = os.times()
+        if profiler is not None:
+            profiler.dump_stats(args.profile_output)
+        # User and system time of this process, git's is its children's
+        print_profile(
+            seconds,
+            sum(end_times[:2]) - sum(start_times[:2]),
+            GIT_STOPWATCH,
+            metrics.stats()
+        )
+
+
 def execute():
     """Execute command line orcoursetrion actions.
     """
@@ -79,6 +198,16 @@ def execute():
         prog='orcoursetrion',
         description=('Run an orchestrion action.\n')
     )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='After the action, print the time spent on the network, in '
+        'git, and on local CPU, and the API calls made to each endpoint'
+    )
+    parser.add_argument(
+        '--profile-output', type=str, metavar='FILE',
+        help='Also write cProfile stats of the action (its main thread) '
+        'to FILE for pstats, implies --profile'
+    )
     subparsers = parser.add_subparsers(
         title="Actions",
         description='Valid actions',
@@ -220,6 +349,25 @@ def execute():
     )
     put_team.set_defaults(func=run_put_team)
 
+    # Run a batch manifest
+    batch = subparsers.add_parser(
+        'batch',
+        help='Run the actions listed in a YAML or CSV manifest concurrently'
+    )
+    batch.add_argument(
+        '-f', '--manifest', type=str, required=True,
+        help='Manifest file with action, course, term, team, and members '
+        'columns (.yml/.yaml for YAML, otherwise CSV)'
+    )
+    batch.add_argument(
+        '-w', '--workers', type=int, default=DEFAULT_BATCH_WORKERS,
+        help='Number of manifest rows to run at the same time'
+    )
+    batch.set_defaults(func=run_batch)
+
     # Run the action
     args = parser.parse_args()
-    args.func(args)
+    if args.profile or args.profile_output:
+        run_profiled(args)
+    else:
+        args.func(args)
@@ -38,6 +38,50 @@ CONFIG_KEYS = {
 
     # Web hook URL (including basic auth) for course production LMS
     'ORC_PRODUCTION_GITRELOAD': None,
+
+    # Maximum number of concurrent GitHub requests for a single call
+    'ORC_GH_MAX_WORKERS': 8,
+
+    # Sustained GitHub reads per second to pace API calls at, writes
+    # are paced at a fifth of it
+    'ORC_GH_REQUESTS_PER_SECOND': 15,
+
+    # Times to retry GitHub requests failing with server/connection errors
+    'ORC_GH_MAX_RETRIES': 3,
+
+    # Longest wait in seconds before the first retry, doubling after
+    'ORC_GH_RETRY_BACKOFF': 0.5,
+
+    # Connections to the GitHub API kept open for reuse
+    'ORC_GH_POOL_SIZE': 10,
+
+    # Reuse GitHub connections between requests
+    'ORC_GH_KEEP_ALIVE': True,
+
+    # Protocol to talk to GitHub with, http1 or http2 (needs hyper)
+    'ORC_GH_TRANSPORT': 'http1',
+
+    # Seconds to keep an org's team index, 0 to disable it
+    'ORC_GH_TEAM_CACHE_TTL': 300,
+
+    # Directory to cache GitHub responses in, kept in memory if unset
+    'ORC_GH_CACHE_DIR': None,
+
+    # Maximum size in bytes of the GitHub response cache directory
+    'ORC_GH_CACHE_MAX_BYTES': 50 * 1024 * 1024,
+
+    # Directory to keep mirrors of copied repos in, not kept if unset
+    'ORC_GH_MIRROR_DIR': None,
+
+    # Maximum size in bytes of the repo mirror directory
+    'ORC_GH_MIRROR_MAX_BYTES': 2 * 1024 * 1024 * 1024,
+
+    # Number of actions started with the async versions run at once
+    'ORC_GH_ASYNC_WORKERS': 32,
+
+    # File to write GitHub request metrics to after each action, as JSON
+    # if it ends in .json, otherwise in the Prometheus text format
+    'ORC_GH_METRICS_FILE': None,
 }
 
 
@@ -2,20 +2,46 @@
 """
 Orchestrion library
 """
+from orcoursetrion.lib.cache import (
+    DiskCacheStore,
+    MemoryCacheStore,
+)
+from orcoursetrion.lib.future_github import FutureGitHub
 from orcoursetrion.lib.github import (
+    CopyResult,
     GitHub,
     GitHubException,
     GitHubRepoExists,
     GitHubRepoDoesNotExist,
     GitHubUnknownError,
-    GitHubNoTeamFound
+    GitHubNoTeamFound,
+    GitHubMembershipError,
+    close_shared_clients,
+    shared_client,
 )
+from orcoursetrion.lib.metrics import RequestMetrics, Stopwatch
+from orcoursetrion.lib.mirror import MirrorCache
+from orcoursetrion.lib.preflight import GitHubPreflightError, Preflight
+from orcoursetrion.lib.steps import StepGraph
 
 __all__ = [
+    'DiskCacheStore',
+    'MemoryCacheStore',
+    'FutureGitHub',
+    'CopyResult',
     'GitHub',
     'GitHubException',
     'GitHubRepoExists',
     'GitHubRepoDoesNotExist',
     'GitHubUnknownError',
     'GitHubNoTeamFound',
+    'GitHubMembershipError',
+    'close_shared_clients',
+    'shared_client',
+    'RequestMetrics',
+    'Stopwatch',
+    'MirrorCache',
+    'GitHubPreflightError',
+    'Preflight',
+    'StepGraph',
 ]
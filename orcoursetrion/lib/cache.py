@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Conditional request (ETag/Last-Modified) caching for github API calls
+"""
+import base64
+from collections import OrderedDict
+import errno
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+
+# Default maximum number of responses kept in memory
+DEFAULT_MAX_ENTRIES = 1024
+
+# Default maximum size of an on disk cache in bytes
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+# Headers describing the bytes on the wire, which don't apply to the
+# decoded body we store.
+TRANSFER_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+class MemoryCacheStore(object):
+    """Thread safe, least recently used, in memory response store."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        """Create an empty store.
+
+        Args:
+            max_entries (int): Number of responses to keep before the
+                least recently used are evicted.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get a stored response entry.
+
+        Args:
+            key (str): Cache key of the request.
+        Returns:
+            dict or None: Entry stored with :py:meth:`set`, or None.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return entry
+
+    def set(self, key, entry):
+        """Store a response entry, evicting old ones if needed.
+
+        Args:
+            key (str): Cache key of the request.
+            entry (dict): ``etag``, ``last_modified``, ``headers`` and
+                ``content`` of the response.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class DiskCacheStore(object):
+    """Response store in a directory, so it is shared between runs.
+
+    Each entry is a JSON file, and when the directory grows beyond
+    ``max_bytes`` the least recently used files are removed.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        """Create the store, and its directory if needed.
+
+        Args:
+            path (str): Directory to keep cached responses in.
+            max_bytes (int): Total size of the entries to keep before
+                the least recently used are evicted.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(path)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+
+    def _entry_path(self, key):
+        """Get the file name an entry is stored in"""
+        return os.path.join(
+            self.path, hashlib.sha1(key.encode('utf-8')).hexdigest()
+        )
+
+    def get(self, key):
+        """Get a stored response entry.
+
+        Args:
+            key (str): Cache key of the request.
+        Returns:
+            dict or None: Entry stored with :py:meth:`set`, or None.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path) as entry_file:
+                entry = json.load(entry_file)
+            # Mark as recently used for eviction
+            os.utime(entry_path, None)
+        except (IOError, OSError, ValueError):
+            return None
+        entry['content'] = base64.b64decode(entry['content'])
+        return entry
+
+    def set(self, key, entry):
+        """Store a response entry, evicting old ones if needed.
+
+        Args:
+            key (str): Cache key of the request.
+            entry (dict): ``etag``, ``last_modified``, ``headers`` and
+                ``content`` of the response.
+        """
+        entry = dict(
+            entry, content=base64.b64encode(entry['content']).decode('ascii')
+        )
+        # Write to a temporary file and rename so readers in other
+        # processes never see a partial entry.
+        handle, tmp_path = tempfile.mkstemp(dir=self.path, prefix='.tmp')
+        with os.fdopen(handle, 'w') as entry_file:
+            json.dump(entry, entry_file)
+        os.rename(tmp_path, self._entry_path(key))
+        self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until under ``max_bytes``"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.path):
+                if name.startswith('.tmp'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.path, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(x[1] for x in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+                total -= size
+
+
+class CachingAdapter(BaseAdapter):
+    """Transport adapter that makes GET requests conditional.
+
+    The ``ETag`` and ``Last-Modified`` of successful GET responses are
+    stored along with their body, and sent back as ``If-None-Match``
+    and ``If-Modified-Since`` the next time the same URL is requested
+    with the same credentials.  A ``304 Not Modified`` is then answered
+    with the stored body as a normal ``200`` response, and github
+    doesn't count it against the rate limit.
+    """
+
+    def __init__(self, store, adapter=None):
+        """Wrap ``adapter`` with a cache.
+
+        Args:
+            store (object): Store with ``get`` and ``set`` like
+                :py:class:`MemoryCacheStore` or :py:class:`DiskCacheStore`
+            adapter (requests.adapters.BaseAdapter): Adapter to send
+                requests with, defaults to a new ``HTTPAdapter``.
+        """
+        super(CachingAdapter, self).__init__()
+        self.store = store
+        self.adapter = adapter or HTTPAdapter()
+
+    @staticmethod
+    def cache_key(request):
+        """Build the key a request is stored under.
+
+        The credentials are part of the key (hashed, to keep tokens off
+        disk), since different tokens can see different results.
+
+        Args:
+            request (requests.PreparedRequest): Request being sent.
+        Returns:
+            str: Cache key.
+        """
+        auth = request.headers.get('Authorization', '')
+        return '{0} {1}'.format(
+            hashlib.sha1(auth.encode('utf-8')).hexdigest(), request.url
+        )
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        """Send the request, conditionally if it is a cached GET.
+
+        Args:
+            request (requests.PreparedRequest): Request being sent.
+            stream, timeout, verify, cert, proxies: Passed on to the
+                wrapped adapter.
+        Returns:
+            requests.Response: Response from github or the cache.
+        """
+        # pylint: disable=too-many-arguments
+        kwargs = dict(
+            stream=stream, timeout=timeout, verify=verify, cert=cert,
+            proxies=proxies
+        )
+        if request.method != 'GET':
+            return self.adapter.send(request, **kwargs)
+
+        key = self.cache_key(request)
+        entry = self.store.get(key)
+        if entry is not None:
+            if entry.get('etag'):
+                request.headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request.headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self.adapter.send(request, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            # Release the connection before swapping in the stored body
+            # pylint: disable=pointless-statement,protected-access
+            response.content
+            for name in TRANSFER_HEADERS:
+                response.headers.pop(name, None)
+            for name, value in entry['headers'].items():
+                if name not in response.headers:
+                    response.headers[name] = value
+            response.status_code = 200
+            response.reason = 'OK'
+            response._content = entry['content']
+            response.from_cache = True
+            return response
+
+        response.from_cache = False
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code == 200 and (etag or last_modified):
+            self.store.set(key, {
+                'etag': etag,
+                'last_modified': last_modified,
+                'headers': dict(
+                    (name, value)
+                    for name, value in response.headers.items()
+                    if name.lower() not in TRANSFER_HEADERS
+                ),
+                'content': response.content,
+            })
+        return response
+
+    def close(self):
+        """Close the wrapped adapter"""
+        self.adapter.close()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Github client whose calls return futures, for callers driving many
+calls at once from a thread pool.
+"""
+from functools import wraps
+
+from concurrent.futures import ThreadPoolExecutor
+
+from orcoursetrion.lib.github import GitHub
+
+
+# Default number of calls in flight at the same time
+DEFAULT_FUTURE_WORKERS = 32
+
+
+def _returns_future(method):
+    """Make a :py:class:`FutureGitHub` method submit the :py:class:`GitHub`
+    method of the same name, returning its future.
+    """
+    @wraps(method)
+    def submit(self, *args, **kwargs):
+        """Submit the call to the executor"""
+        return self.submit(
+            getattr(self.github, method.__name__), *args, **kwargs
+        )
+    return submit
+
+
+class FutureGitHub(object):
+    """Github client with the calls of :py:class:`GitHub`, returning a
+    :py:class:`concurrent.futures.Future` for each.
+
+    This is a thread pool adapter, not non-blocking I/O: each call
+    blocks a worker thread for as long as it takes, so at most
+    ``max_workers`` calls are in flight at once while the rest wait in
+    the pool's queue. Calls share the connection pool, rate limiting
+    and retries of the wrapped client.
+    Calls made inside a :py:meth:`GitHub.unit_of_work` run in it.
+
+    An asyncio event loop can await the futures with
+    ``asyncio.wrap_future``.
+    """
+    # pylint: disable=unused-argument
+
+    def __init__(self, github, max_workers=DEFAULT_FUTURE_WORKERS):
+        """Wrap a client.
+
+        Args:
+            github (orcoursetrion.lib.GitHub): Client to make calls with,
+                whose ``pool_size`` should be at least ``max_workers``.
+            max_workers (int): Most calls in flight at the same time.
+        """
+        self.github = github
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @classmethod
+    def connect(cls, api_url, oauth2_token, max_workers=DEFAULT_FUTURE_WORKERS,
+                **kwargs):
+        """Create a client with a connection for each worker.
+
+        Args:
+            api_url (str): Github API URL such as https://api.github.com/
+            oauth2_token (str): Github OAUTH2 token for v3
+            max_workers (int): Most calls in flight at the same time.
+            kwargs: Other :py:class:`GitHub` arguments.
+        Returns:
+            FutureGitHub: New client.
+        """
+        kwargs.setdefault('pool_size', max_workers)
+        return cls(GitHub(api_url, oauth2_token, **kwargs), max_workers)
+
+    def submit(self, func, *args, **kwargs):
+        """Call ``func`` on a worker, in the caller's unit of work.
+
+        Args:
+            func (callable): Function to call.
+            args: Positional arguments for ``func``.
+            kwargs: Keyword arguments for ``func``.
+        Returns:
+            concurrent.futures.Future: Future of what ``func`` returns.
+        """
+        work = self.github.current_work()
+
+        def call():
+            """Run the call in the unit of work"""
+            with work():
+                return func(*args, **kwargs)
+        return self.executor.submit(call)
+
+    @_returns_future
+    def create_repo(self, org, repo, description):
+        """Future of :py:meth:`GitHub.create_repo`"""
+
+    @_returns_future
+    def put_team(self, org, team_name, read_only, members):
+        """Future of :py:meth:`GitHub.put_team`"""
+
+    @_returns_future
+    def add_team_repo(self, org, repo, team, permission=None):
+        """Future of :py:meth:`GitHub.add_team_repo`"""
+
+    @_returns_future
+    def add_web_hook(self, org, repo, url):
+        """Future of :py:meth:`GitHub.add_web_hook`"""
+
+    @_returns_future
+    def delete_web_hooks(self, org, repo):
+        """Future of :py:meth:`GitHub.delete_web_hooks`"""
+
+    @_returns_future
+    def add_repo_file(self, org, repo, committer, message, path, contents):
+        """Future of :py:meth:`GitHub.add_repo_file`"""
+
+    @_returns_future
+    def add_repo_files(self, org, repo, committer, message, files):
+        """Future of :py:meth:`GitHub.add_repo_files`"""
+
+    def get_all(self, url, per_page=None):
+        """Get every item from a github list URL.
+
+        The pages after the first are fetched concurrently when github
+        says how many there are.
+
+        Args:
+            url(str): Full github URL with results.
+            per_page(int): Optional page size to ask for.
+        Returns:
+            concurrent.futures.Future: Future of the list of items.
+        """
+        # pylint: disable=protected-access
+        return self.submit(self.github._get_all, url, per_page)
+
+    def close(self):
+        """Wait for the calls in flight, and close the connections"""
+        self.executor.shutdown(wait=True)
+        self.github.close()
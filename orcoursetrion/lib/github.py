@@ -1,18 +1,70 @@
 # -*- coding: utf-8 -*-
+# The client covers most of the github API we use
+# pylint: disable=too-many-lines
 """
 Github class for making needed API calls to github
 """
 import base64
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import partial
 from itertools import chain
+import multiprocessing
+import os
+import re
 import shutil
 import tempfile
+import threading
+import time
 
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 import sh
 
+from orcoursetrion.lib.cache import CachingAdapter
+from orcoursetrion.lib.metrics import (
+    RequestMetrics,
+    Stopwatch,
+    TimingAdapter,
+)
+from orcoursetrion.lib.ratelimit import (
+    DEFAULT_REQUESTS_PER_SECOND,
+    RateLimitAdapter,
+)
+from orcoursetrion.lib.retry import (
+    DEFAULT_BACKOFF,
+    DEFAULT_MAX_RETRIES,
+    RetryAdapter,
+)
+from orcoursetrion.lib.singleflight import SingleFlight
+
 
 CLONE_DIR = 'cloned_repo'
 
+# Largest page size the github API will honor for list calls
+MAX_PER_PAGE = 100
+
+# Default number of threads used to make concurrent API calls
+DEFAULT_MAX_WORKERS = 8
+
+PAGE_REGEX = re.compile(r'[?&]page=(\d+)')
+
+# Characters github replaces with a dash when making a team's slug
+SLUG_REGEX = re.compile(r'[^a-z0-9_-]+')
+
+# Default number of seconds an org's team index is kept
+DEFAULT_TEAM_CACHE_TTL = 300
+
+# Default number of connections kept open to the github API
+DEFAULT_POOL_SIZE = 10
+
+# Protocols the client can talk to the github API with
+TRANSPORTS = ('http1', 'http2')
+
+# Time spent copying repos with git in this process
+GIT_STOPWATCH = Stopwatch()
+
 
 class GitHubException(Exception):
     """Base exception class others inherit."""
@@ -39,19 +91,249 @@ class GitHubNoTeamFound(GitHubException):
     pass
 
 
+class GitHubMembershipError(GitHubUnknownError):
+    """Some team membership changes failed"""
+    def __init__(self, message, results):
+        """Keep the results of every membership change.
+
+        Args:
+            message (str): Exception message.
+            results (dict): Results from
+                :py:meth:`GitHub.change_team_membership`
+        """
+        super(GitHubMembershipError, self).__init__(message)
+        self.results = results
+
+
+class TeamIndex(object):
+    """Thread safe index of team dictionaries by name for each org.
+
+    Each org's index expires ``ttl`` seconds after it was started, and
+    is marked complete once every team in the org has been added, at
+    which point a name missing from it is known not to be a team.
+    """
+    def __init__(self, ttl=DEFAULT_TEAM_CACHE_TTL):
+        """Create an empty index.
+
+        Args:
+            ttl (int): Seconds to keep an org's teams, if this is 0 or
+                less, nothing is kept.
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._orgs = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name):
+        """Normalize team names the same way github compares them"""
+        return name.strip().lower()
+
+    def _org_index(self, org):
+        """Get the unexpired index for ``org``, must hold ``_lock``"""
+        org_index = self._orgs.get(org)
+        if org_index is not None and org_index['expires'] <= time.time():
+            del self._orgs[org]
+            org_index = None
+        if org_index is None:
+            org_index = {
+                'expires': time.time() + self.ttl,
+                'complete': False,
+                'teams': {},
+            }
+            self._orgs[org] = org_index
+        return org_index
+
+    def get(self, org, name):
+        """Look up a team, and count the hit or miss.
+
+        Args:
+            org (str): Organization the team is in.
+            name (str): Team name.
+        Raises:
+            GitHubNoTeamFound: If the org is fully indexed and the
+                team isn't in it.
+        Returns:
+            dict or None: Team dictionary, or None if it isn't indexed.
+        """
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            org_index = self._org_index(org)
+            team = org_index['teams'].get(self._key(name))
+            if team is not None or org_index['complete']:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if team is None and org_index['complete']:
+            raise GitHubNoTeamFound(
+                '{0} not in list of teams for {1}'.format(name, org)
+            )
+        return team
+
+    def add(self, org, name, team):
+        """Add (or replace) a team in the index.
+
+        Args:
+            org (str): Organization the team is in.
+            name (str): Team name.
+            team (dict): Team dictionary from github.
+        """
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._org_index(org)['teams'][self._key(name)] = team
+
+    def mark_complete(self, org):
+        """Mark that every team in ``org`` has been indexed"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._org_index(org)['complete'] = True
+
+    def clear(self):
+        """Forget every indexed team"""
+        with self._lock:
+            self._orgs.clear()
+
+    def info(self):
+        """Get the current index statistics.
+
+        Returns:
+            dict: ``hits``, ``misses``, and number of ``teams`` indexed.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'teams': sum(
+                    len(x['teams']) for x in self._orgs.values()
+                ),
+            }
+
+
+# Outcome of one copy made by GitHub.bulk_shallow_copy_repos, ``error``
+# is None on success, or the error message.
+CopyResult = namedtuple(
+    'CopyResult', ['src_repo', 'dst_repo', 'branch', 'seconds', 'error']
+)
+
+
+def _copy_in_process(args):
+    """Make one shallow copy in a pool process, catching any failure.
+
+    Args:
+        args (tuple): ``(src_repo, dst_repo, branch, committer)``
+    Returns:
+        CopyResult: How the copy went.
+    """
+    src_repo, dst_repo, branch, committer = args
+    start = time.time()
+    try:
+        GitHub.shallow_copy_repo(src_repo, dst_repo, committer, branch)
+        error = None
+    except Exception as exc:  # pylint: disable=broad-except
+        # Exceptions don't all survive the trip back from the process
+        error = '{0}: {1}'.format(type(exc).__name__, exc)
+    return CopyResult(src_repo, dst_repo, branch, time.time() - start, error)
+
+
+def _transport_adapter(transport, pool_size):
+    """Get the adapter that sends requests over the wire.
+
+    Args:
+        transport (str): One of :py:const:`TRANSPORTS`
+        pool_size (int): Connections to keep open for HTTP/1.1
+    Raises:
+        ValueError: If the transport is unknown.
+        GitHubException: If HTTP/2 is wanted but hyper isn't installed.
+    Returns:
+        requests.adapters.BaseAdapter: New adapter.
+    """
+    if transport not in TRANSPORTS:
+        raise ValueError('Unknown transport {0}, use one of {1}'.format(
+            transport, ', '.join(TRANSPORTS)
+        ))
+    if transport == 'http1':
+        return HTTPAdapter(pool_maxsize=pool_size)
+    try:
+        from hyper.contrib import HTTP20Adapter
+    except ImportError:
+        raise GitHubException('hyper needs to be installed to use HTTP/2')
+    return HTTP20Adapter()
+
+
+def _sparse_patterns(include, exclude):
+    """Build the sparse checkout file for the paths to copy.
+
+    Args:
+        include (list): Patterns of paths to check out, or None for all.
+        exclude (list): Patterns of paths not to check out, or None.
+    Returns:
+        str: Contents of ``.git/info/sparse-checkout``
+    """
+    patterns = list(include or ['/*'])
+    patterns.extend('!{0}'.format(x) for x in exclude or [])
+    return ''.join('{0}\n'.format(x) for x in patterns)
+
+
 class GitHub(object):
     """
     API class for handling calls to github
     """
-    def __init__(self, api_url, oauth2_token):
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, api_url, oauth2_token,
+                 max_workers=DEFAULT_MAX_WORKERS,
+                 team_cache_ttl=DEFAULT_TEAM_CACHE_TTL, cache=None,
+                 requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                 max_retries=DEFAULT_MAX_RETRIES,
+                 retry_backoff=DEFAULT_BACKOFF, pool_size=DEFAULT_POOL_SIZE,
+                 keep_alive=True, mirrors=None, transport='http1'):
         """Initialize a requests session for use with this class by
         specifying the base API endpoint and key.
 
         Args:
             api_url (str): Github API URL such as https://api.github.com/
             oauth2_token (str): Github OAUTH2 token for v3
+            max_workers (int): Maximum number of concurrent requests
+                made on behalf of a single call (i.e. fetching pages).
+            team_cache_ttl (int): Seconds to keep the index of an org's
+                teams by name, 0 disables it.
+            cache (object): Optional response store, such as
+                :py:class:`~orcoursetrion.lib.cache.MemoryCacheStore`,
+                used to make GET requests conditional on the ETag or
+                Last-Modified of the last response.
+            requests_per_second (float): Sustained rate to pace requests
+                at, see
+                :py:class:`~orcoursetrion.lib.ratelimit.RateLimitAdapter`
+            max_retries (int): Times to retry requests that fail with a
+                server or connection error.
+            retry_backoff (float): Longest wait, in seconds, before the
+                first retry, see
+                :py:class:`~orcoursetrion.lib.retry.RetryAdapter`
+            pool_size (int): Connections to keep open for reuse, which
+                should be at least ``max_workers``.
+            keep_alive (bool): Reuse connections between requests,
+                otherwise each request sets up a new one.
+            mirrors (orcoursetrion.lib.MirrorCache): Optional cache of
+                local mirrors used when repos are copied with git.
+            transport (str): ``http1``, or ``http2`` to send every
+                request as a stream over one multiplexed connection
+                per host (which needs the ``hyper`` package).
+        Raises:
+            ValueError: If the transport is unknown.
+            GitHubException: If HTTP/2 is wanted but hyper isn't
+                installed.
         """
+        # pylint: disable=too-many-arguments
         self.api_url = api_url
+        self.max_workers = max_workers
+        self.mirrors = mirrors
+        # Identical lookups made at the same time share one request
+        self.flights = SingleFlight()
+        self.team_index = TeamIndex(team_cache_ttl)
+        self._work = threading.local()
         if not api_url.endswith('/'):
             self.api_url += '/'
         self.session = requests.Session()
@@ -60,35 +342,334 @@ class GitHub(object):
             'Authorization': 'token {0}'.format(oauth2_token),
             'User-Agent': 'Orcoursetrion',
         }
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        # Latency, size and status of every request by endpoint, timed
+        # on the wire so waits for pacing and retries aren't counted.
+        self.metrics = RequestMetrics()
+        # Layer pacing, retries and caching over the default transport,
+        # so that every retry is paced too.
+        self.rate_limiter = RateLimitAdapter(
+            TimingAdapter(
+                self.metrics,
+                _transport_adapter(transport, pool_size),
+                api_url=self.api_url,
+                action=partial(getattr, self._work, 'action', None)
+            ),
+            requests_per_second=requests_per_second
+        )
+        self.retrier = RetryAdapter(
+            self.rate_limiter, max_retries=max_retries, backoff=retry_backoff
+        )
+        adapter = self.retrier
+        if cache is not None:
+            adapter = CachingAdapter(cache, adapter)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Scopes of the token, as last reported with a response
+        self._token_scopes = []
+        self.session.hooks['response'].append(self._track_scopes)
+
+    @contextmanager
+    def unit_of_work(self, repos=None, action=None):
+        """Remember repo lookups until the end of the block.
+
+        Inside the block, :py:meth:`_get_repo` only asks github about a
+        repo once (remembering repos that don't exist too), and
+        :py:meth:`create_repo` records the repo it creates.  Blocks can
+        be nested, the lookups are kept until the outermost one ends,
+        and each thread has its own unless it joins another thread's
+        with :py:meth:`current_work`.
+
+        Use it around a series of calls that should see a consistent
+        view, such as one action, since changes made outside of this
+        client in the meantime aren't noticed.
+
+        Args:
+            repos (dict): Lookups of another unit of work to share.
+            action (str): Optional name of the action, which requests
+                made in the block are counted against in
+                :py:attr:`metrics`.  Only the outermost block's is used.
+        """
+        depth = getattr(self._work, 'depth', 0)
+        if depth == 0:
+            self._work.repos = {} if repos is None else repos
+            self._work.action = action
+        self._work.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._work.depth -= 1
+            if self._work.depth == 0:
+                del self._work.repos
+                del self._work.action
+
+    def current_work(self):
+        """Get a way for other threads to join this thread's unit of work.
+
+        Returns:
+            callable: Takes no arguments and returns a context manager
+                like :py:meth:`unit_of_work` that shares the current
+                lookups and action, or starts its own if there is no
+                unit of work.
+        """
+        return partial(
+            self.unit_of_work,
+            getattr(self._work, 'repos', None),
+            getattr(self._work, 'action', None)
+        )
+
+    def _remember_repo(self, org, repo, repo_dict):
+        """Record a repo (or None if it doesn't exist) in the current unit
+        of work, if there is one.
+        """
+        repos = getattr(self._work, 'repos', None)
+        if repos is not None:
+            repos[(org.lower(), repo.lower())] = repo_dict
+
+    def close(self):
+        """Close the connections held open by this client"""
+        self.session.close()
+
+    def get_rate_limit(self, refresh=False):
+        """Get the remaining API budget, so large jobs can be planned.
+
+        The budget is tracked from the headers of every response, and
+        is only requested from
+        https://developer.github.com/v3/rate_limit/ (which doesn't
+        count against it) if nothing has been seen yet or ``refresh``
+        is True.
+
+        Args:
+            refresh (bool): Ask github for the current budget.
+        Raises:
+            requests.RequestException
+        Returns:
+            dict: See
+                :py:meth:`~orcoursetrion.lib.ratelimit.RateLimitAdapter.budget`
+        """
+        budget = self.rate_limiter.budget()
+        if refresh or budget['remaining'] is None:
+            # Rate limiting can be disabled on github enterprise, in
+            # which case this 404s and the budget stays unknown.
+            self.session.get('{url}rate_limit'.format(url=self.api_url))
+            budget = self.rate_limiter.budget()
+        return budget
+
+    def _track_scopes(self, response, *args, **kwargs):
+        """Response hook that records the scopes github reports for our
+        token.
+        """
+        # pylint: disable=unused-argument
+        scopes = response.headers.get('X-OAuth-Scopes')
+        if scopes is not None:
+            scopes = frozenset(
+                x.strip() for x in scopes.split(',') if x.strip()
+            )
+        self._token_scopes[:] = [scopes]
+        return response
+
+    def get_token_scopes(self):
+        """Get the OAuth scopes of our token.
+
+        Github reports them with every response, so the API root is
+        only requested if nothing has been requested yet.
+
+        Raises:
+            requests.RequestException
+        Returns:
+            frozenset or None: Scopes of the token, or None if github
+                doesn't report them (i.e. not an OAuth token).
+        """
+        if not self._token_scopes:
+            self.session.get(self.api_url)
+        return self._token_scopes[0]
+
+    def get_retry_stats(self):
+        """Get how many requests were retried, and how long we waited.
+
+        Returns:
+            dict: See :py:meth:`~orcoursetrion.lib.retry.RetryAdapter.stats`
+        """
+        return self.retrier.stats()
+
+    def _post_created(self, url, payload, find_created):
+        """Create something with a POST, retrying transient failures.
+
+        POSTs aren't idempotent, and a server or connection error
+        doesn't mean the first attempt didn't go through, so before
+        retrying ``find_created`` is called to check for what we were
+        creating.
 
-    def _get_all(self, url):
+        Args:
+            url (str): URL to POST to.
+            payload (dict): JSON body of the request.
+            find_created (callable): Takes no arguments and returns the
+                dictionary of what the POST creates if it exists, or None.
+        Raises:
+            GitHubUnknownError
+            requests.exceptions.RequestException
+        Returns:
+            dict: Dictionary of the created object from github.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self.session.post(url, json=payload)
+            except requests.ConnectionError as error:
+                created = find_created()
+                if created is not None:
+                    return created
+                if not self.retrier.should_retry(attempt):
+                    raise error
+            else:
+                if not self.retrier.is_transient(response):
+                    if response.status_code != 201:
+                        raise GitHubUnknownError(response.text)
+                    return response.json()
+                created = find_created()
+                if created is not None:
+                    return created
+                if not self.retrier.should_retry(attempt):
+                    raise GitHubUnknownError(response.text)
+            self.retrier.wait(attempt)
+
+    def _get_all(self, url, per_page=None):
         """Return all results from URL given (i.e. page through them)
 
+        The first page is requested by itself, and if the ``Link``
+        header has a ``last`` relation, the rest of the pages are
+        fetched concurrently (up to ``max_workers`` at a time) and
+        put back together in order.  Otherwise we fall back to
+        following ``next`` links one at a time.
+
+        Threads asking for the same list at the same time share the
+        requests, and the list returned.
+
         Args:
             url(str): Full github URL with results.
+            per_page(int): Optional page size to ask for, up to
+                :py:const:`MAX_PER_PAGE`.
+        Raises:
+            GitHubUnknownError
         Returns:
-            list: List of items returned.
-        """
-        results = None
-        response = self.session.get(url)
-        if response.status_code == 200:
-            results = response.json()
-            while (
-                    response.links.get('next', False) and
-                    response.status_code == 200
-            ):
-                response = self.session.get(response.links['next']['url'])
-                results += response.json()
-        if response.status_code not in [200, 404]:
+            list: List of items returned, or None if the URL 404'd.
+        """
+        return self.flights.run(
+            ('all', url, per_page), self._fetch_all, url, per_page
+        )
+
+    def _fetch_all(self, url, per_page):
+        """Request every page of a list, see :py:meth:`_get_all`"""
+        params = {}
+        if per_page is not None:
+            params['per_page'] = per_page
+        response = self.session.get(url, params=params)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
             raise GitHubUnknownError(response.text)
+        results = response.json()
+
+        last_page = self._last_page(response)
+        if last_page is not None:
+            pages = range(2, last_page + 1)
+            if not pages:
+                return results
+            workers = min(self.max_workers, len(pages))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for page_results in executor.map(
+                        partial(self._get_page, url, params), pages
+                ):
+                    results += page_results
+            return results
+
+        while response.links.get('next', False):
+            response = self.session.get(response.links['next']['url'])
+            if response.status_code != 200:
+                raise GitHubUnknownError(response.text)
+            results += response.json()
         return results
 
-    def _get_repo(self, org, repo):
+    @staticmethod
+    def _last_page(response):
+        """Get the number of the last page from the ``Link`` header.
+
+        Args:
+            response (requests.Response): First page of a list call.
+        Returns:
+            int or None: Last page number, or None if github didn't
+                tell us (single page or no ``last`` relation).
+        """
+        last_link = response.links.get('last')
+        if not last_link:
+            return None
+        match = PAGE_REGEX.search(last_link['url'])
+        if match is None:
+            return None
+        return int(match.group(1))
+
+    def _get_page(self, url, params, page):
+        """Get a single page of results from a list URL.
+
+        Args:
+            url (str): Full github URL with results.
+            params (dict): Query parameters to send along with ``page``.
+            page (int): Page number to retrieve.
+        Raises:
+            GitHubUnknownError
+        Returns:
+            list: Items on that page.
+        """
+        page_params = dict(params, page=page)
+        response = self.session.get(url, params=page_params)
+        if response.status_code != 200:
+            raise GitHubUnknownError(response.text)
+        return response.json()
+
+    def iter_all(self, url, per_page=None):
+        """Iterate over all results from URL given, a page at a time.
+
+        Unlike :py:meth:`_get_all`, pages are only requested as the
+        items from the previous page are consumed, so stopping early
+        avoids fetching the rest of the list.
+
+        Args:
+            url(str): Full github URL with results.
+            per_page(int): Optional page size to ask for, up to
+                :py:const:`MAX_PER_PAGE`.
+        Raises:
+            GitHubUnknownError
+        Yields:
+            dict: Each item returned, nothing if the URL 404'd.
+        """
+        params = {}
+        if per_page is not None:
+            params['per_page'] = per_page
+        response = self.session.get(url, params=params)
+        if response.status_code == 404:
+            return
+        while True:
+            if response.status_code != 200:
+                raise GitHubUnknownError(response.text)
+            for item in response.json():
+                yield item
+            if not response.links.get('next', False):
+                return
+            response = self.session.get(response.links['next']['url'])
+
+    def _get_repo(self, org, repo, refresh=False):
         """Either return the repo dictionary, or None if it doesn't exists.
 
+        Inside a :py:meth:`unit_of_work` the answer is remembered, and
+        threads looking up the same repo at the same time (unless
+        refreshing) share one request.
+
         Args:
             org (str): Organization the repo lives in.
             repo (str): The name of the repo.
+            refresh (bool): Ask github even if the answer is remembered.
         Raises:
             requests.exceptions.RequestException
             GitHubUnknownError
@@ -103,16 +684,80 @@ class GitHub(object):
             repo=repo
         )
 
+        repos = getattr(self._work, 'repos', None)
+        key = (org.lower(), repo.lower())
+        if repos is not None and not refresh and key in repos:
+            return repos[key]
+
+        if refresh:
+            repo_dict = self._fetch_repo(repo_url)
+        else:
+            repo_dict = self.flights.run(
+                ('repo',) + key, self._fetch_repo, repo_url
+            )
+        self._remember_repo(org, repo, repo_dict)
+        return repo_dict
+
+    def _fetch_repo(self, repo_url):
+        """Request a repo, see :py:meth:`_get_repo`"""
         # Try and get the URL, if it 404's we are good, otherwise raise
         repo_response = self.session.get(repo_url)
         if repo_response.status_code == 200:
             return repo_response.json()
-        if repo_response.status_code != 404:
-            raise GitHubUnknownError(repo_response.text)
+        if repo_response.status_code == 404:
+            return None
+        raise GitHubUnknownError(repo_response.text)
+
+    @staticmethod
+    def _team_slug(team):
+        """Build the slug github gives a team from its name.
+
+        Args:
+            team (str): Team name.
+        Returns:
+            str: Team slug, i.e. ``my-team`` for ``My Team``.
+        """
+        return SLUG_REGEX.sub('-', team.strip().lower()).strip('-')
+
+    def _get_team_by_slug(self, org, team):
+        """Get a team directly from the single team endpoint via its slug.
+
+        https://developer.github.com/v3/teams/#get-team-by-name
+
+        Args:
+            org (str): Organization the team is in.
+            team (str): Team to find by name.
+        Raises:
+            GitHubUnknownError
+        Returns:
+            dict or None: Team dictionary, or None if the slug we built
+                didn't find the team.
+        """
+        team_url = '{url}orgs/{org}/teams/{slug}'.format(
+            url=self.api_url,
+            org=org,
+            slug=self._team_slug(team)
+        )
+        response = self.session.get(team_url)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise GitHubUnknownError(response.text)
+        found_team = response.json()
+        # Slugs aren't guaranteed to be unique to a name, so verify it
+        if found_team['name'].strip().lower() != team.strip().lower():
+            return None
+        return found_team
 
     def _find_team(self, org, team):
         """Find a team in an org by name, or raise.
 
+        Teams are found in :py:attr:`team_index` first.  Otherwise the
+        team is looked up directly by its slug, and only if that misses
+        do we page through the teams in the org, indexing them as we go.
+        Threads looking for the same team at the same time share the
+        lookup.
+
         Args:
             org (str): Organization to create the repo in.
             team (str): Team to find by name.
@@ -125,25 +770,40 @@ class GitHub(object):
             dict: Team dictionary
                   (https://developer.github.com/v3/orgs/teams/#response)
         """
+        found_team = self.team_index.get(org, team)
+        if found_team is not None:
+            return found_team
+        return self.flights.run(
+            ('team', org.lower(), team.strip().lower()),
+            self._look_up_team, org, team
+        )
+
+    def _look_up_team(self, org, team):
+        """Find a team on github, see :py:meth:`_find_team`"""
+        found_team = self._get_team_by_slug(org, team)
+        if found_team is not None:
+            self.team_index.add(org, team, found_team)
+            return found_team
+
         list_teams_url = '{url}orgs/{org}/teams'.format(
             url=self.api_url,
             org=org
         )
-        teams = self._get_all(list_teams_url)
-        if not teams:
+        teams_found = False
+        teams = self.iter_all(list_teams_url, per_page=MAX_PER_PAGE)
+        for found_team in teams:
+            teams_found = True
+            self.team_index.add(org, found_team['name'], found_team)
+            if found_team['name'].strip().lower() == team.strip().lower():
+                return found_team
+        if not teams_found:
             raise GitHubUnknownError(
                 "No teams found in org. This shouldn't happen"
             )
-        found_team = [
-            x for x in teams
-            if x['name'].strip().lower() == team.strip().lower()
-        ]
-        if len(found_team) != 1:
-            raise GitHubNoTeamFound(
-                '{0} not in list of teams for {1}'.format(team, org)
-            )
-        found_team = found_team[0]
-        return found_team
+        self.team_index.mark_complete(org)
+        raise GitHubNoTeamFound(
+            '{0} not in list of teams for {1}'.format(team, org)
+        )
 
     def create_repo(self, org, repo, description):
         """Creates a new github repository or raises exceptions
@@ -175,10 +835,12 @@ class GitHub(object):
             'description': description,
             'private': True,
         }
-        repo_create_response = self.session.post(create_url, json=payload)
-        if repo_create_response.status_code != 201:
-            raise GitHubUnknownError(repo_create_response.text)
-        return repo_create_response.json()
+        # The repo was just found missing, so check again after failures
+        repo_dict = self._post_created(
+            create_url, payload, partial(self._get_repo, org, repo, True)
+        )
+        self._remember_repo(org, repo, repo_dict)
+        return repo_dict
 
     def _create_team(self, org, team_name, read_only):
         """Internal function to create a team.
@@ -204,13 +866,13 @@ class GitHub(object):
             url=self.api_url,
             org=org
         )
-        response = self.session.post(create_url, json={
-            'name': team_name,
-            'permission': permission
-        })
-        if response.status_code != 201:
-            raise GitHubUnknownError(response.text)
-        return response.json()
+        team_dict = self._post_created(
+            create_url,
+            {'name': team_name, 'permission': permission},
+            partial(self._get_team_by_slug, org, team_name)
+        )
+        self.team_index.add(org, team_name, team_dict)
+        return team_dict
 
     def put_team(self, org, team_name, read_only, members):
         """Create a team in a github organization.
@@ -234,6 +896,8 @@ class GitHub(object):
 
         Raises:
             GitHubUnknownError
+            GitHubMembershipError: If any membership changes failed,
+                raised after all of them have been attempted.
             requests.RequestException
 
         Returns:
@@ -258,10 +922,14 @@ class GitHub(object):
             url=self.api_url,
             id=team_dict['id']
         )
-        existing_members = self._get_all(members_url)
-
-        # Filter list of dicts down to just username list
-        existing_members = [x['login'] for x in existing_members]
+        # Filter list of dicts down to just username list, fetching
+        # every page at once since we need all of them.
+        existing_members = [
+            x['login']
+            for x in self._get_all(
+                members_url, per_page=MAX_PER_PAGE
+            ) or []
+        ]
 
         # Grab everyone that should no longer be members
         remove_members = dict(
@@ -277,27 +945,85 @@ class GitHub(object):
             chain(remove_members.items(), add_members.items())
         )
         # Now do the adds and removes of membership to sync them
-        for member, add in membership_dict.items():
-            url = '{url}teams/{id}/memberships/{member}'.format(
-                url=self.api_url,
-                id=team_dict['id'],
-                member=member
+        results = self.change_team_membership(
+            team_dict['id'], membership_dict
+        )
+        failed = sorted(
+            (member, result['error'])
+            for member, result in results.items()
+            if result['error'] is not None
+        )
+        if failed:
+            raise GitHubMembershipError(
+                'Failed to add or remove {0}. Got: {1}'.format(
+                    ', '.join(x[0] for x in failed),
+                    '; '.join(x[1] for x in failed)
+                ),
+                results
             )
+
+        return team_dict
+
+    def _change_member(self, team_id, member, add):
+        """Add or remove a single team member.
+
+        Args:
+            team_id (int): ID of the team.
+            member (str): Github username.
+            add (bool): True to add the member, False to remove them.
+        Returns:
+            str or None: Error text, or None if it succeeded.
+        """
+        url = '{url}teams/{id}/memberships/{member}'.format(
+            url=self.api_url,
+            id=team_id,
+            member=member
+        )
+        try:
             if add:
                 response = self.session.put(url)
             else:
                 response = self.session.delete(url)
+        except requests.RequestException as error:
+            return str(error)
+        if response.status_code not in [200, 204]:
+            return response.text
+        return None
 
-            if response.status_code not in [200, 204]:
-                raise GitHubUnknownError(
-                    'Failed to add or remove {0}. Got: {1}'.format(
-                        member, response.text
-                    )
-                )
+    def change_team_membership(self, team_id, membership_dict):
+        """Concurrently add and remove team members.
 
-        return team_dict
+        Uses
+        https://developer.github.com/v3/orgs/teams/#add-team-membership
+        and
+        https://developer.github.com/v3/orgs/teams/#remove-team-membership
+        with up to ``max_workers`` requests at a time.  Every change is
+        attempted, even if some fail.
+
+        Args:
+            team_id (int): ID of the team.
+            membership_dict (dict): Github usernames mapped to True to
+                add them, or False to remove them.
+        Returns:
+            dict: Each username mapped to a dictionary with ``add``, and
+                ``error``, which is None if the change succeeded, or
+                the error encountered.
+        """
+        if not membership_dict:
+            return {}
+        members = list(membership_dict.items())
+        workers = min(self.max_workers, len(members))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            errors = executor.map(
+                lambda change: self._change_member(team_id, *change),
+                members
+            )
+            return dict(
+                (member, {'add': add, 'error': error})
+                for (member, add), error in zip(members, errors)
+            )
 
-    def add_team_repo(self, org, repo, team):
+    def add_team_repo(self, org, repo, team, permission=None):
         """Add a repo to an existing team (by name) in the specified org.
 
         We first look up the team to get its ID
@@ -309,6 +1035,9 @@ class GitHub(object):
             org (str): Organization to create the repo in.
             repo (str): Name of the repo to create.
             team (str): Name of team to add.
+            permission (str): Access to grant the team, ``pull``,
+                ``push`` or ``admin``. Without it, the team gets the
+                permission it was created with.
         Raises:
             GitHubNoTeamFound
             GitHubUnknownError
@@ -322,7 +1051,10 @@ class GitHub(object):
             org=org,
             repo=repo
         )
-        response = self.session.put(team_repo_url)
+        payload = None
+        if permission is not None:
+            payload = {'permission': permission}
+        response = self.session.put(team_repo_url, json=payload)
         if response.status_code != 204:
             raise GitHubUnknownError(response.text)
 
@@ -358,10 +1090,15 @@ class GitHub(object):
                 'url': url,
             }
         }
-        response = self.session.post(hook_url, json=payload)
-        if response.status_code != 201:
-            raise GitHubUnknownError(response.text)
-        return response.json()
+
+        def find_hook():
+            """Find a hook already added for ``url``"""
+            for hook in self.iter_all(hook_url, per_page=MAX_PER_PAGE):
+                if hook.get('config', {}).get('url') == url:
+                    return hook
+            return None
+
+        return self._post_created(hook_url, payload, find_hook)
 
     def delete_web_hooks(self, org, repo):
         """Delete all the Web hooks for a repository
@@ -392,17 +1129,24 @@ class GitHub(object):
             org=org,
             repo=repo
         )
-        hooks = self._get_all(url)
+        # Only keep the hook URLs, and finish listing before deleting,
+        # since deleting would shift hooks onto pages we already read.
+        hook_urls = [
+            hook['url']
+            for hook in self._get_all(url, per_page=MAX_PER_PAGE) or []
+        ]
         num_hooks_removed = 0
-        for hook in hooks or []:
-            response = self.session.delete(hook['url'])
+        for hook_url in hook_urls:
+            response = self.session.delete(hook_url)
             if response.status_code != 204:
                 raise GitHubUnknownError(response.text)
             num_hooks_removed += 1
         return num_hooks_removed
 
     @staticmethod
-    def shallow_copy_repo(src_repo, dst_repo, committer, branch=None):
+    @GIT_STOPWATCH.timed
+    def shallow_copy_repo(src_repo, dst_repo, committer, branch=None,
+                          mirrors=None, include=None, exclude=None):
         """Copies one branch repo's contents to a new repo in the same
         organization without history.
 
@@ -412,7 +1156,9 @@ class GitHub(object):
 
         The basic workflow is:
 
-        - Clone source repo
+        - Clone source repo, referencing its local mirror if ``mirrors``
+          is given, or only the paths wanted if ``include`` or
+          ``exclude`` are given
         - Remove source repo ``.git`` folder
         - Initialize as new git repo
         - Set identity
@@ -426,6 +1172,15 @@ class GitHub(object):
                 and e-mail to use in the initial commit of the
                 destination repo.
             branch (str): Option branch, if not specified default is used.
+            mirrors (orcoursetrion.lib.MirrorCache): Optional cache of
+                mirrors to fetch the source through, so only changes
+                since the last copy of it are downloaded.
+            include (list): Optional patterns (as in ``.gitignore``) of
+                the paths to copy, everything if not specified.
+            exclude (list): Optional patterns of paths not to copy,
+                i.e. ``['static/', 'drafts/']``.  Only the contents of
+                paths that are copied are downloaded, using a partial
+                clone and sparse checkout, and ``mirrors`` isn't used.
         Raises:
             sh.ErrorReturnCode
         Returns:
@@ -433,34 +1188,239 @@ class GitHub(object):
 
         """
         # Disable member use because pylint doesn't get dynamic members
-        # pylint: disable=no-member
+        # pylint: disable=no-member,too-many-arguments
 
-        # Grab current working directory so we return after we are done
-        cwd = unicode(sh.pwd().rstrip('\n'))
+        # Every git command is given its working directory, rather than
+        # changing the process's, so copies can run in threads.
         tmp_dir = tempfile.mkdtemp(prefix='orc_git')
+        clone_dir = os.path.join(tmp_dir, CLONE_DIR)
+        clone_args = {'depth': 1}
+        if branch is not None:
+            clone_args['branch'] = branch
         try:
-            sh.cd(tmp_dir)
-            if branch is None:
-                sh.git.clone(src_repo, CLONE_DIR, depth=1)
+            if include or exclude:
+                # Only fetch the contents of files as they're checked out
+                sh.git.clone(
+                    src_repo, clone_dir, filter='blob:none',
+                    no_checkout=True, **clone_args
+                )
+                git = sh.git.bake(_cwd=clone_dir)
+                git.config('core.sparseCheckout', 'true')
+                with open(os.path.join(
+                    clone_dir, '.git', 'info', 'sparse-checkout'
+                ), 'w') as sparse_file:
+                    sparse_file.write(_sparse_patterns(include, exclude))
+                git('read-tree', '-mu', 'HEAD')
+            elif mirrors is None:
+                sh.git.clone(src_repo, clone_dir, **clone_args)
             else:
-                sh.git.clone(src_repo, CLONE_DIR, depth=1, branch=branch)
-
-            sh.cd(CLONE_DIR)
-            shutil.rmtree('.git')
-            sh.git.init()
-            sh.git.config('user.email', committer['email'])
-            sh.git.config('user.name', committer['name'])
-            sh.git.remote.add.origin(dst_repo)
-            sh.git.add('.')
-            sh.git.commit(
+                with mirrors.reference(src_repo) as mirror:
+                    sh.git.clone(
+                        src_repo, clone_dir, reference=mirror, **clone_args
+                    )
+
+            shutil.rmtree(os.path.join(clone_dir, '.git'))
+            git = sh.git.bake(_cwd=clone_dir)
+            git.init()
+            git.config('user.email', committer['email'])
+            git.config('user.name', committer['name'])
+            git.remote.add.origin(dst_repo)
+            git.add('.')
+            git.commit(
                 m='Initial rerun copy by Orcoursetrion from {0}'.format(
                     src_repo
                 )
             )
-            sh.git.push.origin.master(f=True)
+            git.push.origin.master(f=True)
         finally:
             shutil.rmtree(tmp_dir, ignore_errors=True)
-            sh.cd(cwd)
+
+    @staticmethod
+    def bulk_shallow_copy_repos(copies, committer, processes=None):
+        """Make many :py:meth:`shallow_copy_repo` copies at once, i.e.
+        to rerun a department's courses.
+
+        Git's compression and hashing keep a copy busy, so copies are
+        run on a pool of processes, each in its own temporary directory.
+        A failing copy doesn't stop the others.
+
+        Args:
+            copies (list): ``(src_repo, dst_repo, branch)`` git urls and
+                optional branch (None for the default) of each copy.
+            committer (dict): {'name': ..., 'email': ...} for the initial
+                commit of each destination repo.
+            processes (int): Copies made at the same time, defaults to
+                the number of CPUs.
+        Returns:
+            list: :py:class:`CopyResult` of each copy, in the order given.
+        """
+        copies = [
+            (src_repo, dst_repo, branch, committer)
+            for src_repo, dst_repo, branch in copies
+        ]
+        if not copies:
+            return []
+        pool = multiprocessing.Pool(
+            min(processes or multiprocessing.cpu_count(), len(copies))
+        )
+        try:
+            return pool.map(_copy_in_process, copies)
+        finally:
+            # Every copy is done (or we failed), so stop the workers
+            pool.terminate()
+            pool.join()
+
+    def _generate_repo(self, src_org, src_repo, dst_org, dst_repo,
+                       description):
+        """Mark a repo as a template and generate a new repo from it,
+        which github copies without any history.  Call it inside a
+        :py:meth:`unit_of_work` that already looked up the source.
+
+        Args:
+            src_org (str): Organization of the template repo.
+            src_repo (str): Name of the template repo.
+            dst_org (str): Organization to create the new repo in.
+            dst_repo (str): Name of the new repo.
+            description (str): Description of the new repo.
+        Raises:
+            GitHubUnknownError
+            requests.exceptions.RequestException
+        Returns:
+            dict or None: Github dictionary of the new repo, or None if
+                the source can't be made a template (i.e. the server
+                doesn't support templates).
+        """
+        # pylint: disable=too-many-arguments
+        src_url = '{url}repos/{org}/{repo}'.format(
+            url=self.api_url,
+            org=src_org,
+            repo=src_repo
+        )
+        if not self._get_repo(src_org, src_repo).get('is_template'):
+            response = self.session.patch(src_url, json={'is_template': True})
+            # Servers without templates ignore the field
+            if (response.status_code != 200 or
+                    not response.json().get('is_template')):
+                return None
+            self._remember_repo(src_org, src_repo, response.json())
+
+        repo_dict = self._post_created(
+            '{0}/generate'.format(src_url),
+            {
+                'owner': dst_org,
+                'name': dst_repo,
+                'description': description,
+                'private': True,
+            },
+            partial(self._get_repo, dst_org, dst_repo, True)
+        )
+        self._remember_repo(dst_org, dst_repo, repo_dict)
+        return repo_dict
+
+    def copy_repo(self, src_org, src_repo, dst_org, dst_repo, committer,
+                  description=None, branch=None, include=None, exclude=None):
+        """Create a new repo with a copy of another's contents, without
+        history.
+
+        The copy is made on github's side by generating the new repo
+        from the source as a template
+        (https://developer.github.com/v3/repos/#create-repository-using-a-repository-template),
+        marking the source as a template if it isn't one yet.  If that
+        isn't possible, a ``branch`` other than the default is to be
+        copied, or only some paths are, the repo is created and filled with
+        :py:meth:`shallow_copy_repo` through their ``ssh_url``, using
+        :py:attr:`mirrors` if set.
+
+        Github fills a generated repo in the background, so its
+        contents may take a moment to show up.
+
+        Args:
+            src_org (str): Organization of the repo to copy.
+            src_repo (str): Name of the repo to copy.
+            dst_org (str): Organization to create the new repo in.
+            dst_repo (str): Name of the new repo.
+            committer (dict): {'name': ..., 'email': ...} for the commit
+                of a copy that isn't made from a template.
+            description (str): Optional description of the new repo.
+            branch (str): Optional branch to copy, default is used if
+                not specified.
+            include (list): Optional patterns of paths to copy, see
+                :py:meth:`shallow_copy_repo`
+            exclude (list): Optional patterns of paths not to copy.
+        Raises:
+            GitHubRepoDoesNotExist
+            GitHubRepoExists
+            GitHubUnknownError
+            requests.exceptions.RequestException
+            sh.ErrorReturnCode
+        Returns:
+            dict: Github dictionary of the new repo
+                (https://developer.github.com/v3/repos/#create)
+        """
+        # pylint: disable=too-many-arguments
+        with self.unit_of_work():
+            src_dict = self._get_repo(src_org, src_repo)
+            if src_dict is None:
+                raise GitHubRepoDoesNotExist(
+                    'Repository {0}/{1} does not exist'.format(
+                        src_org, src_repo
+                    )
+                )
+            if self._get_repo(dst_org, dst_repo) is not None:
+                raise GitHubRepoExists('This repository already exists')
+
+            if not (include or exclude) and (
+                    branch is None or branch == src_dict.get('default_branch')
+            ):
+                repo_dict = self._generate_repo(
+                    src_org, src_repo, dst_org, dst_repo, description
+                )
+                if repo_dict is not None:
+                    return repo_dict
+
+            repo_dict = self.create_repo(dst_org, dst_repo, description)
+            self.shallow_copy_repo(
+                src_dict['ssh_url'], repo_dict['ssh_url'], committer, branch,
+                self.mirrors, include, exclude
+            )
+            return repo_dict
+
+    def _put_file(self, org, repo, committer, message, path, contents):
+        """Commit a file with the contents API.
+
+        Args:
+            org (str): Organization the repo lives in.
+            repo (str): The name of the repo.
+            committer (dict): {'name': ..., 'email': ...} of the committer.
+            message (str): Commit message to use for the addition.
+            path (str): The content path, i.e. ``docs/.gitignore``
+            contents (str): The actual string Contents of the file.
+        Raises:
+            requests.exceptions.RequestException
+            GitHubUnknownError
+        Returns:
+            requests.Response: Response from github
+        """
+        url = '{url}repos/{org}/{repo}/contents/{path}'.format(
+            url=self.api_url,
+            org=org,
+            repo=repo,
+            path=path
+        )
+        payload = {
+            'message': message,
+            'committer': committer,
+            'content': base64.b64encode(contents).decode('ascii'),
+        }
+        response = self.session.put(url, json=payload)
+        if response.status_code != 201:
+            raise GitHubUnknownError(
+                'Failed to add contents to {org}/{repo}/{path}. '
+                'Got: {response}'.format(
+                    org=org, repo=repo, path=path, response=response.text
+                )
+            )
+        return response
 
     def add_repo_file(self, org, repo, committer, message, path, contents):
         """Adds the ``contents`` provided to the ``path`` in the repo
@@ -493,22 +1453,185 @@ class GitHub(object):
             raise GitHubRepoDoesNotExist(
                 'Repo does not exist. Cannot add file'
             )
-        url = '{url}repos/{org}/{repo}/contents/{path}'.format(
+        self._put_file(org, repo, committer, message, path, contents)
+
+    def _tree_entry(self, repo_url, path, contents):
+        """Build a tree entry for a file.
+
+        Text is put in the entry itself, so github creates its blob as
+        part of creating the tree, anything else is uploaded as a blob.
+
+        Args:
+            repo_url (str): API URL of the repo.
+            path (str): Path of the file in the tree.
+            contents (str): Contents of the file.
+        Raises:
+            requests.exceptions.RequestException
+            GitHubUnknownError
+        Returns:
+            dict: Tree entry
+                (https://developer.github.com/v3/git/trees/#create-a-tree)
+        """
+        entry = {'path': path, 'mode': '100644', 'type': 'blob'}
+        try:
+            entry['content'] = contents.decode('utf-8')
+            return entry
+        except UnicodeDecodeError:
+            pass
+        response = self.session.post(
+            '{0}git/blobs'.format(repo_url),
+            json={
+                'content': base64.b64encode(contents).decode('ascii'),
+                'encoding': 'base64',
+            }
+        )
+        if response.status_code != 201:
+            raise GitHubUnknownError(response.text)
+        entry['sha'] = response.json()['sha']
+        return entry
+
+    def add_repo_files(self, org, repo, committer, message, files):
+        """Add several files to the repo in a single commit.
+
+        Uses the Git Data API (https://developer.github.com/v3/git/) to
+        create one tree holding every file on top of the head of the
+        default branch, one commit of it, and then move the branch to
+        the commit, so the number of requests doesn't grow with the
+        number of files.
+
+        .. NOTE::
+            The Git Data API doesn't work on a repo without any
+            commits, so the files are added to an empty repo with a
+            commit each using the contents API.  Callers that know the
+            repo is new can use :py:meth:`add_repo_file` directly to
+            skip looking up the branch.
+
+        Args:
+            org (str): Organization the repo lives in.
+            repo (str): The name of the repo.
+            committer (dict): {'name': ..., 'email': ...} for the name
+                and e-mail to use in the commit.
+            message (str): Commit message to use for the addition.
+            files (dict): Contents of each file by path,
+                i.e. ``{'docs/.gitignore': 'drafts/'}``
+        Raises:
+            requests.exceptions.RequestException
+            GitHubRepoDoesNotExist
+            GitHubUnknownError
+        Returns:
+            dict or None: Github dictionary of the (last) commit made
+                (https://developer.github.com/v3/git/commits/#response-1),
+                or None if there were no ``files``.
+        """
+        repo_dict = self._get_repo(org, repo)
+        if repo_dict is None:
+            raise GitHubRepoDoesNotExist(
+                'Repo does not exist. Cannot add files'
+            )
+        paths = sorted(files)
+        if not paths:
+            return None
+        repo_url = '{url}repos/{org}/{repo}/'.format(
             url=self.api_url,
             org=org,
-            repo=repo,
-            path=path
+            repo=repo
+        )
+        ref_url = '{0}git/refs/heads/{1}'.format(
+            repo_url, repo_dict.get('default_branch') or 'master'
+        )
+
+        tree = {}
+        parents = []
+        response = self.session.get(ref_url)
+        if response.status_code in (404, 409):
+            # Empty repo, which the Git Data API doesn't work on
+            for path in paths:
+                commit = self._put_file(
+                    org, repo, committer, message, path, files[path]
+                ).json()['commit']
+            return commit
+        elif response.status_code == 200:
+            parents.append(response.json()['object']['sha'])
+            response = self.session.get(
+                '{0}git/commits/{1}'.format(repo_url, parents[0])
+            )
+            if response.status_code != 200:
+                raise GitHubUnknownError(response.text)
+            tree['base_tree'] = response.json()['tree']['sha']
+        else:
+            raise GitHubUnknownError(response.text)
+
+        tree['tree'] = [
+            self._tree_entry(repo_url, path, files[path]) for path in paths
+        ]
+        response = self.session.post(
+            '{0}git/trees'.format(repo_url), json=tree
+        )
+        if response.status_code != 201:
+            raise GitHubUnknownError(response.text)
+        response = self.session.post(
+            '{0}git/commits'.format(repo_url),
+            json={
+                'message': message,
+                'tree': response.json()['sha'],
+                'parents': parents,
+                'committer': committer,
+            }
         )
-        payload = {
-            'message': message,
-            'committer': committer,
-            'content': base64.b64encode(contents).decode('ascii'),
-        }
-        response = self.session.put(url, json=payload)
         if response.status_code != 201:
+            raise GitHubUnknownError(response.text)
+        commit = response.json()
+        response = self.session.patch(ref_url, json={'sha': commit['sha']})
+        if response.status_code != 200:
             raise GitHubUnknownError(
-                'Failed to add contents to {org}/{repo}/{path}. '
+                'Failed to update {org}/{repo} to {sha}. '
                 'Got: {response}'.format(
-                    org=org, repo=repo, path=path, response=response.text
+                    org=org, repo=repo, sha=commit['sha'],
+                    response=response.text
                 )
             )
+        return commit
+
+
+_SHARED_CLIENTS = {}
+_SHARED_CLIENTS_LOCK = threading.Lock()
+
+
+def shared_client(api_url, oauth2_token, factory=None, **kwargs):
+    """Get the process wide client for an API URL and token.
+
+    The first call for an ``api_url`` and ``oauth2_token`` creates the
+    client, and later calls (from any thread) reuse it along with its
+    pool of open connections, so a series of actions doesn't set up a
+    new session and TLS connection each time.
+
+    Args:
+        api_url (str): Github API URL such as https://api.github.com/
+        oauth2_token (str): Github OAUTH2 token for v3
+        factory (callable): Called with ``api_url`` and
+            ``oauth2_token`` to create the client, instead of
+            :py:class:`GitHub`, so what it is built with (i.e. cache
+            stores) is only set up when it is needed.
+        kwargs: Other :py:class:`GitHub` arguments, only used when the
+            client is created.
+    Returns:
+        GitHub: Shared client.
+    """
+    if factory is None:
+        factory = partial(GitHub, **kwargs)
+    key = (api_url.rstrip('/'), oauth2_token)
+    with _SHARED_CLIENTS_LOCK:
+        client = _SHARED_CLIENTS.get(key)
+        if client is None:
+            client = factory(api_url, oauth2_token)
+            _SHARED_CLIENTS[key] = client
+        return client
+
+
+def close_shared_clients():
+    """Close and forget every client made by :py:func:`shared_client`"""
+    with _SHARED_CLIENTS_LOCK:
+        clients = list(_SHARED_CLIENTS.values())
+        _SHARED_CLIENTS.clear()
+    for client in clients:
+        client.close()
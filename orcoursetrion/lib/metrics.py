@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+"""
+Timing and counts of the requests made to github, by endpoint and
+action, to find where the time goes.
+"""
+from collections import deque
+from functools import wraps
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.compat import urlparse
+
+
+# Latencies kept per endpoint for percentiles, the oldest are dropped
+DEFAULT_MAX_SAMPLES = 1000
+
+# Percentiles of latency reported
+PERCENTILES = (50, 95, 99)
+
+# Endpoint templates for the paths the client requests, so requests for
+# different repos or teams are counted together.
+ENDPOINT_TEMPLATES = [
+    (re.compile(r'^repos/[^/]+/[^/]+/hooks/\d+$'),
+     'repos/{org}/{repo}/hooks/{id}'),
+    (re.compile(r'^repos/[^/]+/[^/]+/hooks$'), 'repos/{org}/{repo}/hooks'),
+    (re.compile(r'^repos/[^/]+/[^/]+/contents/.+$'),
+     'repos/{org}/{repo}/contents/{path}'),
+    (re.compile(r'^repos/[^/]+/[^/]+/git/refs/heads/.+$'),
+     'repos/{org}/{repo}/git/refs/heads/{branch}'),
+    (re.compile(r'^repos/[^/]+/[^/]+/git/commits/[^/]+$'),
+     'repos/{org}/{repo}/git/commits/{sha}'),
+    (re.compile(r'^repos/[^/]+/[^/]+/git/(trees|blobs|commits)$'),
+     r'repos/{org}/{repo}/git/\1'),
+    (re.compile(r'^repos/[^/]+/[^/]+/generate$'),
+     'repos/{org}/{repo}/generate'),
+    (re.compile(r'^repos/[^/]+/[^/]+$'), 'repos/{org}/{repo}'),
+    (re.compile(r'^orgs/[^/]+/(repos|teams)$'), r'orgs/{org}/\1'),
+    (re.compile(r'^orgs/[^/]+/teams/[^/]+$'), 'orgs/{org}/teams/{slug}'),
+    (re.compile(r'^teams/\d+/memberships/[^/]+$'),
+     'teams/{id}/memberships/{member}'),
+    (re.compile(r'^teams/\d+/members$'), 'teams/{id}/members'),
+    (re.compile(r'^teams/\d+/repos/[^/]+/[^/]+$'),
+     'teams/{id}/repos/{org}/{repo}'),
+]
+
+# Path segments that are numbers, for paths without a template
+NUMBER_REGEX = re.compile(r'(?<=/)\d+(?=/|$)')
+
+
+def endpoint_template(path):
+    """Get the template of an API path, i.e. ``teams/{id}/members``
+
+    Args:
+        path (str): Path of the request relative to the API URL,
+            without the query string.
+    Returns:
+        str: Template of the endpoint, or the path with numbers replaced
+            by ``{id}`` if it isn't one we know.
+    """
+    path = path.strip('/')
+    for regex, template in ENDPOINT_TEMPLATES:
+        match = regex.match(path)
+        if match is not None:
+            return match.expand(template)
+    return NUMBER_REGEX.sub('{id}', '/' + path)[1:]
+
+
+def _percentile(ordered, percent):
+    """Nearest rank percentile of a sorted, non-empty list"""
+    rank = int(round(percent / 100.0 * len(ordered) + 0.5))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def _labels(**labels):
+    """Format Prometheus labels, sorted by name"""
+    return '{{{0}}}'.format(','.join(
+        '{0}="{1}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in sorted(labels.items())
+    ))
+
+
+class RequestMetrics(object):
+    """Thread safe tally of github requests.
+
+    Every response is recorded by method and endpoint template with its
+    status, latency and size, along with the rate limit left and the
+    action (if any) the request was made for.  Read the totals with
+    :py:meth:`stats`, or export them with :py:meth:`to_json` or
+    :py:meth:`to_prometheus`.
+    """
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        """Start with nothing recorded.
+
+        Args:
+            max_samples (int): Latencies kept per endpoint to compute
+                percentiles from.
+        """
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._statuses = {}
+        self._actions = {}
+        self.rate_limit_remaining = None
+
+    def reset(self):
+        """Forget everything recorded"""
+        with self._lock:
+            self._endpoints = {}
+            self._statuses = {}
+            self._actions = {}
+            self.rate_limit_remaining = None
+
+    def record(self, method, path, status, seconds, size, action=None,
+               rate_limit_remaining=None):
+        """Record a request.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Path requested, relative to the API URL.
+            status (int): Status code of the response.
+            seconds (float): Time until the response arrived.
+            size (int): Bytes in the response body.
+            action (str): Optional action the request was made for.
+            rate_limit_remaining (int): Optional requests left in the
+                rate limit window, as reported with the response.
+        """
+        # pylint: disable=too-many-arguments
+        key = (method, endpoint_template(path))
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                endpoint = self._endpoints[key] = {
+                    'count': 0,
+                    'seconds': 0.0,
+                    'bytes': 0,
+                    'samples': deque(maxlen=self.max_samples),
+                }
+            endpoint['count'] += 1
+            endpoint['seconds'] += seconds
+            endpoint['bytes'] += size
+            endpoint['samples'].append(seconds)
+            status_key = key + (status,)
+            self._statuses[status_key] = self._statuses.get(status_key, 0) + 1
+            if action is not None:
+                self._actions[action] = self._actions.get(action, 0) + 1
+            if rate_limit_remaining is not None:
+                self.rate_limit_remaining = rate_limit_remaining
+
+    def stats(self):
+        """Get the totals recorded so far.
+
+        Returns:
+            dict: ``endpoints``, a list with the ``method``,
+                ``endpoint``, ``count``, ``statuses`` (count by status
+                code), total ``seconds`` and ``bytes``, and ``p50``,
+                ``p95`` and ``p99`` latency of each endpoint, most time
+                spent first; ``actions``, the number of requests made
+                for each action; and ``rate_limit_remaining``.
+        """
+        with self._lock:
+            endpoints = []
+            for (method, template), endpoint in self._endpoints.items():
+                ordered = sorted(endpoint['samples'])
+                entry = {
+                    'method': method,
+                    'endpoint': template,
+                    'count': endpoint['count'],
+                    'statuses': dict(
+                        (status, count)
+                        for (s_method, s_template, status), count
+                        in self._statuses.items()
+                        if (s_method, s_template) == (method, template)
+                    ),
+                    'seconds': endpoint['seconds'],
+                    'bytes': endpoint['bytes'],
+                }
+                for percent in PERCENTILES:
+                    entry['p{0}'.format(percent)] = _percentile(
+                        ordered, percent
+                    )
+                endpoints.append(entry)
+            endpoints.sort(key=lambda x: (-x['seconds'], x['endpoint']))
+            return {
+                'endpoints': endpoints,
+                'actions': dict(self._actions),
+                'rate_limit_remaining': self.rate_limit_remaining,
+            }
+
+    def to_json(self):
+        """Get :py:meth:`stats` as JSON.
+
+        Returns:
+            str: JSON document.
+        """
+        return json.dumps(self.stats(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """Get the metrics in the Prometheus text format.
+
+        Returns:
+            str: Metrics for a text file collector or scrape endpoint.
+        """
+        stats = self.stats()
+        lines = [
+            '# HELP orcoursetrion_github_requests_total Requests made to '
+            'github.',
+            '# TYPE orcoursetrion_github_requests_total counter',
+        ]
+        for entry in stats['endpoints']:
+            for status, count in sorted(entry['statuses'].items()):
+                lines.append(
+                    'orcoursetrion_github_requests_total{0} {1}'.format(
+                        _labels(method=entry['method'],
+                                endpoint=entry['endpoint'], status=status),
+                        count
+                    )
+                )
+        lines.extend([
+            '# HELP orcoursetrion_github_request_seconds Time until github '
+            'responded.',
+            '# TYPE orcoursetrion_github_request_seconds summary',
+        ])
+        for entry in stats['endpoints']:
+            labels = dict(method=entry['method'], endpoint=entry['endpoint'])
+            for percent in PERCENTILES:
+                lines.append(
+                    'orcoursetrion_github_request_seconds{0} {1!r}'.format(
+                        _labels(quantile=percent / 100.0, **labels),
+                        entry['p{0}'.format(percent)]
+                    )
+                )
+            lines.append(
+                'orcoursetrion_github_request_seconds_sum{0} {1!r}'.format(
+                    _labels(**labels), entry['seconds']
+                )
+            )
+            lines.append(
+                'orcoursetrion_github_request_seconds_count{0} {1}'.format(
+                    _labels(**labels), entry['count']
+                )
+            )
+        lines.extend([
+            '# HELP orcoursetrion_github_response_bytes_total Bytes of '
+            'github responses.',
+            '# TYPE orcoursetrion_github_response_bytes_total counter',
+        ])
+        for entry in stats['endpoints']:
+            lines.append(
+                'orcoursetrion_github_response_bytes_total{0} {1}'.format(
+                    _labels(method=entry['method'],
+                            endpoint=entry['endpoint']),
+                    entry['bytes']
+                )
+            )
+        lines.extend([
+            '# HELP orcoursetrion_github_action_requests_total Requests '
+            'made to github by action.',
+            '# TYPE orcoursetrion_github_action_requests_total counter',
+        ])
+        for action, count in sorted(stats['actions'].items()):
+            lines.append(
+                'orcoursetrion_github_action_requests_total{0} {1}'.format(
+                    _labels(action=action), count
+                )
+            )
+        if stats['rate_limit_remaining'] is not None:
+            lines.extend([
+                '# HELP orcoursetrion_github_rate_limit_remaining Requests '
+                'left in the github rate limit window.',
+                '# TYPE orcoursetrion_github_rate_limit_remaining gauge',
+                'orcoursetrion_github_rate_limit_remaining {0}'.format(
+                    stats['rate_limit_remaining']
+                ),
+            ])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write the metrics to a file, as JSON if its name ends in
+        ``.json`` or otherwise in the Prometheus text format (i.e. for
+        the node exporter's text file collector).  The file is replaced
+        in one step so it's never read half written.
+
+        Args:
+            path (str): File to write.
+        """
+        if path.endswith('.json'):
+            contents = self.to_json()
+        else:
+            contents = self.to_prometheus()
+        handle, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), prefix='.tmp'
+        )
+        with os.fdopen(handle, 'w') as metrics_file:
+            metrics_file.write(contents)
+        os.rename(tmp_path, path)
+
+
+class TimingAdapter(BaseAdapter):
+    """Transport adapter that records every request it sends in a
+    :py:class:`RequestMetrics`.
+
+    It belongs directly above the adapter that talks to github, below
+    any pacing, retries and caching, so each attempt is recorded with
+    the time spent on the wire alone and the status github really sent
+    (i.e. ``304`` for cache hits).
+    """
+
+    def __init__(self, metrics, adapter=None, api_url='/', action=None):
+        """Wrap ``adapter`` with timing.
+
+        Args:
+            metrics (RequestMetrics): Where requests are recorded.
+            adapter (requests.adapters.BaseAdapter): Adapter to send
+                requests with, defaults to a new ``HTTPAdapter``.
+            api_url (str): URL of the API, which paths are recorded
+                relative to.
+            action (callable): Optional function returning the name of
+                the action a request is made for, or None.
+        """
+        super(TimingAdapter, self).__init__()
+        self.metrics = metrics
+        self.adapter = adapter or HTTPAdapter()
+        self.api_path = urlparse(api_url).path
+        self.action = action
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        """Send the request and record how it went.
+
+        Args:
+            request (requests.PreparedRequest): Request being sent.
+            stream, timeout, verify, cert, proxies: Passed on to the
+                wrapped adapter.
+        Returns:
+            requests.Response: Response from github.
+        """
+        # pylint: disable=too-many-arguments
+        start = time.time()
+        response = self.adapter.send(
+            request, stream=stream, timeout=timeout, verify=verify,
+            cert=cert, proxies=proxies
+        )
+        # Read the body now so its download is timed too, unless the
+        # caller wants it streamed.
+        size = 0 if stream else len(response.content or b'')
+        seconds = time.time() - start
+        path = urlparse(request.url).path
+        if path.startswith(self.api_path):
+            path = path[len(self.api_path):]
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        self.metrics.record(
+            request.method,
+            path,
+            response.status_code,
+            seconds,
+            size,
+            action=self.action() if self.action is not None else None,
+            rate_limit_remaining=(
+                int(remaining) if remaining is not None and
+                remaining.isdigit() else None
+            )
+        )
+        return response
+
+    def close(self):
+        """Close the wrapped adapter"""
+        self.adapter.close()
+
+
+class Stopwatch(object):
+    """Thread safe total of the time spent in some kind of work, i.e.
+    running git.
+    """
+
+    def __init__(self):
+        """Start at zero"""
+        self._lock = threading.Lock()
+        self.seconds = 0.0
+        self.count = 0
+
+    def reset(self):
+        """Go back to zero"""
+        with self._lock:
+            self.seconds = 0.0
+            self.count = 0
+
+    def timed(self, func):
+        """Decorate a function to add the time each call takes.
+
+        Args:
+            func (callable): Function to time.
+        Returns:
+            callable: Function that times ``func``.
+        """
+        @wraps(func)
+        def timed_func(*args, **kwargs):
+            """Call ``func`` and add the time it took"""
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = time.time() - start
+                with self._lock:
+                    self.seconds += seconds
+                    self.count += 1
+        return timed_func
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Local bare mirrors of source repos, so copying a repo we've seen before
+only fetches what changed since.
+"""
+from contextlib import contextmanager
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+import sh
+
+
+# Default maximum size of the mirror directory in bytes
+DEFAULT_MIRROR_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def _tree_size(path):
+    """Total size in bytes of the files under ``path``"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class MirrorCache(object):
+    """Bare mirrors of source repos in a directory, by URL.
+
+    :py:meth:`reference` brings the mirror of a URL up to date with an
+    incremental fetch (or clones it the first time), and gives its path
+    to use as ``--reference`` for a clone of the same URL, which then
+    only needs the objects the mirror doesn't have.
+
+    When the directory grows beyond ``max_bytes`` the least recently
+    used mirrors are removed, except ones in use by this process.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MIRROR_MAX_BYTES):
+        """Create the cache, and its directory if needed.
+
+        Args:
+            path (str): Directory to keep mirrors in.
+            max_bytes (int): Total size of the mirrors to keep before
+                the least recently used are evicted.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self._in_use = {}
+        try:
+            os.makedirs(path)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+
+    def mirror_path(self, url):
+        """Get the directory the mirror of ``url`` is kept in.
+
+        Args:
+            url (str): Git URL of the source repo.
+        Returns:
+            str: Path of the bare mirror.
+        """
+        return os.path.join(
+            self.path,
+            '{0}.git'.format(hashlib.sha1(url.encode('utf-8')).hexdigest())
+        )
+
+    def _update(self, url, mirror):
+        """Fetch into the mirror of ``url``, cloning it if it's new"""
+        # pylint: disable=no-member
+        if os.path.isdir(mirror):
+            sh.git.fetch('--prune', 'origin', _cwd=mirror)
+        else:
+            # Clone next to the mirror and rename it into place, so an
+            # interrupted clone is never mistaken for a mirror.
+            tmp_dir = tempfile.mkdtemp(dir=self.path, prefix='.tmp')
+            try:
+                sh.git.clone(url, os.path.join(tmp_dir, 'mirror'), mirror=True)
+                os.rename(os.path.join(tmp_dir, 'mirror'), mirror)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Mark as recently used for eviction
+        os.utime(mirror, None)
+
+    @contextmanager
+    def reference(self, url):
+        """Update the mirror of ``url`` and use it until the end of the
+        block, during which it isn't evicted.
+
+        Args:
+            url (str): Git URL of the source repo.
+        Raises:
+            sh.ErrorReturnCode
+        Yields:
+            str: Path of the up to date bare mirror.
+        """
+        mirror = self.mirror_path(url)
+        with self._lock:
+            url_lock = self._url_locks.setdefault(mirror, threading.Lock())
+            self._in_use[mirror] = self._in_use.get(mirror, 0) + 1
+        try:
+            with url_lock:
+                self._update(url, mirror)
+            yield mirror
+        finally:
+            with self._lock:
+                self._in_use[mirror] -= 1
+                if not self._in_use[mirror]:
+                    del self._in_use[mirror]
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used mirrors until under ``max_bytes``"""
+        with self._lock:
+            mirrors = []
+            for name in os.listdir(self.path):
+                if name.startswith('.tmp'):
+                    continue
+                path = os.path.join(self.path, name)
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                mirrors.append((mtime, _tree_size(path), path))
+            total = sum(x[1] for x in mirrors)
+            for _, size, path in sorted(mirrors):
+                if total <= self.max_bytes:
+                    break
+                if path in self._in_use:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
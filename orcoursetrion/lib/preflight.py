@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Check the preconditions of an action all at once, before changing
+anything on github.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from orcoursetrion.lib.github import (
+    GitHubException,
+    GitHubRepoDoesNotExist,
+    GitHubRepoExists,
+)
+
+
+# Scopes that include another, i.e. admin:org can do all write:org can
+IMPLIED_SCOPES = {
+    'read:org': ('write:org', 'admin:org'),
+    'write:org': ('admin:org',),
+    'public_repo': ('repo',),
+    'read:repo_hook': ('write:repo_hook', 'admin:repo_hook'),
+    'write:repo_hook': ('admin:repo_hook',),
+}
+
+
+class GitHubPreflightError(GitHubException):
+    """A precondition of an action that isn't about github data failed,
+    i.e. missing configuration or token scopes.
+    """
+    pass
+
+
+class Preflight(object):
+    """Preconditions of an action, checked concurrently.
+
+    Checks are added with the methods named after what they expect,
+    which can be chained, and :py:meth:`run` then sends every request
+    needed at the same time, raising the exception of the first check
+    to fail.  Token scopes are checked last, from the scopes github
+    reported with the other responses, so they usually don't need a
+    request of their own.
+
+    Run it inside the action's
+    :py:meth:`~orcoursetrion.lib.GitHub.unit_of_work` so the repo
+    lookups are remembered for the rest of the action.
+    """
+
+    def __init__(self, github):
+        """Start with no checks.
+
+        Args:
+            github (orcoursetrion.lib.GitHub): Client to check with.
+        """
+        self.github = github
+        self.checks = []
+        self.scopes = set()
+
+    def _repo_absent(self, org, repo):
+        """Raise if the repo exists"""
+        # pylint: disable=protected-access
+        if self.github._get_repo(org, repo) is not None:
+            raise GitHubRepoExists(
+                'Repository {0}/{1} already exists'.format(org, repo)
+            )
+
+    def _repo_exists(self, org, repo):
+        """Raise if the repo doesn't exist"""
+        # pylint: disable=protected-access
+        if self.github._get_repo(org, repo) is None:
+            raise GitHubRepoDoesNotExist(
+                'Repository {0}/{1} does not exist'.format(org, repo)
+            )
+
+    def repo_absent(self, org, repo):
+        """Check that a repo doesn't exist yet.
+
+        Raises ``GitHubRepoExists`` when run if it does.
+        """
+        self.checks.append(lambda: self._repo_absent(org, repo))
+        return self
+
+    def repo_exists(self, org, repo):
+        """Check that a repo exists.
+
+        Raises ``GitHubRepoDoesNotExist`` when run if it doesn't.
+        """
+        self.checks.append(lambda: self._repo_exists(org, repo))
+        return self
+
+    def team_exists(self, org, team):
+        """Check that a team exists.
+
+        Raises ``GitHubNoTeamFound`` when run if it doesn't.
+        """
+        # pylint: disable=protected-access
+        self.checks.append(lambda: self.github._find_team(org, team))
+        return self
+
+    def configured(self, name, value):
+        """Check that a setting has a value.
+
+        Raises ``GitHubPreflightError`` when run if it doesn't.
+
+        Args:
+            name (str): Name of the setting, for the error.
+            value (object): Configured value.
+        """
+        def check():
+            """Raise if not configured"""
+            if not value:
+                raise GitHubPreflightError(
+                    '{0} needs to be configured'.format(name)
+                )
+        self.checks.append(check)
+        return self
+
+    def token_scopes(self, *scopes):
+        """Check that our token has OAuth ``scopes`` (or scopes that
+        include them).
+
+        Raises ``GitHubPreflightError`` when run if it doesn't.  Skipped
+        if github doesn't report the scopes of the token.
+        """
+        self.scopes.update(scopes)
+        return self
+
+    def _check_scopes(self):
+        """Raise if the token is missing required scopes"""
+        token_scopes = self.github.get_token_scopes()
+        if token_scopes is None:
+            return
+        missing = [
+            scope for scope in sorted(self.scopes)
+            if scope not in token_scopes and not token_scopes.intersection(
+                IMPLIED_SCOPES.get(scope, ())
+            )
+        ]
+        if missing:
+            raise GitHubPreflightError(
+                'Token is missing the {0} scope(s) needed'.format(
+                    ', '.join(missing)
+                )
+            )
+
+    def run(self):
+        """Run every check concurrently, failing on the first to fail
+        once the others that started have finished.
+
+        Raises:
+            GitHubException: Raised by the first failing check.
+            requests.RequestException
+        """
+        if self.checks:
+            work = self.github.current_work()
+
+            def run_check(check):
+                """Run a check in the caller's unit of work"""
+                with work():
+                    check()
+
+            failed = None
+            # Leaving the block waits for checks already running, so none
+            # are still sending requests once we've raised.
+            with ThreadPoolExecutor(max_workers=len(self.checks)) as executor:
+                futures = [
+                    executor.submit(run_check, check)
+                    for check in self.checks
+                ]
+                for future in as_completed(futures):
+                    if future.exception() is not None:
+                        failed = future
+                        for pending in futures:
+                            pending.cancel()
+                        break
+            if failed is not None:
+                # Raises the check's exception with its traceback
+                failed.result()
+        if self.scopes:
+            self._check_scopes()
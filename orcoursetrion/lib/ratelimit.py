@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Rate limit aware pacing of github API requests
+"""
+import threading
+import time
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+
+# Default sustained requests per second, github's secondary rate limit
+# allows 900 points a minute for REST calls.
+DEFAULT_REQUESTS_PER_SECOND = 15
+
+# Points github charges for requests that change something, against
+# the 1 point of a read, so writes are paced that much slower.
+WRITE_COST = 5
+
+# Methods of requests that change something
+WRITE_METHODS = frozenset(['POST', 'PATCH', 'PUT', 'DELETE'])
+
+# Default number of requests that can be sent back to back
+DEFAULT_BURST = 20
+
+# Slowest we'll back off to after hitting secondary rate limits
+MIN_REQUESTS_PER_SECOND = 0.1
+
+# How much the rate recovers after each successful request
+RATE_RECOVERY = 0.1
+
+# Seconds to wait on a secondary rate limit without a Retry-After, as
+# github recommends.
+SECONDARY_LIMIT_WAIT = 60
+
+# Default longest we'll wait for the primary rate limit to reset
+DEFAULT_MAX_WAIT = 15 * 60
+
+# Number of times a request is retried after hitting a rate limit
+DEFAULT_MAX_RETRIES = 3
+
+
+class TokenBucket(object):
+    """Thread safe token bucket that sleeps callers to keep a rate."""
+
+    def __init__(self, rate, capacity):
+        """Start with a full bucket.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (int): Most tokens the bucket holds, i.e. the
+                largest burst allowed.
+        """
+        self.rate = float(rate)
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Add tokens for the time passed, must hold ``_lock``"""
+        now = time.time()
+        # Don't take tokens away if the clock went backwards
+        elapsed = max(now - self.updated, 0)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """Take tokens, sleeping until they are available.
+
+        Tokens are reserved before sleeping, so concurrent callers wait
+        in line instead of all waking at once.
+
+        Args:
+            tokens (int): Number of tokens to take.
+        Returns:
+            float: Seconds slept.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= tokens
+            wait = 0
+            if self.tokens < 0:
+                wait = -self.tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def set_rate(self, rate):
+        """Change the refill rate, keeping what was already earned"""
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+
+
+class RateLimitAdapter(BaseAdapter):
+    """Transport adapter that paces requests within github's limits.
+
+    Requests are paced by a :py:class:`TokenBucket`, taking one token
+    for reads and :py:const:`WRITE_COST` for writes, and the
+    ``X-RateLimit-*`` headers of every response are tracked so that
+    once the budget is used up, requests wait for it to reset.  When a
+    secondary rate limit (or ``Retry-After``) is hit, the request is
+    retried after the time asked for and the pace is halved, recovering
+    gradually as requests succeed again.
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, adapter=None,
+                 requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                 burst=DEFAULT_BURST, max_wait=DEFAULT_MAX_WAIT,
+                 max_retries=DEFAULT_MAX_RETRIES):
+        """Wrap ``adapter`` with pacing.
+
+        Args:
+            adapter (requests.adapters.BaseAdapter): Adapter to send
+                requests with, defaults to a new ``HTTPAdapter``.
+            requests_per_second (float): Sustained rate of reads,
+                writes are sent at a fifth of it.
+            burst (int): Requests that can be sent back to back.
+            max_wait (int): Longest to wait, in seconds, for a rate limit
+                to reset before sending anyway.
+            max_retries (int): Times to retry a rate limited request.
+        """
+        # pylint: disable=too-many-arguments
+        super(RateLimitAdapter, self).__init__()
+        self.adapter = adapter or HTTPAdapter()
+        self.requests_per_second = float(requests_per_second)
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(self.requests_per_second, burst)
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.secondary_limits_hit = 0
+        self._lock = threading.Lock()
+
+    def budget(self):
+        """Get the rate limit budget as last reported by github.
+
+        Returns:
+            dict: ``limit``, ``remaining`` and ``reset`` (epoch seconds)
+                from github, which are None until a response has them,
+                along with our current ``requests_per_second`` and the
+                number of ``secondary_limits_hit``.
+        """
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'remaining': self.remaining,
+                'reset': self.reset,
+                'requests_per_second': self.bucket.rate,
+                'secondary_limits_hit': self.secondary_limits_hit,
+            }
+
+    def _update_budget(self, response):
+        """Track the rate limit headers of a response"""
+        headers = response.headers
+        if 'X-RateLimit-Remaining' not in headers:
+            return
+        try:
+            limit = int(headers.get('X-RateLimit-Limit', 0)) or None
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset = int(headers.get('X-RateLimit-Reset', 0)) or None
+        except ValueError:
+            return
+        with self._lock:
+            self.limit = limit
+            self.remaining = remaining
+            self.reset = reset
+
+    def _wait_for_budget(self):
+        """Sleep until the rate limit resets if the budget is used up"""
+        with self._lock:
+            if self.remaining is None or self.remaining > 0:
+                return
+            wait = (self.reset or 0) - time.time()
+            if wait <= 0 or wait > self.max_wait:
+                return
+            # Let one request through after the reset to refresh budget
+            self.remaining = None
+        time.sleep(wait)
+
+    def _limited_wait(self, response):
+        """Find how long to wait before retrying a rate limited response.
+
+        Args:
+            response (requests.Response): Response to check.
+        Returns:
+            float or None: Seconds to wait, or None if the response
+                wasn't rate limited.
+        """
+        if response.status_code not in (403, 429):
+            return None
+        # Read the body now, which also frees up the connection for a
+        # retry.
+        content = response.content.lower()
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return max(float(retry_after), 0)
+            except ValueError:
+                return SECONDARY_LIMIT_WAIT
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            return max((self.reset or 0) - time.time(), 0)
+        if response.status_code == 429 or (
+                b'secondary rate limit' in content or b'abuse' in content
+        ):
+            return SECONDARY_LIMIT_WAIT
+        return None
+
+    def _slow_down(self):
+        """Halve our rate after hitting a secondary limit"""
+        with self._lock:
+            self.secondary_limits_hit += 1
+        self.bucket.set_rate(
+            max(self.bucket.rate / 2, MIN_REQUESTS_PER_SECOND)
+        )
+
+    def _speed_up(self):
+        """Recover our rate after a successful request"""
+        if self.bucket.rate < self.requests_per_second:
+            self.bucket.set_rate(min(
+                self.bucket.rate + RATE_RECOVERY, self.requests_per_second
+            ))
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        """Send the request once the rate limits allow it.
+
+        Args:
+            request (requests.PreparedRequest): Request being sent.
+            stream, timeout, verify, cert, proxies: Passed on to the
+                wrapped adapter.
+        Returns:
+            requests.Response: Response from github.
+        """
+        # pylint: disable=too-many-arguments
+        kwargs = dict(
+            stream=stream, timeout=timeout, verify=verify, cert=cert,
+            proxies=proxies
+        )
+        attempt = 0
+        while True:
+            self._wait_for_budget()
+            self.bucket.acquire(
+                WRITE_COST if request.method in WRITE_METHODS else 1
+            )
+            response = self.adapter.send(request, **kwargs)
+            self._update_budget(response)
+            wait = self._limited_wait(response)
+            if wait is None:
+                self._speed_up()
+                return response
+            self._slow_down()
+            attempt += 1
+            if attempt > self.max_retries or wait > self.max_wait:
+                return response
+            time.sleep(wait)
+
+    def close(self):
+        """Close the wrapped adapter"""
+        self.adapter.close()
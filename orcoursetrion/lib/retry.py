@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Retrying github API requests that fail transiently
+"""
+import random
+import threading
+import time
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+
+# Default number of times a failed request is retried
+DEFAULT_MAX_RETRIES = 3
+
+# Default seconds the first retry waits at most, doubling each retry
+DEFAULT_BACKOFF = 0.5
+
+# Longest we'll wait between two attempts
+MAX_BACKOFF = 30
+
+# Methods that can be sent again without changing the outcome
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# Server errors worth trying again, i.e. a busy or restarting appliance
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class RetryAdapter(BaseAdapter):
+    """Transport adapter that retries idempotent requests.
+
+    Idempotent requests that get a 5xx response or fail to connect are
+    retried, waiting a random time between zero and an exponentially
+    growing backoff ("full jitter") so concurrent callers spread out.
+    Other methods, namely POST, are sent once, callers can use
+    :py:meth:`should_retry` and :py:meth:`wait` to retry them once they
+    verified the first attempt didn't succeed.
+    """
+
+    def __init__(self, adapter=None, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff=DEFAULT_BACKOFF):
+        """Wrap ``adapter`` with retries.
+
+        Args:
+            adapter (requests.adapters.BaseAdapter): Adapter to send
+                requests with, defaults to a new ``HTTPAdapter``.
+            max_retries (int): Times to retry a failed request.
+            backoff (float): Longest wait, in seconds, before the first
+                retry, which doubles for each retry after.
+        """
+        super(RetryAdapter, self).__init__()
+        self.adapter = adapter or HTTPAdapter()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.retries = 0
+        self.retry_delay = 0.0
+        self.gave_up = 0
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """Get how much retrying has been done, for tuning.
+
+        Returns:
+            dict: Number of ``retries`` made, total ``retry_delay`` in
+                seconds, and how many requests we ``gave_up`` on.
+        """
+        with self._lock:
+            return {
+                'retries': self.retries,
+                'retry_delay': self.retry_delay,
+                'gave_up': self.gave_up,
+            }
+
+    @staticmethod
+    def is_transient(response):
+        """Check if a response is a server error worth retrying"""
+        return response.status_code in RETRY_STATUSES
+
+    def should_retry(self, attempt):
+        """Check if another attempt is allowed, counting if it isn't.
+
+        Args:
+            attempt (int): Number of attempts that already failed.
+        Returns:
+            bool: True if the request should be tried again.
+        """
+        if attempt <= self.max_retries:
+            return True
+        with self._lock:
+            self.gave_up += 1
+        return False
+
+    def wait(self, attempt):
+        """Sleep before retrying, and count the retry.
+
+        Args:
+            attempt (int): Number of attempts that already failed,
+                starting at 1.
+        Returns:
+            float: Seconds slept.
+        """
+        delay = random.uniform(
+            0, min(MAX_BACKOFF, self.backoff * 2 ** (attempt - 1))
+        )
+        with self._lock:
+            self.retries += 1
+            self.retry_delay += delay
+        time.sleep(delay)
+        return delay
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        """Send the request, retrying it if it is idempotent and fails.
+
+        Args:
+            request (requests.PreparedRequest): Request being sent.
+            stream, timeout, verify, cert, proxies: Passed on to the
+                wrapped adapter.
+        Raises:
+            requests.exceptions.ConnectionError
+        Returns:
+            requests.Response: Response from github, which is the last
+                failure if we ran out of retries.
+        """
+        # pylint: disable=too-many-arguments
+        kwargs = dict(
+            stream=stream, timeout=timeout, verify=verify, cert=cert,
+            proxies=proxies
+        )
+        if request.method not in IDEMPOTENT_METHODS:
+            return self.adapter.send(request, **kwargs)
+        attempt = 0
+        while True:
+            try:
+                response = self.adapter.send(request, **kwargs)
+            except RequestsConnectionError:
+                attempt += 1
+                if not self.should_retry(attempt):
+                    raise
+            else:
+                if not self.is_transient(response):
+                    return response
+                attempt += 1
+                if not self.should_retry(attempt):
+                    return response
+                # Release the connection before trying again
+                response.close()
+            self.wait(attempt)
+
+    def close(self):
+        """Close the wrapped adapter"""
+        self.adapter.close()
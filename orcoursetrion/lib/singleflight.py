@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Share one call between threads asking for the same thing at the same
+time.
+"""
+import threading
+
+from concurrent.futures import Future
+
+
+class SingleFlight(object):
+    """Coalesce identical calls that are in flight at the same time.
+
+    The first thread to ask for a key makes the call, and any thread
+    asking for the same key before it finishes waits for it and gets
+    the same result (the same object, so don't change it), or has the
+    same exception raised.  Once the call finishes the next one for
+    the key is made again, so nothing is cached.
+    """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        """Start with nothing in flight"""
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def run(self, key, func, *args, **kwargs):
+        """Call ``func``, unless a call for ``key`` is already in flight,
+        in which case wait for that one.
+
+        Args:
+            key (object): Hashable key of what is asked for.
+            func (callable): Makes the call.
+            args: Positional arguments for ``func``.
+            kwargs: Keyword arguments for ``func``.
+        Raises:
+            Exception: Whatever ``func`` raised.
+        Returns:
+            object: What ``func`` returned.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return call.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as error:
+            self._finish(key)
+            call.set_exception(error)
+            raise
+        self._finish(key)
+        call.set_result(result)
+        return result
+
+    def _finish(self, key):
+        """Stop sharing the call for ``key``, so the next one is made"""
+        with self._lock:
+            del self._calls[key]
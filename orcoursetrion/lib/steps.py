@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Run the steps of an action as a graph, so independent steps run at the
+same time.
+"""
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
+
+
+LOG = logging.getLogger(__name__)
+
+# Default number of steps run at the same time
+DEFAULT_MAX_STEPS = 4
+
+
+@contextmanager
+def _no_context():
+    """Context used when steps don't need one"""
+    yield
+
+
+class StepGraph(object):
+    """Steps with declared dependencies, run concurrently where possible.
+
+    Each step is a callable taking no arguments, and starts as soon as
+    every step it requires has finished.  The results are kept by step
+    name, and how long each step took is kept in :py:attr:`timings`
+    (and logged at debug level).
+
+    If a step raises, steps that haven't started yet are skipped, the
+    ones already running are waited for, and then the first exception
+    is raised as is.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_STEPS, context=None):
+        """Create an empty graph.
+
+        Args:
+            max_workers (int): Most steps run at the same time.
+            context (callable): Optional callable returning a context
+                manager each step is run in, i.e. to share state with
+                the worker threads the steps run in.
+        """
+        self.max_workers = max_workers
+        self.context = context or _no_context
+        self.steps = {}
+        self.order = []
+        self.results = {}
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, func, requires=()):
+        """Add a step.
+
+        Args:
+            name (str): Unique name of the step.
+            func (callable): Called with no arguments to run the step.
+            requires (iterable): Names of steps that need to finish first.
+        Raises:
+            ValueError
+        Returns:
+            StepGraph: This graph, so calls can be chained.
+        """
+        if name in self.steps:
+            raise ValueError('Step {0} was already added'.format(name))
+        self.steps[name] = (func, frozenset(requires))
+        self.order.append(name)
+        return self
+
+    def _check(self):
+        """Make sure every requirement exists and there are no cycles.
+
+        Raises:
+            ValueError
+        """
+        for name in self.order:
+            missing = self.steps[name][1] - set(self.steps)
+            if missing:
+                raise ValueError('Step {0} requires unknown {1}'.format(
+                    name, ', '.join(sorted(missing))
+                ))
+        done = set()
+        remaining = list(self.order)
+        while remaining:
+            ready = [x for x in remaining if self.steps[x][1] <= done]
+            if not ready:
+                raise ValueError('Steps {0} require each other'.format(
+                    ', '.join(remaining)
+                ))
+            done.update(ready)
+            remaining = [x for x in remaining if x not in done]
+
+    def _run_step(self, name):
+        """Run one step, timing it"""
+        func = self.steps[name][0]
+        start = time.time()
+        try:
+            with self.context():
+                return func()
+        finally:
+            elapsed = time.time() - start
+            with self._lock:
+                self.timings[name] = elapsed
+            LOG.debug('Step %s took %.3fs', name, elapsed)
+
+    def run(self):
+        """Run every step, each once its requirements are done.
+
+        Raises:
+            ValueError: If the graph has unknown requirements or cycles.
+            Exception: The first exception raised by a step.
+        Returns:
+            dict: Result of each step by name.
+        """
+        self._check()
+        done = set()
+        waiting = list(self.order)
+        running = {}
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while waiting or running:
+                if not errors:
+                    for name in [
+                            x for x in waiting if self.steps[x][1] <= done
+                    ]:
+                        waiting.remove(name)
+                        running[executor.submit(self._run_step, name)] = name
+                if not running:
+                    break
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        errors.append(future.exception())
+                        continue
+                    self.results[name] = future.result()
+                    done.add(name)
+        if errors:
+            raise errors[0]
+        return self.results
@@ -2,15 +2,24 @@
 """
 Test base class with commonly used methods and variables
 """
+from functools import partial
 import json
 import re
+import threading
+import time
 import unittest
 
 import httpretty
+import mock
+from requests.adapters import HTTPAdapter
+
+from orcoursetrion.config import CONFIG_KEYS
+from orcoursetrion.lib import close_shared_clients
 
 
 class TestGithubBase(unittest.TestCase):
     """Test Github actions and backing library."""
+    # pylint: disable=too-many-public-methods
 
     OAUTH2_TOKEN = '12345'
     ORG = 'NOT_REAL'
@@ -27,12 +36,56 @@ class TestGithubBase(unittest.TestCase):
     TEST_RERUN_REPO = '{0}-{1}-{2}'.format(
         TEST_PREFIX, TEST_COURSE.replace('.', ''), TEST_NEW_TERM
     )
+    TEST_REPO_URL = '{0}repos/{1}/{2}'.format(URL, ORG, TEST_REPO)
     TEST_TEAM = 'Test-Deploy'
     TEST_TEAM_ID = 1
     TEST_TEAM_MEMBERS = ['archlight', 'bizarnage', 'chemistro', 'dreadnought']
     TEST_STAGING_GR = 'http://gr/'
     TEST_PRODUCTION_GR = 'http://prod-gr/'
 
+    def setUp(self):
+        """Serialize sending requests, since httpretty matches requests to
+        callbacks with shared state that isn't thread safe, and don't
+        actually sleep between retries or to pace requests.
+        """
+        super(TestGithubBase, self).setUp()
+        send_lock = threading.Lock()
+        unlocked_send = HTTPAdapter.send
+
+        def locked_send(adapter, *args, **kwargs):
+            """Send the request while holding ``send_lock``"""
+            with send_lock:
+                return unlocked_send(adapter, *args, **kwargs)
+
+        patcher = mock.patch.object(HTTPAdapter, 'send', locked_send)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('orcoursetrion.lib.retry.time')
+        self.retry_time = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('orcoursetrion.lib.ratelimit.time')
+        patcher.start().time.side_effect = time.time
+        self.addCleanup(patcher.stop)
+        # Actions share clients, so start each test with new ones
+        close_shared_clients()
+        self.addCleanup(close_shared_clients)
+
+    def configure_github(self, config, **settings):
+        """Set every GitHub client setting of a mocked config to its
+        default, talking to the test API, so none are left as mocks.
+
+        Args:
+            config (mock.MagicMock): Mocked :py:mod:`orcoursetrion.config`
+            settings: Settings to use instead of the defaults.
+        """
+        for key, value in CONFIG_KEYS.items():
+            if key.startswith('ORC_GH_'):
+                setattr(config, key, value)
+        config.ORC_GH_OAUTH2_TOKEN = self.OAUTH2_TOKEN
+        config.ORC_GH_API_URL = self.URL
+        for key, value in settings.items():
+            setattr(config, key, value)
+
     def callback_repo_check(self, request, uri, headers, status_code=404):
         """Handle mocked API request for repo existence check."""
         self.assertEqual(
@@ -99,11 +152,58 @@ class TestGithubBase(unittest.TestCase):
             headers['Link'] = (
                 '<{uri}?page=2>; rel="next",'
                 '<{uri}?page=2>; rel="last"'
-            ).format(uri=uri)
+            ).format(uri=uri.split('?')[0])
         if status_code == 404:
             return (status_code, headers, json.dumps({'error': 'error'}))
         return (status_code, headers, json.dumps(body))
 
+    @staticmethod
+    def callback_paged_list(
+            request, uri, headers, num_pages=1, last=True, requested=None
+    ):
+        """Mock a generic list API call with ``num_pages`` pages.
+
+        Each page is a list with one ``{'page': <page number>}`` item.
+        If ``last`` is False, only ``next`` links are returned like
+        github does on some endpoints.  ``requested`` is a list that
+        has the ``(page, per_page)`` of each request appended to it.
+        """
+        # pylint: disable=too-many-arguments
+        current_page = int(request.querystring.get('page', [u'1'])[0])
+        per_page = request.querystring.get('per_page', [None])[0]
+        if requested is not None:
+            requested.append((current_page, per_page))
+        base_uri = uri.split('?')[0]
+        links = []
+        if current_page < num_pages:
+            links.append('<{uri}?page={page}>; rel="next"'.format(
+                uri=base_uri, page=current_page + 1
+            ))
+            if last:
+                links.append('<{uri}?page={page}>; rel="last"'.format(
+                    uri=base_uri, page=num_pages
+                ))
+        if links:
+            headers['Link'] = ','.join(links)
+        return (200, headers, json.dumps([{'page': current_page}]))
+
+    def callback_team_get(self, request, uri, headers):
+        """Mock getting a single team by slug."""
+        # Disabling unused-argument because this is a callback with
+        # required method signature.
+        # pylint: disable=unused-argument
+        self.assertEqual(
+            request.headers['Authorization'],
+            'token {0}'.format(self.OAUTH2_TOKEN)
+        )
+        slug = uri.split('?')[0].rsplit('/', 1)[1]
+        if slug != self.TEST_TEAM.lower():
+            return (404, headers, json.dumps({'message': 'Not Found'}))
+        return (200, headers, json.dumps({
+            'id': self.TEST_TEAM_ID,
+            'name': self.TEST_TEAM
+        }))
+
     def callback_team_members(
             self, request, uri, headers,
             status_code=200, members=None
@@ -277,9 +377,20 @@ class TestGithubBase(unittest.TestCase):
             status=status
         )
 
-    def register_team_list(self, body):
+    def register_hooked_repo(self):
         """
-        Team listing API.
+        Existing repo with a Web hook that can be listed and deleted.
+        """
+        self.register_repo_check(
+            partial(self.callback_repo_check, status_code=200)
+        )
+        self.register_hook_list()
+        self.register_hook_delete()
+
+    def register_team_list(self, body, team_body=None):
+        """
+        Team listing API, along with the single team by slug API, which
+        404s unless ``team_body`` is given.
         """
         httpretty.register_uri(
             httpretty.GET,
@@ -289,6 +400,20 @@ class TestGithubBase(unittest.TestCase):
             ),
             body=body
         )
+        if team_body is None:
+            team_body = json.dumps({'message': 'Not Found'})
+            status = 404
+        else:
+            status = 200
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r'^{url}orgs/{org}/teams/[^/?]+'.format(
+                url=re.escape(self.URL),
+                org=re.escape(self.ORG),
+            )),
+            body=team_body,
+            status=status
+        )
 
     def register_team_create(self, body):
         """
@@ -363,3 +488,38 @@ class TestGithubBase(unittest.TestCase):
             ),
             status=status
         )
+
+    def register_git_data(self, ref_status=200):
+        """Register the Git Data API calls for committing several files,
+        and the contents API for seeding an empty repo.
+        """
+        repo_url = '{url}repos/{org}/{repo}/'.format(
+            url=self.URL, org=self.ORG, repo=self.TEST_REPO
+        )
+        ref_url = '{0}git/refs/heads/master'.format(repo_url)
+        httpretty.register_uri(
+            httpretty.GET, ref_url,
+            body=json.dumps({'object': {'sha': 'head_sha'}}),
+            status=ref_status
+        )
+        httpretty.register_uri(
+            httpretty.PATCH, ref_url, body=json.dumps({}), status=200
+        )
+        httpretty.register_uri(
+            httpretty.GET, '{0}git/commits/head_sha'.format(repo_url),
+            body=json.dumps({'tree': {'sha': 'base_tree_sha'}})
+        )
+        for kind in ('blobs', 'trees', 'commits'):
+            httpretty.register_uri(
+                httpretty.POST, '{0}git/{1}'.format(repo_url, kind),
+                body=json.dumps({'sha': 'new_{0}_sha'.format(kind)}),
+                status=201
+            )
+        httpretty.register_uri(
+            httpretty.PUT,
+            re.compile(r'^{0}contents/.+$'.format(re.escape(repo_url))),
+            body=json.dumps({
+                'commit': {'sha': 'seed_sha', 'tree': {'sha': 'seed_tree'}}
+            }),
+            status=201
+        )
@@ -22,6 +22,9 @@ from orcoursetrion.actions import (
 )
 from orcoursetrion.actions.github import (
     COMMITTER,
+    COURSE_XML_CONTENTS,
+    COURSE_XML_MESSAGE,
+    COURSE_XML_PATH,
     GITIGNORE_CONTENTS,
     GITIGNORE_MESSAGE,
     GITIGNORE_PATH
@@ -32,15 +35,28 @@ from orcoursetrion.tests.base import TestGithubBase
 class TestActions(TestGithubBase):
     """Test Github actions"""
 
+    def assert_deploy_team_permission(self, permission):
+        """Verify the deploy team was added to the repo with
+        ``permission``.
+        """
+        team_repo_adds = [
+            x for x in httpretty.HTTPretty.latest_requests
+            if x.method == 'PUT' and '/teams/' in x.path
+        ]
+        self.assertEqual(1, len(team_repo_adds))
+        self.assertEqual(
+            {'permission': permission},
+            json.loads(team_repo_adds[0].body)
+        )
+
     @mock.patch('orcoursetrion.actions.github.config')
     @httpretty.activate
     def test_create_export_repo_success(self, config):
         """Test the API call comes through as expected.
         """
-        config.ORC_GH_OAUTH2_TOKEN = self.OAUTH2_TOKEN
         # While we are at it, make sure we can handle configured
         # github API urls that don't have a trailing slash.
-        config.ORC_GH_API_URL = self.URL[:-1]
+        self.configure_github(config, ORC_GH_API_URL=self.URL[:-1])
         config.ORC_COURSE_PREFIX = self.TEST_PREFIX
         config.ORC_STUDIO_ORG = self.ORG
         config.ORC_STUDIO_DEPLOY_TEAM = self.TEST_TEAM
@@ -55,33 +71,46 @@ class TestActions(TestGithubBase):
         # Mocking out add_repo_file due to it needing the repo to exist
         # but other items in this test need it to not exist
         with mock.patch(
-            'orcoursetrion.actions.github.GitHub.add_repo_file'
+            'orcoursetrion.lib.github.GitHub.add_repo_file'
         ) as mock_add_file:
             create_export_repo(
                 self.TEST_COURSE,
                 self.TEST_TERM,
                 description=self.TEST_DESCRIPTION
             )
-            mock_add_file.assert_called_with(
-                org=config.ORC_STUDIO_ORG,
-                repo='{prefix}-{course}-{term}'.format(
-                    prefix=self.TEST_PREFIX,
-                    course=self.TEST_COURSE.replace('.', ''),
-                    term=self.TEST_TERM
-                ),
-                committer=COMMITTER,
-                message=GITIGNORE_MESSAGE,
-                path=GITIGNORE_PATH,
-                contents=GITIGNORE_CONTENTS
+            repo_name = '{prefix}-{course}-{term}'.format(
+                prefix=self.TEST_PREFIX,
+                course=self.TEST_COURSE.replace('.', ''),
+                term=self.TEST_TERM
             )
+            self.assertEqual([
+                mock.call(
+                    org=config.ORC_STUDIO_ORG,
+                    repo=repo_name,
+                    committer=COMMITTER,
+                    message=GITIGNORE_MESSAGE,
+                    path=GITIGNORE_PATH,
+                    contents=GITIGNORE_CONTENTS
+                ),
+                mock.call(
+                    org=config.ORC_STUDIO_ORG,
+                    repo=repo_name,
+                    committer=COMMITTER,
+                    message=COURSE_XML_MESSAGE.format(term=self.TEST_TERM),
+                    path=COURSE_XML_PATH,
+                    contents=COURSE_XML_CONTENTS.format(
+                        term=self.TEST_TERM, course=self.TEST_COURSE
+                    )
+                ),
+            ], mock_add_file.call_args_list)
+        self.assert_deploy_team_permission('push')
 
     @mock.patch('orcoursetrion.actions.github.config')
     @httpretty.activate
     def test_rerun_studio_success(self, config):
         """Test the API call comes through as expected.
         """
-        config.ORC_GH_OAUTH2_TOKEN = self.OAUTH2_TOKEN
-        config.ORC_GH_API_URL = self.URL
+        self.configure_github(config)
         config.ORC_COURSE_PREFIX = self.TEST_PREFIX
         config.ORC_STUDIO_ORG = self.ORG
         config.ORC_STUDIO_DEPLOY_TEAM = self.TEST_TEAM
@@ -100,7 +129,7 @@ class TestActions(TestGithubBase):
         # Mocking out add_repo_file due to it needing the repo to exist
         # but other items in this test need it to not exist.
         with mock.patch(
-            'orcoursetrion.actions.github.GitHub.add_repo_file'
+            'orcoursetrion.lib.github.GitHub.add_repo_file'
         ) as mock_add_file:
 
             rerun_studio(
@@ -122,18 +151,27 @@ class TestActions(TestGithubBase):
                 path=GITIGNORE_PATH,
                 contents=GITIGNORE_CONTENTS
             )
+        # The new repo is only created once the old one's hooks are gone
+        methods = [x.method for x in httpretty.HTTPretty.latest_requests]
+        self.assertLess(
+            max(i for i, x in enumerate(methods) if x == 'DELETE'),
+            methods.index('POST')
+        )
+        self.assert_deploy_team_permission('push')
 
     @mock.patch('orcoursetrion.actions.github.config')
     @httpretty.activate
     def test_release_studio_success(self, config):
         """Test the API call comes through as expected.
         """
-        config.ORC_GH_OAUTH2_TOKEN = self.OAUTH2_TOKEN
-        config.ORC_GH_API_URL = self.URL
+        self.configure_github(config)
         config.ORC_COURSE_PREFIX = self.TEST_PREFIX
         config.ORC_STUDIO_ORG = self.ORG
         config.ORC_PRODUCTION_GITRELOAD = self.TEST_PRODUCTION_GR
 
+        self.register_repo_check(
+            partial(self.callback_repo_check, status_code=200)
+        )
         self.register_hook_create(json.dumps({'id': 2}), status=201)
         self.register_team_repo_add(self.callback_team_repo)
 
@@ -147,8 +185,7 @@ class TestActions(TestGithubBase):
     def test_create_xml_repo_success_old_team(self, config):
         """Test the API call comes through as expected.
         """
-        config.ORC_GH_OAUTH2_TOKEN = self.OAUTH2_TOKEN
-        config.ORC_GH_API_URL = self.URL
+        self.configure_github(config)
         config.ORC_COURSE_PREFIX = self.TEST_PREFIX
         config.ORC_XML_ORG = self.ORG
         config.ORC_XML_DEPLOY_TEAM = self.TEST_TEAM
@@ -178,8 +215,7 @@ class TestActions(TestGithubBase):
     def test_create_xml_repo_success_new_team(self, config):
         """Test the API call comes through as expected.
         """
-        config.ORC_GH_OAUTH2_TOKEN = self.OAUTH2_TOKEN
-        config.ORC_GH_API_URL = self.URL
+        self.configure_github(config)
         config.ORC_COURSE_PREFIX = self.TEST_PREFIX
         config.ORC_XML_ORG = self.ORG
         config.ORC_XML_DEPLOY_TEAM = self.TEST_TEAM
@@ -225,8 +261,7 @@ class TestActions(TestGithubBase):
     def test_create_xml_repo_success_no_team(self, config):
         """Test the API call comes through as expected.
         """
-        config.ORC_GH_OAUTH2_TOKEN = self.OAUTH2_TOKEN
-        config.ORC_GH_API_URL = self.URL
+        self.configure_github(config)
         config.ORC_COURSE_PREFIX = self.TEST_PREFIX
         config.ORC_XML_ORG = self.ORG
         config.ORC_XML_DEPLOY_TEAM = self.TEST_TEAM
@@ -271,16 +306,11 @@ class TestActions(TestGithubBase):
     def test_rerun_xml_success(self, config):
         """Test the API call comes through as expected.
         """
-        config.ORC_GH_OAUTH2_TOKEN = self.OAUTH2_TOKEN
-        config.ORC_GH_API_URL = self.URL
+        self.configure_github(config)
         config.ORC_COURSE_PREFIX = self.TEST_PREFIX
         config.ORC_XML_ORG = self.ORG
 
-        self.register_repo_check(
-            partial(self.callback_repo_check, status_code=200)
-        )
-        self.register_hook_list()
-        self.register_hook_delete()
+        self.register_hooked_repo()
         hooks_deleted = rerun_xml(self.TEST_COURSE, self.TEST_TERM)
         self.assertEqual(1, hooks_deleted)
 
@@ -289,12 +319,14 @@ class TestActions(TestGithubBase):
     def test_release_xml_success(self, config):
         """Test the API call comes through as expected.
         """
-        config.ORC_GH_OAUTH2_TOKEN = self.OAUTH2_TOKEN
-        config.ORC_GH_API_URL = self.URL
+        self.configure_github(config)
         config.ORC_COURSE_PREFIX = self.TEST_PREFIX
         config.ORC_XML_ORG = self.ORG
         config.ORC_PRODUCTION_GITRELOAD = self.TEST_PRODUCTION_GR
 
+        self.register_repo_check(
+            partial(self.callback_repo_check, status_code=200)
+        )
         self.register_hook_create(json.dumps({'id': 2}), status=201)
         self.register_team_repo_add(self.callback_team_repo)
 
@@ -308,8 +340,7 @@ class TestActions(TestGithubBase):
     def test_put_team_success(self, config):
         """Test the API call comes through as expected.
         """
-        config.ORC_GH_OAUTH2_TOKEN = self.OAUTH2_TOKEN
-        config.ORC_GH_API_URL = self.URL
+        self.configure_github(config)
         config.ORC_COURSE_PREFIX = self.TEST_PREFIX
         config.ORC_XML_ORG = self.ORG
         config.ORC_XML_DEPLOY_TEAM = self.TEST_TEAM
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Test the github client and actions that return futures
+"""
+from functools import partial
+
+import httpretty
+import mock
+
+from orcoursetrion.actions import (
+    rerun_xml_async,
+    shutdown_async_actions,
+)
+from orcoursetrion.lib import FutureGitHub, GitHubRepoExists
+from orcoursetrion.tests.base import TestGithubBase
+
+
+class TestFutureGitHub(TestGithubBase):
+    """Test calls returning futures"""
+
+    def setUp(self):
+        """Make a client"""
+        super(TestFutureGitHub, self).setUp()
+        self.git_hub = FutureGitHub.connect(
+            self.URL, self.OAUTH2_TOKEN, max_workers=4
+        )
+        self.addCleanup(self.git_hub.close)
+
+    def test_connect(self):
+        """Verify there's a pooled connection for each worker"""
+        # pylint: disable=protected-access
+        self.assertEqual(
+            4, self.git_hub.github.rate_limiter.adapter.adapter._pool_maxsize
+        )
+
+    @httpretty.activate
+    def test_create_repo(self):
+        """Verify calls return futures of the result or exception"""
+        self.register_repo_check(self.callback_repo_check)
+        self.register_repo_create(self.callback_repo_create)
+        self.register_team_list(self.callback_team_list)
+        future = self.git_hub.create_repo(
+            self.ORG, self.TEST_REPO, self.TEST_DESCRIPTION
+        )
+        self.assertEqual('testing', future.result()['html_url'])
+
+        self.register_repo_check(
+            partial(self.callback_repo_check, status_code=200)
+        )
+        future = self.git_hub.create_repo(
+            self.ORG, self.TEST_REPO, self.TEST_DESCRIPTION
+        )
+        self.assertIsInstance(future.exception(), GitHubRepoExists)
+
+    @httpretty.activate
+    def test_get_all(self):
+        """Verify every page of a list is gathered"""
+        self.register_team_list(
+            partial(self.callback_team_list, more=True)
+        )
+        teams = self.git_hub.get_all(
+            '{url}orgs/{org}/teams'.format(url=self.URL, org=self.ORG)
+        ).result()
+        self.assertEqual(
+            [self.TEST_TEAM, self.TEST_REPO, 'Other Team'],
+            [x['name'] for x in teams]
+        )
+
+    @httpretty.activate
+    def test_unit_of_work(self):
+        """Verify calls run in the caller's unit of work"""
+        self.register_hooked_repo()
+        with self.git_hub.github.unit_of_work():
+            for _ in range(3):
+                self.git_hub.delete_web_hooks(
+                    self.ORG, self.TEST_REPO
+                ).result()
+        self.assertEqual(1, len([
+            x for x in httpretty.HTTPretty.latest_requests
+            if x.path.endswith(self.TEST_REPO)
+        ]))
+
+    def test_actions(self):
+        """Verify actions run on the shared workers"""
+        self.addCleanup(shutdown_async_actions)
+        with mock.patch(
+            'orcoursetrion.actions.async_github.rerun_xml', return_value=2
+        ) as rerun_xml:
+            future = rerun_xml_async(self.TEST_COURSE, self.TEST_TERM)
+            self.assertEqual(2, future.result())
+        rerun_xml.assert_called_once_with(self.TEST_COURSE, self.TEST_TERM)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Test running manifests of actions
+"""
+# Because pylint can't figure out dynamic attributes for config
+# pylint: disable=no-member
+
+import os
+import shutil
+import tempfile
+
+import httpretty
+import mock
+
+from orcoursetrion.actions import ManifestError, read_manifest, run_batch
+from orcoursetrion.cmd import execute
+from orcoursetrion.tests.base import TestGithubBase
+
+
+class TestBatch(TestGithubBase):
+    """Test reading and running manifests"""
+
+    def setUp(self):
+        """Make a directory for manifests"""
+        super(TestBatch, self).setUp()
+        self.manifest_dir = tempfile.mkdtemp(prefix='orc_batch_test')
+        self.addCleanup(shutil.rmtree, self.manifest_dir)
+
+    def write_manifest(self, name, contents):
+        """Write a manifest file and return its path"""
+        path = os.path.join(self.manifest_dir, name)
+        with open(path, 'w') as manifest:
+            manifest.write(contents)
+        return path
+
+    def test_read_csv(self):
+        """Verify CSV rows are cleaned up"""
+        path = self.write_manifest('rollover.csv', (
+            'action,course,term,team,members\n'
+            'create_xml_repo,6.001,2015_Spring,,alice; bob\n'
+            'rerun_xml,6.002,2015_Spring,,\n'
+        ))
+        self.assertEqual([
+            {
+                'action': 'create_xml_repo', 'course': '6.001',
+                'term': '2015_Spring', 'members': ['alice', 'bob'],
+            },
+            {'action': 'rerun_xml', 'course': '6.002', 'term': '2015_Spring'},
+        ], read_manifest(path))
+
+    def test_read_yaml(self):
+        """Verify YAML manifests are read, and numbers made strings"""
+        path = self.write_manifest('rollover.yml', (
+            '- action: create_xml_repo\n'
+            '  course: "6.10"\n'
+            '  term: 2015\n'
+            '  team: Staff\n'
+            '  members: [alice, bob]\n'
+        ))
+        self.assertEqual([{
+            'action': 'create_xml_repo', 'course': '6.10', 'term': '2015',
+            'team': 'Staff', 'members': ['alice', 'bob'],
+        }], read_manifest(path))
+        with mock.patch.dict('sys.modules', {'yaml': None}):
+            with self.assertRaisesRegexp(ManifestError, 'PyYAML'):
+                read_manifest(path)
+
+    def test_read_invalid(self):
+        """Verify bad manifests raise with the row at fault"""
+        for contents, message in (
+                ('action,course\nrerun_xml,6.001\n', 'Row 1 is missing term'),
+                ('action,course,term\nfly,6.001,x\n', 'unknown action fly'),
+                ('action,course,term,size\nrerun_xml,6,x,1\n', 'columns size'),
+                (
+                    'action,course,term\nrerun_studio,6,x\n',
+                    'missing new_term'
+                ),
+        ):
+            path = self.write_manifest('bad.csv', contents)
+            with self.assertRaisesRegexp(ManifestError, message):
+                read_manifest(path)
+        path = self.write_manifest('bad.yaml', 'action: rerun_xml\n')
+        with self.assertRaisesRegexp(ManifestError, 'list of rows'):
+            read_manifest(path)
+
+    @mock.patch('orcoursetrion.actions.github.config')
+    @httpretty.activate
+    def test_run_batch(self, config):
+        """Verify rows run, failures are kept, and API calls counted"""
+        self.configure_github(config)
+        config.ORC_COURSE_PREFIX = self.TEST_PREFIX
+        config.ORC_XML_ORG = self.ORG
+        self.register_hooked_repo()
+
+        results = []
+        with mock.patch(
+            'orcoursetrion.actions.batch.release_xml',
+            side_effect=ValueError('nope')
+        ):
+            summary = run_batch([
+                {
+                    'action': 'rerun_xml', 'course': self.TEST_COURSE,
+                    'term': self.TEST_TERM,
+                },
+                {
+                    'action': 'release_xml', 'course': self.TEST_COURSE,
+                    'term': self.TEST_TERM,
+                },
+            ], max_workers=2, callback=results.append)
+        self.assertEqual((1, 1), (summary.succeeded, summary.failed))
+        # Repo check, hook list and hook delete
+        self.assertEqual(3, summary.api_calls)
+        results = dict((x.row['action'], x) for x in results)
+        self.assertEqual(1, results['rerun_xml'].result)
+        self.assertIsNone(results['rerun_xml'].error)
+        self.assertIsInstance(results['release_xml'].error, ValueError)
+
+    def test_cmd_batch(self):
+        """Verify the batch command streams results and a summary"""
+        path = self.write_manifest('rollover.csv', (
+            'action,course,term\n'
+            'create_export_repo,6.001,2015_Spring\n'
+            'rerun_xml,6.002,2015_Spring\n'
+        ))
+        args = ['orcoursetrion', 'batch', '-f', path, '-w', '2']
+        with mock.patch('sys.argv', args):
+            with mock.patch(
+                'orcoursetrion.actions.batch.create_export_repo',
+                return_value={'html_url': 'http://example.com/repo'}
+            ), mock.patch(
+                'orcoursetrion.actions.batch.rerun_xml',
+                side_effect=ValueError('nope')
+            ), mock.patch('orcoursetrion.actions.batch.github_client'):
+                with mock.patch('sys.stdout') as stdout:
+                    with self.assertRaises(SystemExit):
+                        execute()
+        output = ''.join(x[0][0] for x in stdout.write.call_args_list)
+        self.assertIn(
+            'ok create_export_repo 6.001 2015_Spring', output
+        )
+        self.assertIn('http://example.com/repo', output)
+        self.assertIn(
+            'FAILED rerun_xml 6.002 2015_Spring', output
+        )
+        self.assertIn('ValueError: nope', output)
+        self.assertIn('1 succeeded, 1 failed in', output)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Test conditional request caching of github responses
+"""
+from functools import partial
+import json
+import os
+import shutil
+import tempfile
+
+import httpretty
+
+from orcoursetrion.lib import DiskCacheStore, GitHub, MemoryCacheStore
+from orcoursetrion.tests.base import TestGithubBase
+
+
+class TestCache(TestGithubBase):
+    """Test response stores and the caching adapter"""
+
+    def callback_conditional_repo(
+            self, request, uri, headers, requests_seen=None
+    ):
+        """Mock getting a repo that supports conditional requests.
+
+        ``requests_seen`` gets a tuple of the ``If-None-Match`` and
+        ``If-Modified-Since`` headers of each request appended to it.
+        """
+        # pylint: disable=unused-argument
+        etag = '"abc123"'
+        last_modified = 'Thu, 01 Jan 2015 00:00:00 GMT'
+        if_none_match = request.headers.get('If-None-Match')
+        if_modified_since = request.headers.get('If-Modified-Since')
+        requests_seen.append((if_none_match, if_modified_since))
+        headers.update({'ETag': etag, 'Last-Modified': last_modified})
+        if if_none_match == etag:
+            return (304, headers, '')
+        return (200, headers, json.dumps({'name': self.TEST_REPO}))
+
+    def register_conditional_repo(self, requests_seen):
+        """Register the conditional repo endpoint"""
+        httpretty.register_uri(
+            httpretty.GET,
+            self.TEST_REPO_URL,
+            body=partial(
+                self.callback_conditional_repo, requests_seen=requests_seen
+            )
+        )
+
+    @httpretty.activate
+    def test_not_modified_from_cache(self):
+        """Verify the second GET is conditional and a 304 uses the cache"""
+        requests_seen = []
+        self.register_conditional_repo(requests_seen)
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN, cache=MemoryCacheStore())
+        # pylint: disable=protected-access
+        first = git_hub._get_repo(self.ORG, self.TEST_REPO)
+        second = git_hub._get_repo(self.ORG, self.TEST_REPO)
+        self.assertEqual({'name': self.TEST_REPO}, first)
+        self.assertEqual(first, second)
+        self.assertEqual(
+            [
+                (None, None),
+                ('"abc123"', 'Thu, 01 Jan 2015 00:00:00 GMT'),
+            ],
+            requests_seen
+        )
+
+    @httpretty.activate
+    def test_cache_per_token(self):
+        """Verify responses aren't shared between tokens"""
+        requests_seen = []
+        self.register_conditional_repo(requests_seen)
+        store = MemoryCacheStore()
+        # pylint: disable=protected-access
+        GitHub(self.URL, self.OAUTH2_TOKEN, cache=store)._get_repo(
+            self.ORG, self.TEST_REPO
+        )
+        GitHub(self.URL, 'other', cache=store)._get_repo(
+            self.ORG, self.TEST_REPO
+        )
+        self.assertEqual([(None, None), (None, None)], requests_seen)
+
+    @httpretty.activate
+    def test_disk_cache_shared(self):
+        """Verify separate clients (i.e. runs) share a disk cache"""
+        cache_dir = tempfile.mkdtemp(prefix='orc_cache_test')
+        self.addCleanup(shutil.rmtree, cache_dir)
+        requests_seen = []
+        self.register_conditional_repo(requests_seen)
+        for _ in range(2):
+            git_hub = GitHub(
+                self.URL,
+                self.OAUTH2_TOKEN,
+                cache=DiskCacheStore(os.path.join(cache_dir, 'store'))
+            )
+            # pylint: disable=protected-access
+            self.assertEqual(
+                {'name': self.TEST_REPO},
+                git_hub._get_repo(self.ORG, self.TEST_REPO)
+            )
+        self.assertEqual('"abc123"', requests_seen[1][0])
+
+    def test_memory_store_eviction(self):
+        """Verify the least recently used entries are evicted"""
+        store = MemoryCacheStore(max_entries=2)
+        store.set('a', {'content': 'a'})
+        store.set('b', {'content': 'b'})
+        store.get('a')
+        store.set('c', {'content': 'c'})
+        self.assertIsNone(store.get('b'))
+        self.assertEqual({'content': 'a'}, store.get('a'))
+        self.assertEqual({'content': 'c'}, store.get('c'))
+
+    def test_disk_store_eviction(self):
+        """Verify the disk store stays under its size"""
+        cache_dir = tempfile.mkdtemp(prefix='orc_cache_test')
+        self.addCleanup(shutil.rmtree, cache_dir)
+        store = DiskCacheStore(cache_dir, max_bytes=1000)
+        entry = {
+            'etag': 'a', 'last_modified': None, 'headers': {},
+            'content': 'x' * 200,
+        }
+        # pylint: disable=protected-access
+        for key in range(10):
+            store.set(str(key), entry)
+            # Make sure modification times are ordered
+            os.utime(store._entry_path(str(key)), (key, key))
+        self.assertEqual(entry, store.get('9'))
+        self.assertIsNone(store.get('0'))
+        self.assertLessEqual(
+            sum(
+                os.path.getsize(os.path.join(cache_dir, x))
+                for x in os.listdir(cache_dir)
+            ),
+            1000
+        )
@@ -2,9 +2,16 @@
 """
 Test command line parsing and actions
 """
+import os
+import pstats
+import shutil
+import tempfile
+
 import mock
 
 from orcoursetrion.cmd import execute
+from orcoursetrion.lib import RequestMetrics
+from orcoursetrion.lib.github import GIT_STOPWATCH
 from orcoursetrion.tests.base import TestGithubBase
 
 
@@ -199,3 +206,40 @@ class TestGithubCommand(TestGithubBase):
                 mocked_actions.put_team.assert_called_with(
                     self.ORG, self.TEST_TEAM, True, ['bizarnage', 'chemistro']
                 )
+
+    def test_cmd_profile(self):
+        """
+        Command line test of profiling an action
+        """
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        profile_path = os.path.join(path, 'rerun.pstats')
+        metrics = RequestMetrics()
+
+        def rerun_xml(course, term):
+            """Make a request and copy a repo"""
+            # pylint: disable=unused-argument
+            metrics.record('DELETE', 'repos/org/repo/hooks/1', 204, 0.25, 0)
+            GIT_STOPWATCH.timed(lambda: None)()
+            return 1
+
+        args = [
+            'orcoursetrion', '--profile-output', profile_path, 'rerun_xml',
+            '-c', self.TEST_COURSE,
+            '-t', self.TEST_TERM,
+        ]
+        with mock.patch('sys.argv', args):
+            with mock.patch('orcoursetrion.cmd.actions') as mocked_actions:
+                mocked_actions.github_metrics.return_value = metrics
+                mocked_actions.rerun_xml.side_effect = rerun_xml
+                with mock.patch('sys.stderr') as stderr:
+                    execute()
+        output = ''.join(x[0][0] for x in stderr.write.call_args_list)
+        self.assertIn('network', output)
+        self.assertIn('0.25s', output)
+        self.assertIn('(1 API calls)', output)
+        self.assertIn('(1 repo copies)', output)
+        self.assertIn('DELETE repos/{org}/{repo}/hooks/{id}', output)
+        self.assertIn(
+            'rerun_xml', str(pstats.Stats(profile_path).stats.keys())
+        )
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+# The client has a lot of calls to cover
+# pylint: disable=too-many-lines
 """
 Test github actions and backing library
 """
@@ -6,22 +8,31 @@ Test github actions and backing library
 # pylint: disable=no-member
 
 from functools import partial
+from itertools import islice
 import json
 import os
 import re
 import shutil
 import tempfile
+import time
 
+from concurrent.futures import ThreadPoolExecutor
 import httpretty
+import mock
 import sh
 
 from orcoursetrion.lib import (
+    close_shared_clients,
+    shared_client,
     GitHub,
+    GitHubException,
     GitHubRepoExists,
     GitHubUnknownError,
     GitHubNoTeamFound,
-    GitHubRepoDoesNotExist
+    GitHubRepoDoesNotExist,
+    GitHubMembershipError
 )
+from orcoursetrion.lib.github import DEFAULT_MAX_WORKERS, MAX_PER_PAGE
 from orcoursetrion.tests.base import TestGithubBase
 
 
@@ -74,6 +85,190 @@ class TestGithub(TestGithubBase):
             # pylint: disable=protected-access
             git_hub._get_all(test_url)
 
+    @httpretty.activate
+    def test_get_all_parallel_pages(self):
+        """Verify pages listed by the ``last`` link are all fetched, with
+        the requested page size, and returned in order."""
+        requested = []
+        test_url = '{url}orgs/{org}/teams'.format(url=self.URL, org=self.ORG)
+        self.register_team_list(partial(
+            self.callback_paged_list, num_pages=6, requested=requested
+        ))
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN, max_workers=3)
+        # pylint: disable=protected-access
+        results = git_hub._get_all(test_url, per_page=100)
+        self.assertEqual([x['page'] for x in results], range(1, 7))
+        self.assertItemsEqual(
+            [(x, u'100') for x in range(1, 7)], requested
+        )
+
+    @httpretty.activate
+    def test_get_all_next_links(self):
+        """Verify we still walk ``next`` links without a ``last`` link"""
+        test_url = '{url}orgs/{org}/teams'.format(url=self.URL, org=self.ORG)
+        self.register_team_list(partial(
+            self.callback_paged_list, num_pages=3, last=False
+        ))
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        # pylint: disable=protected-access
+        results = git_hub._get_all(test_url)
+        self.assertEqual([x['page'] for x in results], [1, 2, 3])
+
+    @httpretty.activate
+    def test_iter_all_early_exit(self):
+        """Verify pages are only requested as they are consumed"""
+        requested = []
+        test_url = '{url}orgs/{org}/teams'.format(url=self.URL, org=self.ORG)
+        self.register_team_list(partial(
+            self.callback_paged_list, num_pages=5, requested=requested
+        ))
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        results = list(islice(git_hub.iter_all(test_url, per_page=1), 2))
+        self.assertEqual([x['page'] for x in results], [1, 2])
+        self.assertEqual([(1, u'1'), (2, None)], requested)
+
+        # And all of them when we consume everything
+        results = list(git_hub.iter_all(test_url))
+        self.assertEqual([x['page'] for x in results], range(1, 6))
+
+    @httpretty.activate
+    def test_iter_all_bad_status(self):
+        """Verify 404 is empty and other bad statuses raise"""
+        test_url = '{url}orgs/{org}/teams'.format(url=self.URL, org=self.ORG)
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.register_team_list(
+            partial(self.callback_team_list, status_code=404)
+        )
+        self.assertEqual([], list(git_hub.iter_all(test_url)))
+
+        self.register_team_list(
+            partial(self.callback_team_list, status_code=422)
+        )
+        with self.assertRaises(GitHubUnknownError):
+            list(git_hub.iter_all(test_url))
+
+    @httpretty.activate
+    def test_find_team_stops_paging(self):
+        """Verify finding a team on the first page doesn't get the rest"""
+        self.register_team_list(partial(self.callback_team_list, more=True))
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        # pylint: disable=protected-access
+        team = git_hub._find_team(self.ORG, self.TEST_TEAM)
+        self.assertEqual(team['id'], self.TEST_TEAM_ID)
+        self.assertNotIn('page', httpretty.last_request().querystring)
+
+        # Teams on later pages are still found
+        team = git_hub._find_team(self.ORG, 'Other Team')
+        self.assertEqual(team['id'], 3)
+        self.assertEqual(
+            httpretty.last_request().querystring['page'], [u'2']
+        )
+
+    def test_team_slug(self):
+        """Verify we build slugs the way github does"""
+        # pylint: disable=protected-access
+        for name, slug in [
+                (self.TEST_TEAM, 'test-deploy'),
+                (' My  Team!! ', 'my-team'),
+                (self.TEST_REPO, self.TEST_REPO.lower()),
+        ]:
+            self.assertEqual(GitHub._team_slug(name), slug)
+
+    @httpretty.activate
+    def test_find_team_by_slug(self):
+        """Verify a team is found with one request to its slug"""
+        self.register_team_list(
+            self.callback_team_list, team_body=self.callback_team_get
+        )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        # pylint: disable=protected-access
+        team = git_hub._find_team(self.ORG, ' {0} '.format(self.TEST_TEAM))
+        self.assertEqual(team['id'], self.TEST_TEAM_ID)
+        self.assertEqual(
+            httpretty.last_request().path,
+            '/orgs/{0}/teams/test-deploy'.format(self.ORG)
+        )
+
+        # Slug misses fall back to the list
+        team = git_hub._find_team(self.ORG, self.TEST_REPO)
+        self.assertEqual(team['name'], self.TEST_REPO)
+        self.assertTrue(httpretty.last_request().path.startswith(
+            '/orgs/{0}/teams?'.format(self.ORG)
+        ))
+
+    @httpretty.activate
+    def test_find_team_slug_name_mismatch(self):
+        """Verify a slug match with a different name isn't used"""
+        self.register_team_list(
+            self.callback_team_list,
+            team_body=json.dumps({'id': 5, 'name': 'test deploy'})
+        )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        # pylint: disable=protected-access
+        team = git_hub._find_team(self.ORG, self.TEST_TEAM)
+        self.assertEqual(team['id'], self.TEST_TEAM_ID)
+
+    @httpretty.activate
+    def test_find_team_index(self):
+        """Verify found teams and complete listings are indexed"""
+        self.register_team_list(
+            partial(self.callback_team_list, more=True),
+            team_body=self.callback_team_get
+        )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        # pylint: disable=protected-access
+        team = git_hub._find_team(self.ORG, self.TEST_TEAM)
+        last_request = httpretty.last_request()
+        self.assertEqual(team, git_hub._find_team(self.ORG, self.TEST_TEAM))
+        self.assertIs(last_request, httpretty.last_request())
+        self.assertEqual(
+            {'hits': 1, 'misses': 1, 'teams': 1}, git_hub.team_index.info()
+        )
+
+        # A full listing indexes everything and knows what's missing
+        with self.assertRaises(GitHubNoTeamFound):
+            git_hub._find_team(self.ORG, 'foobar')
+        last_request = httpretty.last_request()
+        self.assertEqual(3, git_hub._find_team(self.ORG, 'other team')['id'])
+        with self.assertRaises(GitHubNoTeamFound):
+            git_hub._find_team(self.ORG, 'foobar')
+        self.assertIs(last_request, httpretty.last_request())
+        self.assertEqual(
+            {'hits': 3, 'misses': 2, 'teams': 3}, git_hub.team_index.info()
+        )
+
+    @httpretty.activate
+    def test_find_team_index_expires(self):
+        """Verify the index is refreshed after its TTL"""
+        self.register_team_list(
+            self.callback_team_list, team_body=self.callback_team_get
+        )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN, team_cache_ttl=10)
+        with mock.patch('orcoursetrion.lib.github.time.time') as mock_time:
+            mock_time.return_value = 1000
+            # pylint: disable=protected-access
+            git_hub._find_team(self.ORG, self.TEST_TEAM)
+            last_request = httpretty.last_request()
+            mock_time.return_value = 1009
+            git_hub._find_team(self.ORG, self.TEST_TEAM)
+            self.assertIs(last_request, httpretty.last_request())
+            mock_time.return_value = 1011
+            git_hub._find_team(self.ORG, self.TEST_TEAM)
+            self.assertIsNot(last_request, httpretty.last_request())
+        self.assertEqual(2, git_hub.team_index.info()['misses'])
+
+    @httpretty.activate
+    def test_create_team_indexed(self):
+        """Verify created teams are added to the index"""
+        self.register_team_list(self.callback_team_list)
+        self.register_team_create(self.callback_team_create)
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        git_hub.put_team(self.ORG, 'New Team', True, None)
+        last_request = httpretty.last_request()
+        # pylint: disable=protected-access
+        self.assertEqual(2, git_hub._find_team(self.ORG, 'new team')['id'])
+        self.assertIs(last_request, httpretty.last_request())
+
     @httpretty.activate
     def test_create_repo_unknown_errors(self):
         """Test what happens when we don't get expected status_codes
@@ -98,6 +293,118 @@ class TestGithub(TestGithubBase):
                 self.ORG, self.TEST_REPO, self.TEST_DESCRIPTION
             )
 
+    @staticmethod
+    def repo_get_count():
+        """Count the repo lookups sent so far"""
+        return len([
+            x for x in httpretty.HTTPretty.latest_requests
+            if x.method == 'GET' and x.path.count('/') == 3
+        ])
+
+    @httpretty.activate
+    def test_unit_of_work(self):
+        """Verify repo lookups are remembered until the work is done"""
+        self.register_repo_check(
+            partial(self.callback_repo_check, status_code=200)
+        )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        # pylint: disable=protected-access
+        with git_hub.unit_of_work():
+            repo = git_hub._get_repo(self.ORG, self.TEST_REPO)
+            with git_hub.unit_of_work():
+                self.assertEqual(
+                    repo, git_hub._get_repo(self.ORG, self.TEST_REPO.upper())
+                )
+            # Missing repos are remembered too
+            for _ in range(2):
+                self.assertIsNone(
+                    git_hub._get_repo(self.ORG, self.TEST_RERUN_REPO)
+                )
+            self.assertEqual(2, self.repo_get_count())
+        git_hub._get_repo(self.ORG, self.TEST_REPO)
+        git_hub._get_repo(self.ORG, self.TEST_REPO)
+        self.assertEqual(4, self.repo_get_count())
+
+    @httpretty.activate
+    def test_coalesce_lookups(self):
+        """Verify threads looking up the same repo or team at the same
+        time share one request.
+        """
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+
+        def wait_for_herd(callback, request, uri, headers):
+            """Answer once the other threads are waiting on this one"""
+            deadline = time.time() + 5
+            while git_hub.flights.shared % 3 and time.time() < deadline:
+                time.sleep(0.01)
+            return callback(request, uri, headers)
+
+        self.register_repo_check(partial(
+            wait_for_herd,
+            partial(self.callback_repo_check, status_code=200)
+        ))
+        self.register_team_list(
+            partial(wait_for_herd, self.callback_team_list)
+        )
+        # pylint: disable=protected-access
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            repos = list(executor.map(
+                lambda _: git_hub._get_repo(self.ORG, self.TEST_REPO),
+                range(4)
+            ))
+            teams = list(executor.map(
+                lambda _: git_hub._find_team(self.ORG, self.TEST_TEAM),
+                range(4)
+            ))
+        self.assertTrue(all(x == repos[0] for x in repos))
+        self.assertTrue(all(x['id'] == self.TEST_TEAM_ID for x in teams))
+        self.assertEqual(6, git_hub.flights.shared)
+        # One repo GET, and one team by slug GET and team list each
+        self.assertEqual(3, len(httpretty.HTTPretty.latest_requests))
+
+    @httpretty.activate
+    def test_unit_of_work_threads(self):
+        """Verify other threads only share lookups when they join"""
+        self.register_repo_check(
+            partial(self.callback_repo_check, status_code=200)
+        )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+
+        def get_repo(join):
+            """Look the repo up twice"""
+            # pylint: disable=protected-access
+            with join():
+                git_hub._get_repo(self.ORG, self.TEST_REPO)
+                git_hub._get_repo(self.ORG, self.TEST_REPO)
+
+        with git_hub.unit_of_work():
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(get_repo, git_hub.unit_of_work).result()
+                self.assertEqual(1, self.repo_get_count())
+                executor.submit(get_repo, git_hub.current_work()).result()
+                executor.submit(get_repo, git_hub.current_work()).result()
+        self.assertEqual(2, self.repo_get_count())
+
+    @httpretty.activate
+    def test_unit_of_work_create_repo(self):
+        """Verify created repos are recorded in the unit of work"""
+        self.register_repo_check(self.callback_repo_check)
+        self.register_repo_create(self.callback_repo_create)
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        with git_hub.unit_of_work():
+            repo = git_hub.create_repo(
+                self.ORG, self.TEST_REPO, self.TEST_DESCRIPTION
+            )
+            # pylint: disable=protected-access
+            self.assertEqual(
+                repo, git_hub._get_repo(self.ORG, self.TEST_REPO)
+            )
+            with self.assertRaises(GitHubRepoExists):
+                git_hub.create_repo(
+                    self.ORG, self.TEST_REPO, self.TEST_DESCRIPTION
+                )
+        self.assertEqual(1, self.repo_get_count())
+
     @httpretty.activate
     def test_create_hook(self):
         """Test valid hook creation"""
@@ -172,6 +479,14 @@ class TestGithub(TestGithubBase):
         git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
         deleted_hooks = git_hub.delete_web_hooks(self.ORG, self.TEST_REPO)
         self.assertEqual(1, deleted_hooks)
+        # Every page of hooks is needed, so they're fetched concurrently
+        with mock.patch.object(
+            git_hub, '_get_all', return_value=[]
+        ) as get_all:
+            git_hub.delete_web_hooks(self.ORG, self.TEST_REPO)
+        get_all.assert_called_once_with(
+            '{0}/hooks'.format(self.TEST_REPO_URL), per_page=MAX_PER_PAGE
+        )
 
     @httpretty.activate
     def test_add_team_repo_success(self):
@@ -183,6 +498,15 @@ class TestGithub(TestGithubBase):
         git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
         # This will raise on any failures
         git_hub.add_team_repo(self.ORG, self.TEST_REPO, self.TEST_TEAM)
+        # The team keeps its own permission unless one is given
+        self.assertEqual('', httpretty.last_request().body)
+        git_hub.add_team_repo(
+            self.ORG, self.TEST_REPO, self.TEST_TEAM, permission='push'
+        )
+        self.assertEqual(
+            {'permission': 'push'},
+            json.loads(httpretty.last_request().body)
+        )
 
     @httpretty.activate
     def test_add_team_repo_no_teams(self):
@@ -295,7 +619,9 @@ class TestGithub(TestGithubBase):
         self.register_team_membership(
             partial(self.callback_team_membership, action_list=member_changes)
         )
-        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        # Disable the team index, since it would remember the team
+        # created first.
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN, team_cache_ttl=0)
 
         # Verify permission is pull:
         self.register_team_create(self.callback_team_create)
@@ -339,6 +665,102 @@ class TestGithub(TestGithubBase):
         ):
             git_hub.put_team(self.ORG, self.TEST_TEAM, True, [])
 
+    @httpretty.activate
+    def test_put_team_membership_results(self):
+        """Verify every membership change is attempted and reported even
+        when some fail."""
+        member_changes = []
+        self.register_team_list(self.callback_team_list)
+        self.register_team_members(self.callback_team_members)
+        self.register_team_membership(partial(
+            self.callback_team_membership,
+            success=False,
+            action_list=member_changes
+        ))
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN, max_workers=3)
+        with self.assertRaises(GitHubMembershipError) as context:
+            git_hub.put_team(
+                self.ORG, self.TEST_TEAM, True, ['archlight', 'ereshkigal']
+            )
+        # Removals fail, and the addition still goes through
+        self.assertEqual([('ereshkigal', True)], member_changes)
+        self.assertEqual(
+            {
+                'bizarnage': {'add': False, 'error': ''},
+                'chemistro': {'add': False, 'error': ''},
+                'dreadnought': {'add': False, 'error': ''},
+                'ereshkigal': {'add': True, 'error': None},
+            },
+            context.exception.results
+        )
+        self.assertTrue(str(context.exception).startswith(
+            'Failed to add or remove bizarnage, chemistro, dreadnought.'
+        ))
+
+    def test_change_team_membership_nothing(self):
+        """Verify no changes doesn't make any requests"""
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.assertEqual({}, git_hub.change_team_membership(1, {}))
+
+    def test_shared_client(self):
+        """Verify clients are shared per API URL and token, across threads"""
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            clients = list(executor.map(
+                lambda url: shared_client(url, self.OAUTH2_TOKEN),
+                [self.URL, self.URL.rstrip('/')] * 4
+            ))
+        self.assertEqual(1, len(set(id(x) for x in clients)))
+        self.assertIsNot(
+            clients[0], shared_client(self.URL, 'other_token')
+        )
+        # Arguments only apply when the client is created
+        self.assertEqual(
+            DEFAULT_MAX_WORKERS,
+            shared_client(self.URL, self.OAUTH2_TOKEN, max_workers=2)
+            .max_workers
+        )
+        factory = mock.Mock()
+        self.assertIs(
+            clients[0],
+            shared_client(self.URL, self.OAUTH2_TOKEN, factory=factory)
+        )
+        self.assertFalse(factory.called)
+        close_shared_clients()
+        self.assertIs(
+            factory.return_value,
+            shared_client(self.URL, self.OAUTH2_TOKEN, factory=factory)
+        )
+        factory.assert_called_once_with(self.URL, self.OAUTH2_TOKEN)
+
+    def test_client_pooling(self):
+        """Verify the connection pool size and keep-alive are configurable"""
+        git_hub = GitHub(
+            self.URL, self.OAUTH2_TOKEN, pool_size=3, keep_alive=False
+        )
+        # pylint: disable=protected-access
+        self.assertEqual(
+            3, git_hub.rate_limiter.adapter.adapter._pool_maxsize
+        )
+        self.assertEqual('close', git_hub.session.headers['Connection'])
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.assertNotIn('Connection', git_hub.session.headers)
+
+    def test_transport(self):
+        """Verify HTTP/2 is sent through hyper, when it's installed"""
+        hyper_contrib = mock.MagicMock()
+        modules = {'hyper': mock.MagicMock(), 'hyper.contrib': hyper_contrib}
+        with mock.patch.dict('sys.modules', modules):
+            git_hub = GitHub(self.URL, self.OAUTH2_TOKEN, transport='http2')
+        self.assertIs(
+            hyper_contrib.HTTP20Adapter.return_value,
+            git_hub.rate_limiter.adapter.adapter
+        )
+        with mock.patch.dict('sys.modules', {'hyper': None}):
+            with self.assertRaisesRegexp(GitHubException, 'hyper'):
+                GitHub(self.URL, self.OAUTH2_TOKEN, transport='http2')
+        with self.assertRaisesRegexp(ValueError, 'spdy'):
+            GitHub(self.URL, self.OAUTH2_TOKEN, transport='spdy')
+
     def test_copy_repo(self):
         """
         Verify that we can do a single commit, single branch copy of a
@@ -470,6 +892,223 @@ class TestGithub(TestGithubBase):
         with open('test', 'r') as test_file:
             self.assertEqual(branch, test_file.read())
 
+    def test_copy_repo_threads(self):
+        """Verify copies can run at the same time without changing the
+        working directory.
+        """
+        committer = {'name': 'foo', 'email': 'foo@example.com'}
+        tmp_dir = tempfile.mkdtemp(prefix='orc_git_test')
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        src_repo = os.path.join(tmp_dir, 'src')
+        git = sh.git.bake(_cwd=tmp_dir)
+        git.init(src_repo)
+        with open(os.path.join(src_repo, 'test'), 'w') as test_file:
+            test_file.write('hello')
+        git = sh.git.bake(_cwd=src_repo)
+        git.config('user.email', committer['email'])
+        git.config('user.name', committer['name'])
+        git.add('.')
+        git.commit(m='hello')
+        dst_repos = [os.path.join(tmp_dir, 'dst{0}'.format(x)) for x in '12']
+        for dst_repo in dst_repos:
+            sh.git.init(dst_repo, bare=True)
+
+        cwd = os.getcwd()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(
+                lambda dst: GitHub.shallow_copy_repo(
+                    'file://{0}'.format(src_repo),
+                    'file://{0}'.format(dst),
+                    committer
+                ),
+                dst_repos
+            ))
+        self.assertEqual(cwd, os.getcwd())
+        for dst_repo in dst_repos:
+            self.assertIn(
+                'Initial rerun copy',
+                str(sh.git.log('-1', format='%s', _cwd=dst_repo))
+            )
+
+    def test_copy_repo_paths(self):
+        """Verify only the paths wanted are copied"""
+        committer = {'name': 'foo', 'email': 'foo@example.com'}
+        tmp_dir = tempfile.mkdtemp(prefix='orc_git_test')
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        src_repo = os.path.join(tmp_dir, 'src')
+        for path in ('course.xml', 'static/big.png', 'drafts/draft.xml'):
+            path = os.path.join(src_repo, path)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as test_file:
+                test_file.write(path)
+        git = sh.git.bake(_cwd=tmp_dir)
+        git.init(src_repo)
+        git = sh.git.bake(_cwd=src_repo)
+        git.config('user.email', committer['email'])
+        git.config('user.name', committer['name'])
+        # Let the local repo serve partial clones like github does
+        git.config('uploadpack.allowFilter', 'true')
+        git.add('.')
+        git.commit(m='hello')
+
+        for include, exclude, expected in (
+                (None, ['static/', 'drafts/'], ['course.xml']),
+                (['/static/'], None, ['static/big.png']),
+        ):
+            dst_repo = tempfile.mkdtemp(dir=tmp_dir)
+            sh.git.init(dst_repo, bare=True)
+            GitHub.shallow_copy_repo(
+                'file://{0}'.format(src_repo),
+                'file://{0}'.format(dst_repo),
+                committer,
+                include=include,
+                exclude=exclude
+            )
+            self.assertEqual(expected, str(sh.git.bake(_cwd=dst_repo)(
+                'ls-tree', '-r', '--name-only', 'HEAD', _tty_out=False
+            )).split())
+
+    def test_bulk_shallow_copy_repos(self):
+        """Verify copies run on a process pool, and failures are kept"""
+        committer = {'name': 'foo', 'email': 'foo@example.com'}
+        tmp_dir = tempfile.mkdtemp(prefix='orc_git_test')
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        src_repo = os.path.join(tmp_dir, 'src')
+        sh.git.init(src_repo)
+        with open(os.path.join(src_repo, 'test'), 'w') as test_file:
+            test_file.write('hello')
+        git = sh.git.bake(_cwd=src_repo)
+        git.config('user.email', committer['email'])
+        git.config('user.name', committer['name'])
+        git.add('.')
+        git.commit(m='hello')
+        git.branch('live')
+        copies = []
+        for number, branch in enumerate([None, 'live', 'missing']):
+            dst_repo = os.path.join(tmp_dir, 'dst{0}'.format(number))
+            sh.git.init(dst_repo, bare=True)
+            copies.append((
+                'file://{0}'.format(src_repo),
+                'file://{0}'.format(dst_repo),
+                branch
+            ))
+
+        results = GitHub.bulk_shallow_copy_repos(
+            copies, committer, processes=2
+        )
+        self.assertEqual(
+            copies, [(x.src_repo, x.dst_repo, x.branch) for x in results]
+        )
+        self.assertEqual([None, None], [x.error for x in results[:2]])
+        self.assertIn('ErrorReturnCode', results[2].error)
+        self.assertTrue(all(x.seconds > 0 for x in results))
+        for _, dst_repo, _ in copies[:2]:
+            self.assertEqual('hello', str(sh.git.show(
+                'HEAD:test', _cwd=dst_repo[len('file://'):], _tty_out=False
+            )))
+        self.assertEqual([], GitHub.bulk_shallow_copy_repos([], committer))
+
+    def register_template_api(self, is_template):
+        """Register a source repo, the template flag update reporting
+        ``is_template``, and generating from it.
+        """
+        src_url = self.TEST_REPO_URL
+        httpretty.register_uri(
+            httpretty.GET,
+            src_url,
+            body=json.dumps({
+                'name': self.TEST_REPO,
+                'default_branch': 'master',
+                'is_template': False,
+                'ssh_url': 'file:///src',
+            })
+        )
+        httpretty.register_uri(
+            httpretty.GET,
+            '{url}repos/{org}/{repo}'.format(
+                url=self.URL, org=self.ORG, repo=self.TEST_RERUN_REPO
+            ),
+            body=json.dumps({'message': 'Not Found'}),
+            status=404
+        )
+        httpretty.register_uri(
+            httpretty.PATCH,
+            src_url,
+            body=json.dumps({'is_template': is_template})
+        )
+        httpretty.register_uri(
+            httpretty.POST,
+            '{0}/generate'.format(src_url),
+            body=json.dumps({'name': self.TEST_RERUN_REPO}),
+            status=201
+        )
+
+    @httpretty.activate
+    def test_copy_repo_template(self):
+        """Verify repos are copied on the server from a template"""
+        self.register_template_api(True)
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        with mock.patch.object(git_hub, 'shallow_copy_repo') as shallow:
+            repo = git_hub.copy_repo(
+                self.ORG, self.TEST_REPO, self.ORG, self.TEST_RERUN_REPO,
+                None, self.TEST_DESCRIPTION
+            )
+        self.assertEqual({'name': self.TEST_RERUN_REPO}, repo)
+        self.assertFalse(shallow.called)
+        writes = [
+            (x.method, x.path.split('/')[-1], json.loads(x.body))
+            for x in httpretty.HTTPretty.latest_requests
+            if x.method != 'GET'
+        ]
+        self.assertEqual([
+            ('PATCH', self.TEST_REPO, {'is_template': True}),
+            ('POST', 'generate', {
+                'owner': self.ORG,
+                'name': self.TEST_RERUN_REPO,
+                'description': self.TEST_DESCRIPTION,
+                'private': True,
+            }),
+        ], writes)
+
+        with self.assertRaises(GitHubRepoExists):
+            git_hub.copy_repo(
+                self.ORG, self.TEST_REPO, self.ORG, self.TEST_REPO, None
+            )
+        with self.assertRaises(GitHubRepoDoesNotExist):
+            git_hub.copy_repo(
+                self.ORG, self.TEST_RERUN_REPO, self.ORG, self.TEST_REPO, None
+            )
+
+    @httpretty.activate
+    def test_copy_repo_fallback(self):
+        """Verify repos are cloned and pushed when templates can't be used"""
+        committer = {'name': 'foo', 'email': 'foo@example.com'}
+        self.register_template_api(False)
+        httpretty.register_uri(
+            httpretty.POST,
+            '{url}orgs/{org}/repos'.format(url=self.URL, org=self.ORG),
+            body=json.dumps({'ssh_url': 'file:///dst'}),
+            status=201
+        )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        for branch in (None, 'live'):
+            with mock.patch.object(git_hub, 'shallow_copy_repo') as shallow:
+                git_hub.copy_repo(
+                    self.ORG, self.TEST_REPO, self.ORG, self.TEST_RERUN_REPO,
+                    committer, branch=branch
+                )
+            shallow.assert_called_once_with(
+                'file:///src', 'file:///dst', committer, branch, None,
+                None, None
+            )
+        # The template flag is only tried for the default branch
+        self.assertEqual(1, len([
+            x for x in httpretty.HTTPretty.latest_requests
+            if x.method == 'PATCH'
+        ]))
+        self.assertNotIn('generate', httpretty.last_request().path)
+
     @httpretty.activate
     def test_add_repo_file_bad_status(self):
         """
@@ -498,6 +1137,91 @@ class TestGithub(TestGithubBase):
                 self.ORG, self.TEST_REPO, None, None, None, None
             )
 
+    @staticmethod
+    def git_data_requests():
+        """Get the method, path and JSON body of each request sent to the
+        Git Data and contents APIs.
+        """
+        return [
+            (x.method, x.path.split('/git/')[-1], json.loads(x.body))
+            for x in httpretty.HTTPretty.latest_requests
+            if '/git/' in x.path and x.method != 'GET' or
+            '/contents/' in x.path
+        ]
+
+    @httpretty.activate
+    def test_add_repo_files(self):
+        """Verify files are added in one commit on top of the branch"""
+        self.register_repo_check(
+            partial(self.callback_repo_check, status_code=200)
+        )
+        self.register_git_data()
+        committer = {'name': 'me', 'email': 'me@example.com'}
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        commit = git_hub.add_repo_files(
+            self.ORG, self.TEST_REPO, committer, 'Add files', {
+                'b/one.txt': 'one',
+                'a.bin': b'\xff\x00',
+            }
+        )
+        self.assertEqual({'sha': 'new_commits_sha'}, commit)
+        entry = {'mode': '100644', 'type': 'blob'}
+        self.assertEqual([
+            ('POST', 'blobs', {'content': '/wA=', 'encoding': 'base64'}),
+            ('POST', 'trees', {
+                'base_tree': 'base_tree_sha',
+                'tree': [
+                    dict(entry, path='a.bin', sha='new_blobs_sha'),
+                    dict(entry, path='b/one.txt', content='one'),
+                ],
+            }),
+            ('POST', 'commits', {
+                'message': 'Add files',
+                'tree': 'new_trees_sha',
+                'parents': ['head_sha'],
+                'committer': committer,
+            }),
+            ('PATCH', 'refs/heads/master', {'sha': 'new_commits_sha'}),
+        ], self.git_data_requests())
+
+    @httpretty.activate
+    def test_add_repo_files_empty_repo(self):
+        """Verify files are added to an empty repo with the contents API"""
+        self.register_repo_check(
+            partial(self.callback_repo_check, status_code=200)
+        )
+        self.register_git_data(ref_status=409)
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.assertEqual(
+            {'sha': 'seed_sha', 'tree': {'sha': 'seed_tree'}},
+            git_hub.add_repo_files(
+                self.ORG, self.TEST_REPO, None, 'Add files',
+                {'b.txt': 'b', 'a.txt': 'a'}
+            )
+        )
+        requests_sent = self.git_data_requests()
+        self.assertEqual(['PUT', 'PUT'], [x[0] for x in requests_sent])
+        self.assertTrue(requests_sent[0][1].endswith('/contents/a.txt'))
+        self.assertTrue(requests_sent[1][1].endswith('/contents/b.txt'))
+
+    @httpretty.activate
+    def test_add_repo_files_failures(self):
+        """Verify missing repos and bad statuses raise"""
+        self.register_repo_check(self.callback_repo_check)
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        with self.assertRaises(GitHubRepoDoesNotExist):
+            git_hub.add_repo_files(
+                self.ORG, self.TEST_REPO, None, None, {'a': 'a'}
+            )
+        self.register_repo_check(
+            partial(self.callback_repo_check, status_code=200)
+        )
+        self.register_git_data(ref_status=403)
+        with self.assertRaises(GitHubUnknownError):
+            git_hub.add_repo_files(
+                self.ORG, self.TEST_REPO, None, None, {'a': 'a'}
+            )
+
     @httpretty.activate
     def test_add_repo_file_success(self):
         """
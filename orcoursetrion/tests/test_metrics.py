@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Test metrics of github requests
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import httpretty
+import mock
+
+from orcoursetrion.actions import rerun_xml
+from orcoursetrion.lib import GitHub, MemoryCacheStore, RequestMetrics
+from orcoursetrion.lib.metrics import endpoint_template
+from orcoursetrion.tests.base import TestGithubBase
+
+
+class TestRequestMetrics(unittest.TestCase):
+    """Test tallying requests"""
+
+    def setUp(self):
+        """Record a few requests"""
+        self.metrics = RequestMetrics()
+        for seconds in range(1, 101):
+            self.metrics.record(
+                'GET', 'teams/5/memberships/octocat', 200, seconds / 100.0,
+                10, action='put_team', rate_limit_remaining=4999
+            )
+        self.metrics.record(
+            'GET', 'teams/6/memberships/other', 404, 2.0, 5,
+            action='put_team', rate_limit_remaining=4998
+        )
+        self.metrics.record('DELETE', 'repos/org/repo/hooks/9', 204, 0.5, 0)
+
+    def test_endpoint_template(self):
+        """Verify paths are grouped by the endpoint they request"""
+        for path, template in (
+                ('repos/org/repo', 'repos/{org}/{repo}'),
+                ('/repos/org/repo/hooks/12', 'repos/{org}/{repo}/hooks/{id}'),
+                ('repos/o/r/contents/a/b.xml',
+                 'repos/{org}/{repo}/contents/{path}'),
+                ('repos/o/r/git/trees', 'repos/{org}/{repo}/git/trees'),
+                ('orgs/org/teams', 'orgs/{org}/teams'),
+                ('teams/1/repos/org/repo', 'teams/{id}/repos/{org}/{repo}'),
+                ('rate_limit', 'rate_limit'),
+                ('', ''),
+                ('user/12/keys', 'user/{id}/keys'),
+        ):
+            self.assertEqual(template, endpoint_template(path))
+
+    def test_stats(self):
+        """Verify totals and percentiles by endpoint and action"""
+        stats = self.metrics.stats()
+        self.assertEqual({'put_team': 101}, stats['actions'])
+        self.assertEqual(4998, stats['rate_limit_remaining'])
+        memberships, hooks = stats['endpoints'][0], stats['endpoints'][1]
+        self.assertEqual(
+            ('DELETE', 'repos/{org}/{repo}/hooks/{id}', 1, 0.5),
+            (hooks['method'], hooks['endpoint'], hooks['count'],
+             hooks['p99'])
+        )
+        self.assertEqual(
+            'teams/{id}/memberships/{member}', memberships['endpoint']
+        )
+        self.assertEqual(101, memberships['count'])
+        self.assertEqual({200: 100, 404: 1}, memberships['statuses'])
+        self.assertEqual(1005, memberships['bytes'])
+        self.assertEqual(
+            (0.51, 0.96, 1.0),
+            (memberships['p50'], memberships['p95'], memberships['p99'])
+        )
+        self.assertEqual(
+            stats['actions'], json.loads(self.metrics.to_json())['actions']
+        )
+
+    def test_max_samples(self):
+        """Verify only the latest latencies make up the percentiles"""
+        metrics = RequestMetrics(max_samples=2)
+        for seconds in (9.0, 1.0, 2.0):
+            metrics.record('GET', 'rate_limit', 200, seconds, 0)
+        endpoint = metrics.stats()['endpoints'][0]
+        self.assertEqual((3, 12.0, 2.0), (
+            endpoint['count'], endpoint['seconds'], endpoint['p99']
+        ))
+
+    def test_prometheus(self):
+        """Verify the Prometheus text format"""
+        lines = self.metrics.to_prometheus().splitlines()
+        labels = 'endpoint="teams/{id}/memberships/{member}",method="GET"'
+        for line in (
+                'orcoursetrion_github_requests_total{{{0},status="404"}} 1',
+                'orcoursetrion_github_request_seconds{{{0},quantile="0.95"}}'
+                ' 0.96',
+                'orcoursetrion_github_request_seconds_count{{{0}}} 101',
+                'orcoursetrion_github_response_bytes_total{{{0}}} 1005',
+                'orcoursetrion_github_action_requests_total'
+                '{{action="put_team"}} 101',
+                'orcoursetrion_github_rate_limit_remaining 4998',
+        ):
+            self.assertIn(line.format(labels), lines)
+
+    def test_write(self):
+        """Verify the format written follows the file name"""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        self.metrics.write(os.path.join(path, 'github.json'))
+        self.metrics.write(os.path.join(path, 'github.prom'))
+        self.assertEqual(['github.json', 'github.prom'], sorted(
+            os.listdir(path)
+        ))
+        with open(os.path.join(path, 'github.json')) as metrics_file:
+            self.assertEqual(4998, json.load(
+                metrics_file
+            )['rate_limit_remaining'])
+        with open(os.path.join(path, 'github.prom')) as metrics_file:
+            self.assertEqual(self.metrics.to_prometheus(), metrics_file.read())
+
+
+class TestGitHubMetrics(TestGithubBase):
+    """Test metrics of the requests made by the client and actions"""
+
+    @httpretty.activate
+    def test_record_requests(self):
+        """Verify the client's requests are recorded, against the action
+        of the unit of work they are made in.
+        """
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.register_hooked_repo()
+        git_hub.delete_web_hooks(self.ORG, self.TEST_REPO)
+        with git_hub.unit_of_work(action='rerun'):
+            git_hub.delete_web_hooks(self.ORG, self.TEST_REPO)
+        stats = git_hub.metrics.stats()
+        self.assertEqual({'rerun': 3}, stats['actions'])
+        self.assertEqual(
+            [('DELETE', 'repos/{org}/{repo}/hooks/{id}', 2),
+             ('GET', 'repos/{org}/{repo}', 2),
+             ('GET', 'repos/{org}/{repo}/hooks', 2)],
+            sorted(
+                (x['method'], x['endpoint'], x['count'])
+                for x in stats['endpoints']
+            )
+        )
+
+    @httpretty.activate
+    def test_record_attempts(self):
+        """Verify each attempt is recorded with the status github sent,
+        below retries and caching.
+        """
+        httpretty.register_uri(
+            httpretty.GET,
+            self.TEST_REPO_URL,
+            responses=[
+                httpretty.Response(body='{}', status=502),
+                httpretty.Response(body='{}', status=200, etag='"1"'),
+                httpretty.Response(body='', status=304),
+            ]
+        )
+        git_hub = GitHub(
+            self.URL, self.OAUTH2_TOKEN, cache=MemoryCacheStore()
+        )
+        for _ in range(2):
+            self.assertEqual(
+                200, git_hub.session.get(self.TEST_REPO_URL).status_code
+            )
+        endpoint = git_hub.metrics.stats()['endpoints'][0]
+        self.assertEqual(
+            ('repos/{org}/{repo}', 3, {200: 1, 304: 1, 502: 1}),
+            (endpoint['endpoint'], endpoint['count'], endpoint['statuses'])
+        )
+
+    @mock.patch('orcoursetrion.actions.github.config')
+    @httpretty.activate
+    def test_action_metrics_file(self, config):
+        """Verify actions write the metrics file when it's configured"""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        self.configure_github(
+            config, ORC_GH_METRICS_FILE=os.path.join(path, 'github.json')
+        )
+        config.ORC_COURSE_PREFIX = self.TEST_PREFIX
+        config.ORC_XML_ORG = self.ORG
+
+        self.register_hooked_repo()
+        rerun_xml(self.TEST_COURSE, self.TEST_TERM)
+        with open(config.ORC_GH_METRICS_FILE) as metrics_file:
+            self.assertEqual(
+                3, json.load(metrics_file)['actions']['rerun_xml']
+            )
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Test the local mirror cache of source repos
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import sh
+
+from orcoursetrion.lib import GitHub, MirrorCache
+
+COMMITTER = {'name': 'foo', 'email': 'foo@example.com'}
+
+
+class TestMirrorCache(unittest.TestCase):
+    """Test mirroring repos to copy them"""
+
+    def setUp(self):
+        """Make a directory for repos and mirrors"""
+        super(TestMirrorCache, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp(prefix='orc_mirror_test')
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def make_repo(self, name, contents):
+        """Create a repo with a commit of ``contents``, returning its URL"""
+        path = os.path.join(self.tmp_dir, name)
+        sh.git.init(path)
+        self.commit(path, contents)
+        return 'file://{0}'.format(path)
+
+    @staticmethod
+    def commit(path, contents):
+        """Commit ``contents`` to the test file of the repo at ``path``"""
+        with open(os.path.join(path, 'test'), 'w') as test_file:
+            test_file.write(contents)
+        git = sh.git.bake(_cwd=path)
+        git.config('user.email', COMMITTER['email'])
+        git.config('user.name', COMMITTER['name'])
+        git.add('.')
+        git.commit(m=contents)
+
+    @staticmethod
+    def head(path):
+        """Get the commit at HEAD of a repo"""
+        return str(
+            sh.git.log('-1', format='%H', _cwd=path, _tty_out=False)
+        ).strip()
+
+    def test_copy_with_mirror(self):
+        """Verify copies fetch into the mirror and use it as a reference"""
+        src_url = self.make_repo('src', 'hello')
+        src_path = os.path.join(self.tmp_dir, 'src')
+        dst_path = os.path.join(self.tmp_dir, 'dst')
+        sh.git.init(dst_path, bare=True)
+        mirrors = MirrorCache(os.path.join(self.tmp_dir, 'mirrors'))
+
+        for contents in ('hello', 'world'):
+            if contents != 'hello':
+                self.commit(src_path, contents)
+            GitHub.shallow_copy_repo(
+                src_url, 'file://{0}'.format(dst_path), COMMITTER,
+                mirrors=mirrors
+            )
+            # The second copy fetched the new commit into the mirror
+            self.assertEqual(
+                self.head(src_path), self.head(mirrors.mirror_path(src_url))
+            )
+            self.assertEqual(contents, str(sh.git.show(
+                'HEAD:test', _cwd=dst_path, _tty_out=False
+            )))
+
+    def test_evict(self):
+        """Verify least recently used mirrors are evicted, unless in use"""
+        urls = [self.make_repo(x, x) for x in ('first', 'second')]
+        mirrors = MirrorCache(os.path.join(self.tmp_dir, 'mirrors'))
+        with mirrors.reference(urls[0]) as first:
+            # Mark it as older than the next one
+            os.utime(first, (0, 0))
+            mirrors.max_bytes = 0
+            with mirrors.reference(urls[1]) as second:
+                self.assertTrue(os.path.isdir(first))
+                self.assertTrue(os.path.isdir(second))
+            self.assertTrue(os.path.isdir(first))
+            self.assertFalse(os.path.isdir(second))
+        self.assertFalse(os.path.isdir(first))
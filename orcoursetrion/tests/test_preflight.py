@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Test checking action preconditions before changing anything
+"""
+from functools import partial
+import json
+import re
+import sys
+import threading
+import time
+import traceback
+
+import httpretty
+
+from orcoursetrion.lib import (
+    GitHub,
+    GitHubNoTeamFound,
+    GitHubPreflightError,
+    GitHubRepoDoesNotExist,
+    GitHubRepoExists,
+    Preflight,
+)
+from orcoursetrion.tests.base import TestGithubBase
+
+
+class TestPreflight(TestGithubBase):
+    """Test the concurrent precondition checks"""
+
+    def register_api_root(self, scopes=None):
+        """Register the API root, reporting token ``scopes`` if given"""
+        headers = {}
+        if scopes is not None:
+            headers['X-OAuth-Scopes'] = scopes
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile('^{0}$'.format(re.escape(self.URL))),
+            body='{}',
+            adding_headers=headers
+        )
+
+    @httpretty.activate
+    def test_checks_pass(self):
+        """Verify passing checks don't raise"""
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.register_repo_check(self.callback_repo_check)
+        self.register_team_list(
+            partial(self.callback_team_list, status_code=200)
+        )
+        Preflight(git_hub).repo_absent(
+            self.ORG, self.TEST_REPO
+        ).team_exists(
+            self.ORG, self.TEST_TEAM
+        ).configured('ORC_STAGING_GITRELOAD', self.TEST_STAGING_GR).run()
+        paths = set(x.path for x in httpretty.httpretty.latest_requests)
+        self.assertIn('/repos/{0}/{1}'.format(self.ORG, self.TEST_REPO), paths)
+
+    def test_failure_waits_for_running_checks(self):
+        """Verify the other checks are done before the first failure is
+        raised, with the traceback of where it was raised.
+        """
+        started = threading.Event()
+        finished = []
+
+        def fail():
+            """Fail once the slow check is running"""
+            started.wait(5)
+            raise GitHubPreflightError('failed')
+
+        def slow():
+            """Finish after the failure"""
+            started.set()
+            time.sleep(0.2)
+            finished.append(True)
+
+        preflight = Preflight(GitHub(self.URL, self.OAUTH2_TOKEN))
+        preflight.checks.extend([fail, slow])
+        try:
+            preflight.run()
+        except GitHubPreflightError:
+            self.assertEqual(
+                'fail', traceback.extract_tb(sys.exc_info()[2])[-1][2]
+            )
+        else:
+            self.fail('GitHubPreflightError not raised')
+        self.assertEqual([True], finished)
+
+    @httpretty.activate
+    def test_checks_fail(self):
+        """Verify each failing check raises its own exception"""
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.register_repo_check(
+            partial(self.callback_repo_check, status_code=200)
+        )
+        self.register_team_list(
+            partial(self.callback_team_list, status_code=200)
+        )
+        with self.assertRaises(GitHubRepoExists):
+            Preflight(git_hub).repo_absent(self.ORG, self.TEST_REPO).run()
+        with self.assertRaises(GitHubRepoDoesNotExist):
+            Preflight(git_hub).repo_exists(
+                self.ORG, self.TEST_RERUN_REPO
+            ).run()
+        with self.assertRaises(GitHubNoTeamFound):
+            Preflight(git_hub).team_exists(self.ORG, 'Not a team').run()
+        with self.assertRaisesRegexp(
+            GitHubPreflightError, 'ORC_PRODUCTION_GITRELOAD'
+        ):
+            Preflight(git_hub).repo_exists(
+                self.ORG, self.TEST_REPO
+            ).configured('ORC_PRODUCTION_GITRELOAD', None).run()
+
+    @httpretty.activate
+    def test_unit_of_work(self):
+        """Verify repos checked in a unit of work aren't requested again"""
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.register_repo_check(
+            partial(self.callback_repo_check, status_code=200)
+        )
+        with git_hub.unit_of_work():
+            Preflight(git_hub).repo_exists(self.ORG, self.TEST_REPO).run()
+            # pylint: disable=protected-access
+            self.assertIsNotNone(git_hub._get_repo(self.ORG, self.TEST_REPO))
+        self.assertEqual(1, len(httpretty.httpretty.latest_requests))
+
+    @httpretty.activate
+    def test_token_scopes(self):
+        """Verify scopes are read from responses, including implied ones"""
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.register_api_root('repo, admin:org')
+        Preflight(git_hub).token_scopes('repo', 'read:org').run()
+        # The scopes are remembered from the first response
+        Preflight(git_hub).token_scopes('public_repo').run()
+        self.assertEqual(1, len(httpretty.httpretty.latest_requests))
+        with self.assertRaisesRegexp(GitHubPreflightError, 'admin:repo_hook'):
+            Preflight(git_hub).token_scopes('admin:repo_hook').run()
+
+        # Scopes from a repo check are used without another request
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        httpretty.register_uri(
+            httpretty.GET,
+            self.TEST_REPO_URL,
+            body=json.dumps({'message': 'Not Found'}),
+            status=404,
+            adding_headers={'X-OAuth-Scopes': 'public_repo'}
+        )
+        with self.assertRaisesRegexp(GitHubPreflightError, 'admin:org'):
+            Preflight(git_hub).repo_absent(
+                self.ORG, self.TEST_REPO
+            ).token_scopes('admin:org').run()
+        self.assertEqual(2, len(httpretty.httpretty.latest_requests))
+
+    @httpretty.activate
+    def test_token_scopes_unknown(self):
+        """Verify scopes aren't checked if github doesn't report them"""
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.register_api_root()
+        Preflight(git_hub).token_scopes('admin:org').run()
+        self.assertIsNone(git_hub.get_token_scopes())
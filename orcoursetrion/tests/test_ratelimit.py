@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Test rate limit aware pacing of github requests
+"""
+import json
+
+import httpretty
+import mock
+
+from orcoursetrion.lib import GitHub, GitHubUnknownError
+from orcoursetrion.lib.ratelimit import TokenBucket, SECONDARY_LIMIT_WAIT
+from orcoursetrion.tests.base import TestGithubBase
+
+
+class TestRateLimit(TestGithubBase):
+    """Test the token bucket and rate limit adapter"""
+
+    def setUp(self):
+        """Control the clock and sleeping of the rate limiter"""
+        super(TestRateLimit, self).setUp()
+        patcher = mock.patch('orcoursetrion.lib.ratelimit.time')
+        self.mock_time = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_time.time.return_value = 1000.0
+
+    def register_rate_limited(self, responses):
+        """Register the repo URL to return ``responses`` in order, each a
+        tuple of status and headers.
+        """
+        responses = list(responses)
+
+        def callback(request, uri, headers):
+            """Pop the next response"""
+            # pylint: disable=unused-argument
+            status, extra_headers = responses.pop(0)
+            headers.update(extra_headers)
+            return (status, headers, json.dumps({'message': 'testing'}))
+
+        httpretty.register_uri(
+            httpretty.GET,
+            self.TEST_REPO_URL,
+            body=callback
+        )
+
+    def test_token_bucket(self):
+        """Verify bursts are allowed and then requests are paced"""
+        bucket = TokenBucket(rate=2, capacity=2)
+        self.assertEqual(0, bucket.acquire())
+        self.assertEqual(0, bucket.acquire())
+        self.assertEqual(0.5, bucket.acquire())
+        # Next one waits in line behind the last one
+        self.assertEqual(1.0, bucket.acquire())
+        self.assertEqual(
+            [mock.call(0.5), mock.call(1.0)],
+            self.mock_time.sleep.call_args_list
+        )
+        # Time passing refills the bucket
+        self.mock_time.time.return_value = 1002.0
+        self.assertEqual(0, bucket.acquire())
+
+    @httpretty.activate
+    def test_writes_paced_slower(self):
+        """Verify writes take more of the rate than reads"""
+        for method in (httpretty.GET, httpretty.PATCH):
+            httpretty.register_uri(
+                method, self.TEST_REPO_URL, body=json.dumps({})
+            )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN, requests_per_second=10)
+        git_hub.rate_limiter.bucket.tokens = 0
+        git_hub.session.get(self.TEST_REPO_URL)
+        self.mock_time.sleep.assert_called_once_with(0.1)
+        self.mock_time.sleep.reset_mock()
+        git_hub.rate_limiter.bucket.tokens = 0
+        git_hub.session.patch(self.TEST_REPO_URL)
+        self.mock_time.sleep.assert_called_once_with(0.5)
+
+    @httpretty.activate
+    def test_budget_tracked(self):
+        """Verify the rate limit headers are tracked and exposed"""
+        httpretty.register_uri(
+            httpretty.GET,
+            '{url}rate_limit'.format(url=self.URL),
+            body=json.dumps({}),
+            adding_headers={
+                'X-RateLimit-Limit': '5000',
+                'X-RateLimit-Remaining': '4999',
+                'X-RateLimit-Reset': '1234',
+            }
+        )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        budget = git_hub.get_rate_limit()
+        self.assertEqual(
+            (5000, 4999, 1234), (
+                budget['limit'], budget['remaining'], budget['reset']
+            )
+        )
+        self.assertEqual(0, budget['secondary_limits_hit'])
+
+    @httpretty.activate
+    def test_secondary_limit_retried(self):
+        """Verify secondary limits are waited out, retried and slow us"""
+        self.register_rate_limited([
+            (403, {'Retry-After': '7'}),
+            (200, {}),
+        ])
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN, requests_per_second=4)
+        # pylint: disable=protected-access
+        self.assertIsNotNone(git_hub._get_repo(self.ORG, self.TEST_REPO))
+        self.mock_time.sleep.assert_called_once_with(7.0)
+        budget = git_hub.rate_limiter.budget()
+        self.assertEqual(1, budget['secondary_limits_hit'])
+        self.assertEqual(2.1, budget['requests_per_second'])
+
+    @httpretty.activate
+    def test_secondary_limit_without_retry_after(self):
+        """Verify secondary limit messages back off for a minute"""
+        httpretty.register_uri(
+            httpretty.GET,
+            self.TEST_REPO_URL,
+            responses=[
+                httpretty.Response(
+                    body=json.dumps({
+                        'message': 'You have exceeded a secondary rate limit'
+                    }),
+                    status=403
+                ),
+                httpretty.Response(body=json.dumps({}), status=200),
+            ]
+        )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        # pylint: disable=protected-access
+        git_hub._get_repo(self.ORG, self.TEST_REPO)
+        self.mock_time.sleep.assert_called_once_with(SECONDARY_LIMIT_WAIT)
+
+    @httpretty.activate
+    def test_exhausted_budget_waits(self):
+        """Verify we wait for the reset once the budget is used up"""
+        self.register_rate_limited([
+            (200, {
+                'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1030'
+            }),
+            (200, {
+                'X-RateLimit-Remaining': '4999', 'X-RateLimit-Reset': '4600'
+            }),
+        ])
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        # pylint: disable=protected-access
+        git_hub._get_repo(self.ORG, self.TEST_REPO)
+        self.assertFalse(self.mock_time.sleep.called)
+        git_hub._get_repo(self.ORG, self.TEST_REPO)
+        self.mock_time.sleep.assert_called_once_with(30.0)
+        self.assertEqual(4999, git_hub.get_rate_limit()['remaining'])
+
+    @httpretty.activate
+    def test_retries_exhausted(self):
+        """Verify we give up and return the response after retrying"""
+        self.register_rate_limited([(429, {'Retry-After': '1'})] * 4)
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        with self.assertRaises(GitHubUnknownError):
+            # pylint: disable=protected-access
+            git_hub._get_repo(self.ORG, self.TEST_REPO)
+        self.assertEqual(3, self.mock_time.sleep.call_count)
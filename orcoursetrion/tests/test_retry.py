@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Test retrying github requests that fail transiently
+"""
+import json
+
+import httpretty
+import mock
+from requests import Response
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+from orcoursetrion.lib import GitHub, GitHubUnknownError
+from orcoursetrion.lib.retry import RetryAdapter
+from orcoursetrion.tests.base import TestGithubBase
+
+
+class TestRetry(TestGithubBase):
+    """Test the retry adapter and retrying creates"""
+
+    def register_repo_responses(self, statuses):
+        """Register getting the test repo to return ``statuses`` in order"""
+        httpretty.register_uri(
+            httpretty.GET,
+            self.TEST_REPO_URL,
+            responses=[
+                httpretty.Response(
+                    body=json.dumps({'name': self.TEST_REPO}), status=status
+                )
+                for status in statuses
+            ]
+        )
+
+    @staticmethod
+    def post_count():
+        """Count the POST requests sent so far"""
+        return len([
+            x for x in httpretty.HTTPretty.latest_requests
+            if x.method == 'POST'
+        ])
+
+    @httpretty.activate
+    def test_get_retried(self):
+        """Verify server errors are retried with jittered backoff"""
+        self.register_repo_responses([502, 503, 200])
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN, retry_backoff=2)
+        with mock.patch('orcoursetrion.lib.retry.random') as mock_random:
+            mock_random.uniform.side_effect = lambda low, high: high / 2.0
+            # pylint: disable=protected-access
+            self.assertEqual(
+                {'name': self.TEST_REPO},
+                git_hub._get_repo(self.ORG, self.TEST_REPO)
+            )
+        self.assertEqual(
+            [mock.call(0, 2), mock.call(0, 4)],
+            mock_random.uniform.call_args_list
+        )
+        self.assertEqual(
+            [mock.call(1.0), mock.call(2.0)],
+            self.retry_time.sleep.call_args_list
+        )
+        self.assertEqual(
+            {'retries': 2, 'retry_delay': 3.0, 'gave_up': 0},
+            git_hub.get_retry_stats()
+        )
+
+    @httpretty.activate
+    def test_get_gives_up(self):
+        """Verify we stop retrying and fail after ``max_retries``"""
+        self.register_repo_responses([500] * 3)
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN, max_retries=2)
+        with self.assertRaises(GitHubUnknownError):
+            # pylint: disable=protected-access
+            git_hub._get_repo(self.ORG, self.TEST_REPO)
+        stats = git_hub.get_retry_stats()
+        self.assertEqual((2, 1), (stats['retries'], stats['gave_up']))
+
+    def test_connection_error_retried(self):
+        """Verify connection errors are retried, and raised at the end"""
+        response = Response()
+        response.status_code = 200
+        wrapped = mock.Mock()
+        wrapped.send.side_effect = [RequestsConnectionError('down'), response]
+        adapter = RetryAdapter(wrapped)
+        request = mock.Mock(method='GET')
+        self.assertEqual(response, adapter.send(request))
+        self.assertEqual(1, adapter.stats()['retries'])
+
+        wrapped.send.side_effect = RequestsConnectionError('down')
+        with self.assertRaises(RequestsConnectionError):
+            adapter.send(request)
+        self.assertEqual(4, adapter.stats()['retries'])
+
+    def test_post_not_retried(self):
+        """Verify the adapter leaves non-idempotent requests alone"""
+        response = Response()
+        response.status_code = 502
+        wrapped = mock.Mock()
+        wrapped.send.return_value = response
+        adapter = RetryAdapter(wrapped)
+        self.assertEqual(response, adapter.send(mock.Mock(method='POST')))
+        self.assertEqual(1, wrapped.send.call_count)
+
+    @httpretty.activate
+    def test_create_repo_succeeded_anyway(self):
+        """Verify a failed create isn't retried if the repo now exists"""
+        self.register_repo_responses([404, 200])
+        httpretty.register_uri(
+            httpretty.POST,
+            '{url}orgs/{org}/repos'.format(url=self.URL, org=self.ORG),
+            body='', status=502
+        )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.assertEqual(
+            {'name': self.TEST_REPO},
+            git_hub.create_repo(
+                self.ORG, self.TEST_REPO, self.TEST_DESCRIPTION
+            )
+        )
+        self.assertEqual(1, self.post_count())
+        self.assertEqual(0, git_hub.get_retry_stats()['retries'])
+
+    @httpretty.activate
+    def test_create_repo_retried(self):
+        """Verify a failed create is retried if it didn't go through"""
+        self.register_repo_responses([404, 404])
+        httpretty.register_uri(
+            httpretty.POST,
+            '{url}orgs/{org}/repos'.format(url=self.URL, org=self.ORG),
+            responses=[
+                httpretty.Response(body='', status=502),
+                httpretty.Response(
+                    body=json.dumps({'html_url': 'testing'}), status=201
+                ),
+            ]
+        )
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.assertEqual(
+            {'html_url': 'testing'},
+            git_hub.create_repo(
+                self.ORG, self.TEST_REPO, self.TEST_DESCRIPTION
+            )
+        )
+        self.assertEqual(2, self.post_count())
+        self.assertEqual(1, git_hub.get_retry_stats()['retries'])
+
+    @httpretty.activate
+    def test_add_web_hook_succeeded_anyway(self):
+        """Verify a failed hook create finds the hook it added"""
+        self.register_hook_create(body='', status=504)
+        hook = {'id': 1, 'config': {'url': 'http://fluff'}}
+        self.register_hook_list(body=json.dumps([
+            {'id': 2, 'config': {'url': 'http://other'}}, hook
+        ]))
+        git_hub = GitHub(self.URL, self.OAUTH2_TOKEN)
+        self.assertEqual(
+            hook,
+            git_hub.add_web_hook(self.ORG, self.TEST_REPO, 'http://fluff')
+        )
+        self.assertEqual(1, self.post_count())
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Test sharing calls in flight between threads
+"""
+import threading
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from orcoursetrion.lib.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test coalescing identical calls"""
+
+    @staticmethod
+    def run_together(flights, key, func, count=4):
+        """Call ``func`` for ``key`` from ``count`` threads, once all of
+        them are waiting, and return the futures of each.
+        """
+        def call():
+            """Wait until everyone but the first is sharing its call"""
+            deadline = time.time() + 5
+            while flights.shared < count - 1 and time.time() < deadline:
+                time.sleep(0.01)
+            return func()
+
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            return [
+                executor.submit(flights.run, key, call) for _ in range(count)
+            ]
+
+    def test_shared_result(self):
+        """Verify calls in flight are shared, and later ones aren't"""
+        flights = SingleFlight()
+        calls = []
+        futures = self.run_together(
+            flights, 'key', lambda: calls.append(1) or {'id': 1}
+        )
+        results = [x.result() for x in futures]
+        self.assertEqual(1, len(calls))
+        self.assertEqual(3, flights.shared)
+        self.assertTrue(all(x is results[0] for x in results))
+        # Nothing is kept once the call is done
+        self.assertEqual(2, flights.run('key', lambda: 2))
+
+    def test_shared_error(self):
+        """Verify every caller gets the exception"""
+        flights = SingleFlight()
+        futures = self.run_together(flights, 'key', lambda: 1 / 0)
+        for future in futures:
+            self.assertIsInstance(future.exception(), ZeroDivisionError)
+        self.assertEqual(3, flights.run('key', lambda: 3))
+
+    def test_different_keys(self):
+        """Verify calls for different keys aren't shared"""
+        flights = SingleFlight()
+        started = threading.Event()
+
+        def first():
+            """Block until the other key has run"""
+            started.wait(5)
+            return 'first'
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future = executor.submit(flights.run, 'first', first)
+            self.assertEqual('second', flights.run('second', lambda: 'second'))
+            started.set()
+            self.assertEqual('first', future.result())
+        self.assertEqual(0, flights.shared)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Test running action steps as a graph
+"""
+from contextlib import contextmanager
+import threading
+import unittest
+
+from orcoursetrion.lib import StepGraph
+
+
+class TestSteps(unittest.TestCase):
+    """Test the step graph executor"""
+
+    def test_run_order(self):
+        """Verify steps wait for their requirements and run together"""
+        started = []
+        first_started = threading.Event()
+        second_started = threading.Event()
+
+        def step(name, mine, other):
+            """Record the step, and wait for its sibling to start too"""
+            started.append(name)
+            mine.set()
+            # Only finishes if the other one is running at the same time
+            self.assertTrue(other.wait(5))
+            return name
+
+        steps = StepGraph()
+        steps.add('repo', lambda: started.append('repo') or 'repo')
+        steps.add(
+            'first', lambda: step('first', first_started, second_started),
+            requires=['repo']
+        )
+        steps.add(
+            'second', lambda: step('second', second_started, first_started),
+            requires=['repo']
+        )
+        steps.add('last', lambda: 'last', requires=['first', 'second'])
+        self.assertEqual(
+            {'repo': 'repo', 'first': 'first', 'second': 'second',
+             'last': 'last'},
+            steps.run()
+        )
+        self.assertEqual('repo', started[0])
+        self.assertEqual(
+            set(['repo', 'first', 'second', 'last']), set(steps.timings)
+        )
+
+    def test_failure(self):
+        """Verify a failing step skips its dependents and is raised"""
+        ran = []
+        steps = StepGraph()
+        steps.add('bad', lambda: 1 / 0)
+        steps.add('other', lambda: ran.append('other'))
+        steps.add('after', lambda: ran.append('after'), requires=['bad'])
+        with self.assertRaises(ZeroDivisionError):
+            steps.run()
+        self.assertEqual(['other'], ran)
+        self.assertNotIn('after', steps.timings)
+
+    def test_invalid_graph(self):
+        """Verify unknown requirements, cycles and duplicates are caught"""
+        steps = StepGraph().add('a', lambda: None, requires=['missing'])
+        with self.assertRaisesRegexp(ValueError, 'unknown missing'):
+            steps.run()
+        steps = StepGraph()
+        steps.add('a', lambda: None, requires=['b'])
+        steps.add('b', lambda: None, requires=['a'])
+        with self.assertRaisesRegexp(ValueError, 'require each other'):
+            steps.run()
+        with self.assertRaisesRegexp(ValueError, 'already added'):
+            steps.add('a', lambda: None)
+
+    def test_context(self):
+        """Verify each step runs in the context given"""
+        entered = []
+
+        @contextmanager
+        def context():
+            """Record entering"""
+            entered.append(threading.current_thread())
+            yield
+
+        steps = StepGraph(context=context)
+        steps.add('a', lambda: None)
+        steps.add('b', lambda: None)
+        steps.run()
+        self.assertEqual(2, len(entered))
+        self.assertNotIn(threading.current_thread(), entered)
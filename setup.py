@@ -76,9 +76,14 @@ setup(
         'Operating System :: POSIX :: Linux',
     ],
     install_requires=[
+        'futures>=3.0.0; python_version < "3"',
         'requests>=2.4.2',
         'sh>=1.11',
         ],
+    extras_require={
+        'http2': ['hyper'],
+        'yaml': ['PyYAML'],
+    },
     entry_points={'console_scripts': [
         'orcoursetrion = orcoursetrion.cmd:execute',
     ]},